@@ -1,164 +1,157 @@
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, UploadFile, File, Form
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from ..core.database import get_db
+from ..core.database import get_db, get_async_db, AsyncSessionLocal
+from ..core.response_cache import cached_json, cached_json_async
 from ..models.contact import Contact
+from ..models.contact_rollup import ContactRollup
 from ..services.batch_service import BatchService
-from ..services.categorization_service import CategorizationService
-import csv
-from io import StringIO
+from ..services.categorization_service import CATEGORIZATION_ENGINES
+from ..services.columnar_export import COLUMNAR_FORMATS, iter_columnar
+from ..services.export_service import DEFAULT_EXPORT_FIELDS, accepts_gzip, bucket_condition, gzip_chunks, iter_csv
+from ..services.ingest_service import IngestService
+from ..services.job_service import JobService, TERMINAL_STATUSES
+from ..services.rollup_service import RollupService
+from ..services.pagination import (
+    InvalidCursor,
+    KEYSET_SORT_FIELDS,
+    PAGING_MODES,
+    TOTAL_MODES,
+    count_total,
+    exact_count,
+    keyset_page,
+)
+from ..services.search_service import ContactSearchService, SEARCH_MODES
+from ..services.segment_query import SegmentQueryError, compile_segment, format_segment, parse_segment
+from ..services.tag_bitmap_index import CO_OCCURRENCE_MAX_TAGS, TAG_BITMAPS, ensure_built
+from ..services.tag_index_service import TagIndexService
+from ..services.tag_mapping_service import TagMappingService
+from ..services import job_handlers  # noqa: F401 registers job kinds
+import asyncio
+import json
 import logging
-import uuid
-import zipfile
-import os
+import shutil
 import tempfile
-import re
-from sqlalchemy import Column, String
-from sqlalchemy import or_
-import io
+import zipfile
+from sqlalchemy import Column, String, select
 from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from sqlalchemy.inspection import inspect
 
 router = APIRouter()
 
+# Seconds between status checks on the server-sent events stream
+STREAM_INTERVAL = 1.0
+
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 @router.post("/upload")
 async def upload_contacts(
     file: UploadFile = File(...),
     main_bucket: str = None,
+    categorize: bool = False,
+    force: bool = False,
     db: Session = Depends(get_db)
 ):
-    """Upload and process a CSV file of contacts."""
+    """Upload and process a CSV file of contacts.
+
+    Content already in the ingest ledger is skipped unless force is set.
+    """
     logger.info(f"Received upload request: {file.filename} with main_bucket={main_bucket}")
     if not file.filename.endswith('.csv'):
         logger.error("Upload failed: Only CSV files are supported")
         raise HTTPException(400, "Only CSV files are supported")
 
     try:
-        contents = await file.read()
-        csv_content = contents.decode()
-        csv_file = StringIO(csv_content)
-        reader = csv.DictReader(csv_file)
-        contacts = []
-        emails_seen = set()
-        for row in reader:
-            email = row.get('Email', '').strip()
-            if not email or email in emails_seen:
-                logger.warning(f"Duplicate or missing email in upload: {email}. Skipping row.")
-                continue
-            emails_seen.add(email)
-            full_name = row.get('First Name', '').strip()
-            contact_id = row.get('Contact ID', '').strip()
-            tags_raw = row.get('Contact Tags', '')
-            tags = [t.strip() for t in tags_raw.split(',') if t.strip()]
-            # Validate or generate UUID
-            try:
-                contact_uuid = uuid.UUID(contact_id) if contact_id else uuid.uuid4()
-            except Exception:
-                contact_uuid = uuid.uuid4()
-            # Upsert by email (email is unique)
-            existing = db.query(Contact).filter(Contact.email == email).first()
-            # Set main bucket flags
-            is_biz = main_bucket == 'biz'
-            is_health = main_bucket == 'health'
-            is_survivalist = main_bucket == 'survivalist'
-            if existing:
-                existing.full_name = full_name
-                # Merge tags, ensuring uniqueness
-                existing_tags = set(existing.tags or [])
-                new_tags = set(tags)
-                merged_tags = list(existing_tags.union(new_tags))
-                existing.tags = merged_tags
-                existing.email = email
-                # Only set the selected main bucket to True, preserve others
-                if is_biz:
-                    existing.is_in_main_bucket_biz = True
-                if is_health:
-                    existing.is_in_main_bucket_health = True
-                if is_survivalist:
-                    existing.is_in_main_bucket_survivalist = True
-                # Merge summit_history
-                existing_history = set(existing.summit_history or [])
-                if summit_history_val:
-                    existing_history.add(summit_history_val)
-                existing.summit_history = list(existing_history)
-                existing.engagement_level = engagement_level
-                existing.email_state = email_state
-                existing.email_sub_state = email_sub_state
-                db.add(existing)
-                logger.info(f"Updated contact: {email} ({existing.id}) with merged tags and main bucket.")
-            else:
-                contact = Contact(
-                    id=contact_uuid,
-                    email=email,
-                    full_name=full_name,
-                    tags=tags,
-                    is_in_main_bucket_biz=is_biz,
-                    is_in_main_bucket_health=is_health,
-                    is_in_main_bucket_survivalist=is_survivalist,
-                    engagement_level=engagement_level,
-                    email_state=email_state,
-                    email_sub_state=email_sub_state,
-                    summit_history=[summit_history_val] if summit_history_val else [],
-                )
-                db.add(contact)
-                logger.info(f"Inserted new contact: {email} ({contact_uuid}) with main bucket.")
-            contacts.append(email)
-        db.commit()
-        logger.info(f"Successfully upserted {len(contacts)} contacts.")
-        return {"total": len(contacts), "success": len(contacts)}
+        # Only set the selected main bucket to True, preserve others
+        result = await run_in_threadpool(
+            _ingest_upload, db, file, main_bucket=main_bucket, merge_main_buckets=True, categorize=categorize, force=force
+        )
+        return {
+            "total": result["total"],
+            "success": result["total"],
+            "skipped": result["skipped"],
+            "categorized": result["categorized"],
+            "batches": result["batches"],
+            "ledger": result["ledger"],
+        }
     except Exception as e:
-        db.rollback()
         logger.error(f"Upload failed: {str(e)}")
         raise HTTPException(500, str(e))
 
 @router.post("/categorize")
 async def categorize_contacts(
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Start the categorization process for all uncategorized contacts."""
     try:
-        # Get uncategorized contacts
-        contacts = db.query(Contact).filter(
-            Contact.main_bucket_assignment.is_(None)
-        ).all()
-
-        if not contacts:
-            return {"message": "No contacts to categorize"}
-
-        # Start categorization
-        categorization_service = CategorizationService(db)
-        result = await categorization_service.categorize_contacts(contacts)
-        
-        return result
+        job = await db.run_sync(lambda session: JobService(session).enqueue("categorize"))
+        return {"task_id": str(job.id), "status": job.status}
     except Exception as e:
         raise HTTPException(500, str(e))
 
 @router.get("/categorize/status/{task_id}")
 async def get_categorization_status(
     task_id: str,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get the status of a categorization task."""
-    try:
-        batch_service = BatchService(db)
-        status = await batch_service.get_batch_status(task_id)
-        return status
-    except Exception as e:
-        raise HTTPException(500, str(e))
+    batch_service = BatchService(db)
+    status = await batch_service.get_batch_status(task_id)
+    if status is None:
+        raise HTTPException(404, "Task not found")
+    return status
+
+@router.get("/categorize/stream/{task_id}")
+async def stream_categorization_status(task_id: str):
+    """Server-sent events stream of a task's status until it finishes."""
+    async def read_status():
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(lambda session: JobService(session).status(task_id))
+
+    if await read_status() is None:
+        raise HTTPException(404, "Task not found")
+
+    async def events():
+        last = None
+        while True:
+            status = await read_status()
+            if status != last:
+                yield f"data: {json.dumps(status)}\n\n"
+                last = status
+            else:
+                # Comment line, so idle proxies and the browser keep the stream open
+                yield ": keepalive\n\n"
+            if status is None or status["status"] in TERMINAL_STATUSES:
+                return
+            await asyncio.sleep(STREAM_INTERVAL)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 @router.post("/auto-categorize")
-async def auto_categorize_contacts(db: Session = Depends(get_db)):
+async def auto_categorize_contacts(engine: str = "python", db: AsyncSession = Depends(get_async_db)):
     """Trigger auto-categorization for all uncategorized contacts."""
+    if engine not in CATEGORIZATION_ENGINES:
+        raise HTTPException(400, f"engine must be one of: {', '.join(CATEGORIZATION_ENGINES)}")
     try:
-        batch_service = BatchService(db)
-        result = await batch_service.auto_categorize_contacts()
-        return result
+        job = await db.run_sync(lambda session: JobService(session).enqueue("auto_categorize", {"engine": engine}))
+        return {"task_id": str(job.id), "status": job.status, "engine": engine, "message": "Categorization started"}
     except Exception as e:
         raise HTTPException(500, str(e))
 
+def _segment(query: str):
+    """Parse a segment expression into (canonical text, SQL condition), as a 400 when invalid."""
+    try:
+        node = parse_segment(query)
+    except SegmentQueryError as e:
+        raise HTTPException(400, str(e))
+    return format_segment(node), compile_segment(node)
+
 @router.get("/")
 async def get_contacts(
     skip: int = 0,
@@ -169,68 +162,117 @@ async def get_contacts(
     sort_field: Optional[str] = "email",
     sort_dir: Optional[str] = "asc",
     search: Optional[str] = None,
-    db: Session = Depends(get_db)
+    search_mode: str = "contains",
+    paging: str = "offset",
+    cursor: Optional[str] = None,
+    total_mode: Optional[str] = None,
+    segment: Optional[str] = None,
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get a paginated list of contacts with optional filtering, searching, and sorting."""
-    query = db.query(Contact)
-
-    if main_bucket:
-        query = query.filter(Contact.main_bucket_assignment == main_bucket)
-    if personality_bucket:
-        query = query.filter(Contact.personality_bucket_assignment == personality_bucket)
-    if tag:
-        query = query.filter(Contact.tags.contains([tag]))
-    if search:
-        ilike = f"%{search.lower()}%"
-        query = query.filter(
-            (Contact.email.ilike(ilike)) | (Contact.full_name.ilike(ilike))
-        )
+    """Get a paginated list of contacts with optional filtering, searching, and sorting.
+
+    search_mode is "contains" (substring, the default) or "prefix", which
+    only matches the start of email or name and is cheaper still.
+
+    paging="cursor" pages by (sort_field, id) from an opaque cursor instead
+    of skip; the response carries next_cursor / prev_cursor. total_mode
+    picks how total is computed (see TOTAL_MODES); it defaults to "exact"
+    for offset paging and "cached" for cursor paging.
+
+    segment narrows the list further with a boolean segment expression,
+    as accepted by /segments/count.
+    """
+    if search_mode not in SEARCH_MODES:
+        raise HTTPException(400, f"search_mode must be one of {', '.join(SEARCH_MODES)}")
+    if paging not in PAGING_MODES:
+        raise HTTPException(400, f"paging must be one of {', '.join(PAGING_MODES)}")
+    total_mode = total_mode or ("cached" if paging == "cursor" else "exact")
+    if total_mode not in TOTAL_MODES:
+        raise HTTPException(400, f"total_mode must be one of {', '.join(TOTAL_MODES)}")
+    stmt = ContactSearchService(db).filtered(main_bucket, personality_bucket, tag, search, search_mode)
+    if segment:
+        segment, condition = _segment(segment)
+        stmt = stmt.where(condition)
+    total = await db.run_sync(count_total, stmt, total_mode, (main_bucket, personality_bucket, tag, search, search_mode, segment))
+
+    if paging == "cursor":
+        if sort_field not in KEYSET_SORT_FIELDS:
+            raise HTTPException(400, f"Cursor paging can sort by {', '.join(KEYSET_SORT_FIELDS)}")
+        try:
+            page = await db.run_sync(keyset_page, stmt, sort_field, sort_dir, limit, cursor)
+        except InvalidCursor as e:
+            raise HTTPException(400, str(e))
+        return {"total": total, "total_mode": total_mode, **page}
+
     if sort_field and hasattr(Contact, sort_field):
         sort_col = getattr(Contact, sort_field)
         if sort_dir == "desc":
             sort_col = sort_col.desc()
-        query = query.order_by(sort_col)
-
-    total = query.count()
-    contacts = query.offset(skip).limit(limit).all()
+        stmt = stmt.order_by(sort_col)
+    contacts = (await db.execute(stmt.offset(skip).limit(limit))).scalars().all()
 
     return {
         "total": total,
         "contacts": contacts
     }
 
+@router.get("/search/explain")
+def explain_contact_search(
+    main_bucket: Optional[str] = None,
+    personality_bucket: Optional[str] = None,
+    tag: Optional[str] = None,
+    search: Optional[str] = None,
+    search_mode: str = "contains",
+    segment: Optional[str] = None,
+    limit: int = 10,
+    analyze: bool = False,
+    db: Session = Depends(get_db)
+):
+    """Show the query plan GET /contacts would use for these filters."""
+    if search_mode not in SEARCH_MODES:
+        raise HTTPException(400, f"search_mode must be one of {', '.join(SEARCH_MODES)}")
+    search_service = ContactSearchService(db)
+    stmt = search_service.filtered(main_bucket, personality_bucket, tag, search, search_mode)
+    if segment:
+        stmt = stmt.where(_segment(segment)[1])
+    return search_service.explain(stmt.limit(limit), analyze=analyze)
+
 @router.get("/stats")
-def get_dashboard_stats(db: Session = Depends(get_db)):
-    total_contacts = db.query(Contact).count()
-    unique_categorized = db.query(Contact).filter(Contact.personality_bucket_assignment.isnot(None)).count()
-    categories = db.query(Contact.personality_bucket_assignment).distinct().count()
-    # You can add more stats as needed
-    return {
-        "total_contacts": total_contacts,
-        "unique_categorized": unique_categorized,
-        "categories": categories,
-        # Add more fields as needed
-    }
+def get_dashboard_stats(request: Request, db: Session = Depends(get_db)):
+    # Read from contact_rollup; add more fields to RollupService.stats as needed
+    return cached_json(request, db, lambda: RollupService(db).stats())
+
+@router.post("/stats/rebuild")
+def rebuild_dashboard_stats(db: Session = Depends(get_db)):
+    """Recount the dashboard rollup from the contacts table."""
+    try:
+        return RollupService(db).rebuild()
+    except Exception as e:
+        raise HTTPException(500, str(e))
 
 @router.get("/main-buckets")
-def get_main_buckets(db: Session = Depends(get_db)):
+def get_main_buckets(request: Request, db: Session = Depends(get_db)):
+    return cached_json(request, db, lambda: _main_bucket_counts(db))
+
+def _main_bucket_counts(db: Session):
     buckets = [
         {"label": "Business Operations", "description": "Business-focused contacts and operations", "color": "blue", "field": "is_in_main_bucket_biz"},
         {"label": "Health", "description": "Health and wellness related contacts", "color": "green", "field": "is_in_main_bucket_health"},
         {"label": "Survivalist", "description": "Emergency preparedness and survival contacts", "color": "orange", "field": "is_in_main_bucket_survivalist"},
         {"label": "Cannot Place", "description": "Contacts that do not match any specific category", "color": "gray", "field": None},
     ]
+    rollup = RollupService(db)
     results = []
     for bucket in buckets:
         if bucket["field"]:
-            count = db.query(Contact).filter(getattr(Contact, bucket["field"]) == True).count()
+            count = rollup.total(getattr(ContactRollup, bucket["field"]) == True)
         else:
             # Cannot Place: not in any main bucket
-            count = db.query(Contact).filter(
-                (Contact.is_in_main_bucket_biz == False) &
-                (Contact.is_in_main_bucket_health == False) &
-                (Contact.is_in_main_bucket_survivalist == False)
-            ).count()
+            count = rollup.total(
+                (ContactRollup.is_in_main_bucket_biz == False) &
+                (ContactRollup.is_in_main_bucket_health == False) &
+                (ContactRollup.is_in_main_bucket_survivalist == False)
+            )
         results.append({
             "label": bucket["label"],
             "description": bucket["description"],
@@ -244,6 +286,9 @@ async def upload_csv_contacts(
     file: UploadFile = File(...),
     main_bucket: str = Form(None),
     main_bucket_in_csv: str = Form('0'),
+    background: str = Form('0'),
+    categorize: str = Form('0'),
+    force: str = Form('0'),
     db: Session = Depends(get_db)
 ):
     logger.info(f"Received upload-csv request: {file.filename} with main_bucket={main_bucket}, main_bucket_in_csv={main_bucket_in_csv}")
@@ -251,220 +296,193 @@ async def upload_csv_contacts(
         logger.error("Upload failed: Only CSV files are supported")
         raise HTTPException(400, "Only CSV files are supported")
     try:
-        contents = await file.read()
-        csv_content = contents.decode()
-        csv_file = StringIO(csv_content)
-        reader = csv.DictReader(csv_file)
-        contacts = []
-        emails_seen = set()
-        # Parse engagement and summit history from file name
-        engagement_level_file, summit_history_val = parse_engagement_and_history(file.filename)
-        for row in reader:
-            email = row.get('Email', '').strip()
-            if not email or email in emails_seen:
-                logger.warning(f"Duplicate or missing email in upload: {email}. Skipping row.")
-                continue
-            emails_seen.add(email)
-            full_name = row.get('First Name', '').strip() or row.get('Name', '').strip()
-            contact_id = row.get('Contact ID', '').strip()
-            tags_raw = row.get('Contact Tags', '') or row.get('Tag', '')
-            tags = [t.strip() for t in tags_raw.split(',') if t.strip()]
-            # Validate or generate UUID
-            try:
-                contact_uuid = uuid.UUID(contact_id) if contact_id else uuid.uuid4()
-            except Exception:
-                contact_uuid = uuid.uuid4()
-            # Determine main bucket flags
-            if main_bucket_in_csv == '1':
-                main_bucket_val = (row.get('Main Bucket') or '').strip().lower()
-                is_biz = main_bucket_val in ['biz', 'business', 'business operations']
-                is_health = main_bucket_val == 'health'
-                is_survivalist = main_bucket_val == 'survivalist'
-            else:
-                is_biz = main_bucket == 'biz'
-                is_health = main_bucket == 'health'
-                is_survivalist = main_bucket == 'survivalist'
-            # Upsert by email (email is unique)
-            existing = db.query(Contact).filter(Contact.email == email).first()
-            if existing:
-                # Merge tags
-                existing_tags = set(existing.tags or [])
-                all_tags = list(existing_tags.union(tags))
-                existing.tags = all_tags
-                existing.full_name = full_name or existing.full_name
-                existing.is_in_main_bucket_biz = is_biz
-                existing.is_in_main_bucket_health = is_health
-                existing.is_in_main_bucket_survivalist = is_survivalist
-                engagement_level = row.get('Engagement') or row.get('Engagement Level') or engagement_level_file
-                email_state = row.get('Email State')
-                email_sub_state = row.get('Email Sub-State')
-                if engagement_level:
-                    existing.engagement_level = engagement_level
-                if summit_history_val:
-                    # Ensure summit_history is a list
-                    if isinstance(existing.summit_history, str):
-                        if existing.summit_history:
-                            existing.summit_history = [existing.summit_history]
-                        else:
-                            existing.summit_history = []
-                    elif not existing.summit_history:
-                        existing.summit_history = []
-                    # Only append if not already present
-                    if summit_history_val not in existing.summit_history:
-                        existing.summit_history.append(summit_history_val)
-                if email_state:
-                    existing.email_state = email_state
-                if email_sub_state:
-                    existing.email_sub_state = email_sub_state
-                db.add(existing)
-                logger.info(f"Updated contact: {email} ({existing.id}) with merged tags and main bucket.")
-            else:
-                contact = Contact(
-                    id=contact_uuid,
-                    email=email,
-                    full_name=full_name,
-                    tags=tags,
-                    is_in_main_bucket_biz=is_biz,
-                    is_in_main_bucket_health=is_health,
-                    is_in_main_bucket_survivalist=is_survivalist,
-                    engagement_level=engagement_level,
-                    email_state=email_state,
-                    email_sub_state=email_sub_state,
-                    summit_history=[summit_history_val] if summit_history_val else [],
-                )
-                db.add(contact)
-                logger.info(f"Inserted new contact: {email} ({contact_uuid}) with main bucket.")
-            contacts.append(email)
-        db.commit()
-        logger.info(f"Successfully upserted {len(contacts)} contacts.")
-        return {"total": len(contacts), "success": len(contacts)}
+        if background == '1':
+            path = await run_in_threadpool(_spool_upload, file, ".csv")
+            job = await run_in_threadpool(JobService(db).enqueue, "ingest_csv", {
+                "path": path,
+                "filename": file.filename,
+                "main_bucket": main_bucket,
+                "main_bucket_in_csv": main_bucket_in_csv == '1',
+                "categorize": categorize == '1',
+                "force": force == '1',
+            })
+            return {"task_id": str(job.id), "status": job.status}
+        result = await run_in_threadpool(
+            _ingest_upload,
+            db,
+            file,
+            main_bucket=main_bucket,
+            main_bucket_in_csv=main_bucket_in_csv == '1',
+            categorize=categorize == '1',
+            force=force == '1',
+        )
+        return {
+            "total": result["total"],
+            "success": result["total"],
+            "skipped": result["skipped"],
+            "categorized": result["categorized"],
+            "batches": result["batches"],
+            "ledger": result["ledger"],
+        }
     except Exception as e:
-        db.rollback()
         logger.error(f"Upload failed: {str(e)}")
         raise HTTPException(500, str(e))
 
+def _ingest_upload(db: Session, file: UploadFile, **options):
+    """Stream an uploaded CSV into contacts batch by batch."""
+    if options.get("categorize"):
+        TagMappingService(db).ensure_installed()
+    result = IngestService(db).ingest_csv_file(file.file, file.filename, **options)
+    logger.info(f"Successfully upserted {result['total']} contacts ({result['inserted']} new, {result['updated']} updated) in {len(result['batches'])} batches.")
+    return result
+
+def _spool_upload(file: UploadFile, suffix: str) -> str:
+    """Copy an upload to a temp file a background job can open later."""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        shutil.copyfileobj(file.file, tmp)
+        return tmp.name
+
 @router.post("/upload-zip")
 async def upload_zip_contacts(
     file: UploadFile = File(...),
     use_folders: str = Form('1'),
     main_bucket: str = Form(None),
+    background: str = Form('0'),
+    categorize: str = Form('0'),
+    force: str = Form('0'),
     db: Session = Depends(get_db)
 ):
-    # Save the uploaded ZIP to a temp file
-    with tempfile.TemporaryDirectory() as tmpdir:
-        zip_path = os.path.join(tmpdir, file.filename)
-        with open(zip_path, 'wb') as f:
-            f.write(await file.read())
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(tmpdir)
-        # Walk the extracted files
-        for root, dirs, files in os.walk(tmpdir):
-            for fname in files:
-                if fname.endswith('.csv'):
-                    csv_path = os.path.join(root, fname)
-                    # Determine main bucket from folder name if use_folders is set
-                    bucket = None
-                    if use_folders == '1':
-                        rel_path = os.path.relpath(root, tmpdir)
-                        folder = rel_path.split(os.sep)[0] if rel_path != '.' else None
-                        if folder and folder.lower() in ['biz', 'business', 'business operations']:
-                            bucket = 'biz'
-                        elif folder and folder.lower() in ['health']:
-                            bucket = 'health'
-                        elif folder and folder.lower() in ['survivalist']:
-                            bucket = 'survivalist'
-                        else:
-                            bucket = 'none'
-                    else:
-                        bucket = main_bucket or 'none'
-                    # Open and process the CSV as in upload_csv_contacts
-                    with open(csv_path, 'r', encoding='utf-8') as csvfile:
-                        csv_content = csvfile.read()
-                    # Here you would call the CSV processing logic with csv_content and bucket
-                    # For now, just log the action
-                    logger.info(f"Would process {csv_path} with main_bucket={bucket}")
-                    # TODO: Actually process the CSV as in upload_csv_contacts
-    return {"status": "success"}
-
-def parse_engagement_and_history(filename):
-    # Example: H-Common Sense.csv -> ('H', 'Common Sense')
-    base = os.path.splitext(os.path.basename(filename))[0]
-    match = re.match(r'([HMLU])-\s*(.+)', base, re.IGNORECASE)
-    if match:
-        engagement = match.group(1).upper()
-        history = match.group(2).strip()
-        return engagement, history
-    return None, base
+    logger.info(f"Received upload-zip request: {file.filename} with use_folders={use_folders}, main_bucket={main_bucket}")
+    if not file.filename.endswith('.zip'):
+        logger.error("Upload failed: Only ZIP files are supported")
+        raise HTTPException(400, "Only ZIP files are supported")
+    try:
+        if background == '1':
+            path = await run_in_threadpool(_spool_upload, file, ".zip")
+            job = await run_in_threadpool(JobService(db).enqueue, "ingest_zip", {
+                "path": path,
+                "use_folders": use_folders == '1',
+                "main_bucket": main_bucket,
+                "categorize": categorize == '1',
+                "force": force == '1',
+            })
+            return {"status": "queued", "task_id": str(job.id)}
+        result = await run_in_threadpool(
+            IngestService(db).ingest_zip,
+            file.file,
+            use_folders=use_folders == '1',
+            main_bucket=main_bucket,
+            categorize=categorize == '1',
+            force=force == '1',
+        )
+    except zipfile.BadZipFile:
+        raise HTTPException(400, "Invalid ZIP file")
+    except Exception as e:
+        logger.error(f"Upload failed: {str(e)}")
+        raise HTTPException(500, str(e))
+    logger.info(f"Successfully upserted {result['total']} contacts from {len(result['files'])} files.")
+    return {"status": "success", **result}
 
 @router.get("/personality-buckets")
-def get_personality_buckets(db: Session = Depends(get_db)):
+async def get_personality_buckets(request: Request, db: AsyncSession = Depends(get_async_db)):
     batch_service = BatchService(db)
-    import asyncio
-    return asyncio.run(batch_service.get_personality_buckets())
+    return await cached_json_async(request, db, batch_service.get_personality_buckets)
 
 @router.get("/tags")
-def get_all_tags(db: Session = Depends(get_db)):
-    all_tags = db.query(Contact.tags).all()
-    tag_set = set()
-    for tags in all_tags:
-        if tags and tags[0]:
-            tag_set.update(tags[0])
-    return {"tags": sorted(tag_set)}
+def get_all_tags(request: Request, db: Session = Depends(get_db)):
+    return cached_json(request, db, lambda: {"tags": TagIndexService(db).tag_names()})
+
+@router.post("/tags/rebuild")
+def rebuild_tag_index(db: Session = Depends(get_db)):
+    """Rebuild the tags / contact_tags index from contacts.tags in the background."""
+    job = JobService(db).enqueue("rebuild_tag_index")
+    return {"status": "queued", "task_id": str(job.id)}
+
+@router.get("/tags/co-occurrence")
+def get_tag_co_occurrence(tags: List[str] = Query(...), db: Session = Depends(get_db)):
+    """Contacts carrying each of the given tags and each pair of them, from the in-memory tag bitmaps."""
+    tags = list(dict.fromkeys(tags))
+    if len(tags) > CO_OCCURRENCE_MAX_TAGS:
+        raise HTTPException(400, f"At most {CO_OCCURRENCE_MAX_TAGS} tags can be compared at once")
+    ensure_built(db)
+    counts, pairs = TAG_BITMAPS.co_occurrence(tags)
+    return {"tags": counts, "pairs": pairs}
 
 @router.post("/clear-personality-buckets")
 def clear_personality_buckets(db: Session = Depends(get_db)):
+    rollup = RollupService(db)
+    rollup.subtract("true")
     db.query(Contact).update({Contact.personality_bucket_assignment: None})
+    rollup.add("true")
     db.commit()
     return {"status": "success", "message": "All personality bucket assignments cleared."}
 
+@router.get("/tag-mapping")
+def get_tag_mapping_version(db: Session = Depends(get_db)):
+    """Describe the latest tag mapping version and what it changed."""
+    return TagMappingService(db).describe()
+
+@router.post("/tag-mapping/reload")
+def reload_tag_mapping(recategorize: bool = True, db: Session = Depends(get_db)):
+    """Reload the Knowledgebase mapping and recategorize only contacts whose tags changed."""
+    try:
+        return TagMappingService(db).reload(recategorize=recategorize)
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(500, str(e))
+
 @router.get("/export-fields")
-def get_exportable_fields():
+def get_exportable_fields(request: Request, db: Session = Depends(get_db)):
     # Return all column names except id
     from ..models.contact import Contact
     mapper = inspect(Contact)
     fields = [col.key for col in mapper.attrs if col.key != "id"]
-    return {"fields": fields}
+    return cached_json(request, db, lambda: {"fields": fields})
 
 @router.post("/export")
-def export_contacts(data: dict, db: Session = Depends(get_db)):
-    buckets = data.get("buckets", [])
-    fields = data.get("fields", [
-        "email", "full_name", "company", "main_bucket_assignment",
-        "personality_bucket_assignment", "tags", "summit_history"
-    ])
-    contacts = db.query(Contact).filter(
-        or_(
-            Contact.main_bucket_assignment.in_(buckets),
-            Contact.personality_bucket_assignment.in_(buckets)
+def export_contacts(data: dict, request: Request):
+    """Stream the contacts in the given buckets as CSV, Parquet or Arrow.
+
+    Rows are read through a server-side cursor and written out batch by
+    batch. "format" is "csv" (the default), "parquet" or "arrow" (an Arrow
+    IPC stream); the columnar formats keep list and timestamp types. CSV is
+    gzip-encoded when the client accepts it (or when the body sets
+    "gzip": true).
+    """
+    return _export_response(bucket_condition(data.get("buckets", [])), data, request)
+
+def _export_response(condition, data: dict, request: Request, filename: str = "contacts"):
+    """Stream the contacts matching condition in the format, fields and encoding data asks for."""
+    fields = data.get("fields", DEFAULT_EXPORT_FIELDS)
+    fmt = data.get("format", "csv")
+    if fmt in COLUMNAR_FORMATS:
+        media_type, extension = COLUMNAR_FORMATS[fmt]
+        return StreamingResponse(
+            iter_columnar(condition, fields, fmt),
+            media_type=media_type,
+            headers={"Content-Disposition": f"attachment; filename={filename}.{extension}"}
         )
-    ).all()
-    output = io.StringIO()
-    writer = csv.writer(output)
-    writer.writerow([f.replace("_", " ").title() for f in fields])
-    for contact in contacts:
-        row = []
-        for f in fields:
-            val = getattr(contact, f, "")
-            if isinstance(val, list):
-                val = ",".join(val)
-            row.append(val)
-        writer.writerow(row)
-    output.seek(0)
-    return StreamingResponse(
-        iter([output.getvalue()]),
-        media_type="text/csv",
-        headers={"Content-Disposition": "attachment; filename=contacts.csv"}
-    )
+    if fmt != "csv":
+        raise HTTPException(400, f"format must be one of csv, {', '.join(COLUMNAR_FORMATS)}")
+    chunks = iter_csv(condition, fields)
+    headers = {"Content-Disposition": f"attachment; filename={filename}.csv", "Vary": "Accept-Encoding"}
+    if data.get("gzip", accepts_gzip(request.headers)):
+        chunks = gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(chunks, media_type="text/csv", headers=headers)
+
+@router.get("/segments/count")
+def count_segment(query: str, db: Session = Depends(get_db)):
+    """Number of contacts matching a boolean segment expression (see parse_segment)."""
+    segment, condition = _segment(query)
+    return {"query": segment, "count": exact_count(db, select(Contact.id).where(condition))}
+
+@router.post("/segments/export")
+def export_segment(data: dict, request: Request):
+    """Stream the contacts matching data["query"], with the /export formats and fields."""
+    _, condition = _segment(data.get("query", ""))
+    return _export_response(condition, data, request, filename="segment")
 
 @router.get("/tags-with-counts")
-def get_tags_with_counts(db: Session = Depends(get_db)):
-    all_tags = db.query(Contact.tags).all()
-    tag_counts = {}
-    for tags in all_tags:
-        if tags and tags[0]:
-            for tag in tags[0]:
-                tag_counts[tag] = tag_counts.get(tag, 0) + 1
-    tag_count_list = [
-        {"tag": tag, "count": count} for tag, count in sorted(tag_counts.items(), key=lambda x: (-x[1], x[0]))
-    ]
-    return {"tags": tag_count_list} 
\ No newline at end of file
+def get_tags_with_counts(request: Request, db: Session = Depends(get_db)):
+    return cached_json(request, db, lambda: {"tags": TagIndexService(db).tag_counts()}) 
\ No newline at end of file
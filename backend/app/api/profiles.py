@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from fastapi.responses import FileResponse, PlainTextResponse
+from typing import Optional
+from ..core.profiling import list_profiles, profile_file, profile_report, token_matches
+
+def require_token(x_profile_token: Optional[str] = Header(None)):
+    if not token_matches(x_profile_token):
+        raise HTTPException(403, "Invalid or missing X-Profile-Token")
+
+# Only mounted when PROFILING_ENABLED is set
+router = APIRouter(dependencies=[Depends(require_token)])
+
+@router.get("/")
+def get_profiles():
+    """Stored request profiles, newest first."""
+    return {"profiles": list_profiles()}
+
+@router.get("/{profile_id}", response_class=PlainTextResponse)
+def get_profile_report(profile_id: str, sort: str = "cumulative", limit: int = 50):
+    """The top functions of a profile as a pstats table."""
+    try:
+        report = profile_report(profile_id, sort=sort, limit=min(max(limit, 1), 1000))
+    except KeyError:
+        raise HTTPException(400, f"Unknown sort key: {sort}")
+    if report is None:
+        raise HTTPException(404, "Profile not found")
+    return report
+
+@router.get("/{profile_id}/pstats")
+def download_pstats(profile_id: str):
+    """The raw profile, for python -m pstats or snakeviz."""
+    path = profile_file(profile_id, "pstats")
+    if not path:
+        raise HTTPException(404, "Profile not found")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.pstats")
+
+@router.get("/{profile_id}/collapsed")
+def download_collapsed(profile_id: str):
+    """Folded stacks for flamegraph.pl or speedscope; sample mode only."""
+    path = profile_file(profile_id, "collapsed")
+    if not path:
+        raise HTTPException(404, "No collapsed stacks for this profile")
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.collapsed")
@@ -0,0 +1,114 @@
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from starlette.requests import ClientDisconnect
+import logging
+from ..core.database import get_db
+from ..services.upload_service import ChunkWriter, UploadConflict, UploadService
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+# Bytes of a chunk collected before each write to the data file
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+def _conflict(e: UploadConflict) -> JSONResponse:
+    # The client continues from the returned offset
+    return JSONResponse(
+        status_code=409,
+        content={"detail": str(e), "offset": e.offset},
+        headers={"Upload-Offset": str(e.offset)},
+    )
+
+def _get_upload(service: UploadService, upload_id: str):
+    upload = service.get(upload_id)
+    if upload is None:
+        raise HTTPException(404, "Upload not found")
+    return upload
+
+@router.post("/")
+def create_upload(data: dict, db: Session = Depends(get_db)):
+    """Start a resumable upload of a CSV or ZIP file.
+
+    The body has "filename", "size" in bytes, and the /upload-csv or
+    /upload-zip options: "main_bucket", "main_bucket_in_csv",
+    "use_folders" and "categorize". Chunks are then PUT in order.
+    """
+    options = {
+        "main_bucket": data.get("main_bucket") or None,
+        "main_bucket_in_csv": bool(data.get("main_bucket_in_csv", False)),
+        "use_folders": bool(data.get("use_folders", True)),
+        "categorize": bool(data.get("categorize", False)),
+    }
+    service = UploadService(db)
+    try:
+        upload = service.create(data.get("filename"), data.get("size"), options)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+    return service.describe(upload)
+
+@router.get("/{upload_id}")
+def get_upload(upload_id: str, db: Session = Depends(get_db)):
+    """An upload's received offset (where the next chunk starts) and its ingest task."""
+    service = UploadService(db)
+    return service.describe(_get_upload(service, upload_id))
+
+@router.put("/{upload_id}")
+async def put_upload_chunk(upload_id: str, request: Request, offset: int = Query(..., ge=0), db: Session = Depends(get_db)):
+    """Append the raw request body at offset, which must equal the bytes received so far.
+
+    The body is written as it arrives, so a chunk cut off midway keeps
+    what was received; a 409 carries the offset to continue from.
+    """
+    service = UploadService(db)
+    upload = await run_in_threadpool(_get_upload, service, upload_id)
+    if upload.status != "receiving":
+        raise HTTPException(409, f"Upload is {upload.status}")
+    try:
+        writer = await run_in_threadpool(ChunkWriter, upload, offset)
+    except UploadConflict as e:
+        return _conflict(e)
+    fits = True
+    buffer = bytearray()
+    try:
+        async for piece in request.stream():
+            buffer += piece
+            if len(buffer) >= WRITE_BUFFER_SIZE:
+                fits = await run_in_threadpool(writer.write, bytes(buffer)) and fits
+                buffer.clear()
+    except ClientDisconnect:
+        logger.warning(f"Client disconnected during a chunk of upload {upload_id}; keeping {writer.offset + len(buffer)} bytes.")
+    finally:
+        try:
+            if buffer:
+                fits = await run_in_threadpool(writer.write, bytes(buffer)) and fits
+        finally:
+            await run_in_threadpool(writer.close)
+    upload = await run_in_threadpool(service.chunk_received, upload.id, writer.offset)
+    if not fits:
+        raise HTTPException(400, f"Chunk runs past the declared size of {upload.size} bytes")
+    return service.describe(upload)
+
+@router.post("/{upload_id}/finalize")
+def finalize_upload(upload_id: str, db: Session = Depends(get_db)):
+    """Confirm every byte has been received.
+
+    Ingestion started with the first chunk; poll task_id on
+    /categorize/status/{task_id} until it completes.
+    """
+    service = UploadService(db)
+    _get_upload(service, upload_id)
+    try:
+        upload = service.finalize(upload_id)
+    except UploadConflict as e:
+        return _conflict(e)
+    return service.describe(upload)
+
+@router.delete("/{upload_id}")
+def abort_upload(upload_id: str, db: Session = Depends(get_db)):
+    """Abort an upload and delete its data; contacts already ingested stay."""
+    service = UploadService(db)
+    _get_upload(service, upload_id)
+    return service.describe(service.abort(upload_id))
@@ -0,0 +1,106 @@
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import threading
+import time
+from typing import Dict, Optional
+
+LOG_FILE = os.getenv("LOG_FILE", "app.log")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_FORMAT = "%(asctime)s [%(levelname)s] %(name)s: %(message)s"
+
+# Records logged with extra={"sample_key": ...} are sampled per key and window:
+# the first LOG_SAMPLE_FIRST pass, then one in every LOG_SAMPLE_EVERY.
+LOG_SAMPLE_FIRST = int(os.getenv("LOG_SAMPLE_FIRST", "10"))
+LOG_SAMPLE_EVERY = int(os.getenv("LOG_SAMPLE_EVERY", "1000"))
+LOG_SAMPLE_WINDOW = float(os.getenv("LOG_SAMPLE_WINDOW", "60"))
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class SamplingFilter(logging.Filter):
+    """Drops most repeats of records that carry a sample_key.
+
+    A record that passes after others were dropped has the number of
+    suppressed records appended to its message.
+    """
+
+    def __init__(self, first: int = LOG_SAMPLE_FIRST, every: int = LOG_SAMPLE_EVERY, window: float = LOG_SAMPLE_WINDOW):
+        super().__init__()
+        self.first = first
+        self.every = every
+        self.window = window
+        self._counts: Dict[str, list] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        key = getattr(record, "sample_key", None)
+        if key is None:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            # [window start, records seen, records suppressed since the last one passed]
+            state = self._counts.get(key)
+            if state is None or now - state[0] >= self.window:
+                state = self._counts[key] = [now, 0, 0]
+            state[1] += 1
+            seen = state[1]
+            if seen > self.first and (seen - self.first) % self.every:
+                state[2] += 1
+                return False
+            suppressed, state[2] = state[2], 0
+        if suppressed:
+            record.msg = f"{record.getMessage()} ({suppressed} similar messages suppressed)"
+            record.args = None
+        return True
+
+
+def setup_logging() -> None:
+    """Route all logging through a queue to a rotating file and the console.
+
+    Callers only pay for putting a record on the queue; a background
+    QueueListener thread does the formatting and file writes.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    formatter = logging.Formatter(LOG_FORMAT)
+    file_handler = logging.handlers.RotatingFileHandler(
+        LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT, encoding="utf-8"
+    )
+    file_handler.setFormatter(formatter)
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter())
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+
+def tail_log(lines: int = 100, path: str = LOG_FILE, block_size: int = 8192) -> str:
+    """Return the last lines of a log file, reading backwards from the end."""
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        data = b""
+        # One extra newline, since the file normally ends with one
+        while position > 0 and data.count(b"\n") <= lines:
+            step = min(block_size, position)
+            position -= step
+            f.seek(position)
+            data = f.read(step) + data
+    return b"\n".join(data.splitlines()[-lines:]).decode("utf-8", errors="replace") + "\n" if data else ""
@@ -0,0 +1,59 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Idempotent schema changes for existing tables. Base.metadata.create_all()
+# only creates missing tables, so new columns and indexes on tables that
+# already exist are added here. Append new statements to the end.
+MIGRATIONS = [
+    "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS checkpoint VARCHAR",
+    "ALTER TABLE contacts ADD COLUMN IF NOT EXISTS tag_mapping_version INTEGER",
+    # Case-insensitive tag lookups (?|) for mapping-change recategorization
+    "CREATE INDEX IF NOT EXISTS ix_contacts_tags_lower ON contacts USING gin ((lower(tags::text)::jsonb))",
+    # Prefix search (lower(x) LIKE 'term%') regardless of the database collation
+    "CREATE INDEX IF NOT EXISTS ix_contacts_email_prefix ON contacts (lower(email) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_full_name_prefix ON contacts (lower(full_name) text_pattern_ops)",
+    # Keyset pagination on GET /contacts, one per KEYSET_SORT_FIELDS column
+    "CREATE INDEX IF NOT EXISTS ix_contacts_email_id ON contacts (email, id)",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_full_name_id ON contacts (full_name, id)",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_company_id ON contacts (company, id)",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_main_bucket_id ON contacts (main_bucket_assignment, id)",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_personality_bucket_id ON contacts (personality_bucket_assignment, id)",
+    # Contact ordinals for the in-memory tag bitmaps; existing rows are numbered here
+    "ALTER TABLE contacts ADD COLUMN IF NOT EXISTS ordinal BIGINT GENERATED BY DEFAULT AS IDENTITY",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_contacts_ordinal ON contacts (ordinal)",
+    # Response cache generation, bumped by every commit that writes contact data
+    "CREATE TABLE IF NOT EXISTS data_generation (id INTEGER PRIMARY KEY, generation BIGINT NOT NULL)",
+    "INSERT INTO data_generation (id, generation) VALUES (1, 0) ON CONFLICT (id) DO NOTHING",
+    # Job leases, so only jobs of stopped processes are resumed
+    "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS worker_id VARCHAR",
+    "ALTER TABLE jobs ADD COLUMN IF NOT EXISTS lease_expires_at TIMESTAMP WITH TIME ZONE",
+    # Tag filters go through contact_tags, so the GIN index on contacts.tags only cost writes
+    "DROP INDEX IF EXISTS ix_contacts_tags",
+]
+
+# Substring search on GET /contacts (lower(x) LIKE '%term%'). These need the
+# pg_trgm contrib extension; servers without it skip them with a warning and
+# substring search falls back to a sequential scan.
+TRIGRAM_MIGRATIONS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_email_trgm ON contacts USING gin (lower(email) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_contacts_full_name_trgm ON contacts USING gin (lower(full_name) gin_trgm_ops)",
+]
+
+
+def run_migrations(engine: Engine) -> None:
+    """Apply every migration statement; each one is safe to re-run."""
+    with engine.begin() as conn:
+        for statement in MIGRATIONS:
+            conn.execute(text(statement))
+    logger.info(f"Applied {len(MIGRATIONS)} schema migrations.")
+    try:
+        with engine.begin() as conn:
+            for statement in TRIGRAM_MIGRATIONS:
+                conn.execute(text(statement))
+    except DBAPIError as e:
+        logger.warning(f"Skipping trigram search indexes: {e.orig}")
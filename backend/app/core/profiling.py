@@ -0,0 +1,297 @@
+from collections import defaultdict
+from starlette.concurrency import run_in_threadpool
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+import cProfile
+import hmac
+import io
+import json
+import logging
+import marshal
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Admin switch: without it the middleware and the /profiles routes are not installed at all
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+# Profiled requests and /profiles must send it as X-Profile-Token; required when enabled
+PROFILING_TOKEN = os.getenv("PROFILING_TOKEN", "")
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Most recent profiles kept on disk
+PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "50"))
+# Seconds between stack samples in "sample" mode
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+
+# "sample" snapshots every thread's stack on a timer, so work handed to the
+# threadpool (sync routes, uploads, streamed exports) shows up; "cprofile"
+# traces every call, but only on the event loop thread.
+PROFILER_MODES = ("sample", "cprofile")
+DEFAULT_PROFILER_MODE = "sample"
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+# Longest X-Request-ID kept in a profile's metadata
+_MAX_REQUEST_ID = 200
+# Leaf frames of threads that are waiting rather than working
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("selectors.py", "select"),
+    ("queue.py", "get"),
+    ("handlers.py", "dequeue"),
+}
+_MAX_DEPTH = 200
+
+# One profile at a time; cProfile and the sampler both see the whole process
+_active = threading.Lock()
+
+Frame = Tuple[str, int, str]
+
+
+if PROFILING_ENABLED and not PROFILING_TOKEN:
+    raise ValueError("PROFILING_TOKEN must be set when PROFILING_ENABLED=1")
+
+
+def token_matches(token: Optional[str]) -> bool:
+    return bool(PROFILING_TOKEN) and hmac.compare_digest(token or "", PROFILING_TOKEN)
+
+
+def _stack(frame) -> Tuple[Frame, ...]:
+    """(filename, first line, function) from the outermost frame to frame."""
+    stack = []
+    while frame is not None and len(stack) < _MAX_DEPTH:
+        code = frame.f_code
+        stack.append((code.co_filename, code.co_firstlineno, code.co_name))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+def _is_idle(stack: Tuple[Frame, ...]) -> bool:
+    filename, _, name = stack[-1]
+    return (os.path.basename(filename), name) in _IDLE_FRAMES
+
+
+def _label(frame: Frame) -> str:
+    filename, line, name = frame
+    return f"{name} ({filename}:{line})".replace(";", ":").replace(" ", "_")
+
+
+class SamplingProfiler:
+    """Samples the stacks of all other threads every interval seconds."""
+
+    def __init__(self, interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.interval = interval
+        # (thread name, stack) -> [samples, seconds]
+        self.samples: Dict[Tuple[str, Tuple[Frame, ...]], List[float]] = defaultdict(lambda: [0, 0.0])
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            elapsed, last = now - last, now
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = _stack(frame)
+                if not stack or _is_idle(stack):
+                    continue
+                sample = self.samples[(names.get(ident, str(ident)), stack)]
+                sample[0] += 1
+                sample[1] += elapsed
+
+    def collapsed(self) -> str:
+        """Folded stacks ("thread;outer;...;leaf count"), as read by flamegraph.pl and speedscope."""
+        lines = defaultdict(int)
+        for (thread, stack), (count, _) in self.samples.items():
+            lines[";".join([thread.replace(" ", "_"), *map(_label, stack)])] += count
+        return "".join(f"{line} {count}\n" for line, count in sorted(lines.items()))
+
+    def stats(self) -> Dict:
+        """The samples as a pstats table; call counts are sample counts."""
+        stats = {}
+        callers = defaultdict(lambda: defaultdict(lambda: [0, 0, 0.0, 0.0]))
+        for (_, stack), (count, seconds) in self.samples.items():
+            # Recursive functions count once per sample towards their cumulative time
+            for frame in set(stack):
+                entry = stats.setdefault(frame, [0, 0, 0.0, 0.0])
+                entry[0] += count
+                entry[1] += count
+                entry[3] += seconds
+            stats[stack[-1]][2] += seconds
+            for caller, callee in zip(stack, stack[1:]):
+                edge = callers[callee][caller]
+                edge[0] += count
+                edge[1] += count
+                edge[3] += seconds
+                if callee == stack[-1]:
+                    edge[2] += seconds
+        return {
+            frame: (cc, nc, tt, ct, {caller: tuple(edge) for caller, edge in callers[frame].items()})
+            for frame, (cc, nc, tt, ct) in stats.items()
+        }
+
+
+def _profile_path(profile_id: str, extension: str) -> str:
+    return os.path.join(PROFILE_DIR, f"{profile_id}.{extension}")
+
+
+def save_profile(profile_id: str, meta: Dict, profiler) -> None:
+    """Write <id>.pstats, <id>.collapsed (sample mode) and <id>.json to PROFILE_DIR."""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    if isinstance(profiler, SamplingProfiler):
+        with open(_profile_path(profile_id, "pstats"), "wb") as f:
+            marshal.dump(profiler.stats(), f)
+        with open(_profile_path(profile_id, "collapsed"), "w", encoding="utf-8") as f:
+            f.write(profiler.collapsed())
+        meta["samples"] = sum(count for count, _ in profiler.samples.values())
+    else:
+        profiler.dump_stats(_profile_path(profile_id, "pstats"))
+    with open(_profile_path(profile_id, "json"), "w") as f:
+        json.dump(meta, f)
+    _prune()
+
+
+def _prune() -> None:
+    metas = sorted(
+        (entry for entry in os.scandir(PROFILE_DIR) if entry.name.endswith(".json")),
+        key=lambda entry: entry.stat().st_mtime,
+        reverse=True,
+    )
+    for entry in metas[PROFILE_KEEP:]:
+        profile_id = entry.name[: -len(".json")]
+        for extension in ("json", "pstats", "collapsed"):
+            try:
+                os.remove(_profile_path(profile_id, extension))
+            except FileNotFoundError:
+                pass
+
+
+def list_profiles() -> List[Dict]:
+    """Metadata of the stored profiles, newest first."""
+    if not os.path.isdir(PROFILE_DIR):
+        return []
+    profiles = []
+    for entry in os.scandir(PROFILE_DIR):
+        if entry.name.endswith(".json"):
+            with open(entry.path) as f:
+                profiles.append(json.load(f))
+    return sorted(profiles, key=lambda meta: meta["started_at"], reverse=True)
+
+
+def profile_file(profile_id: str, extension: str) -> Optional[str]:
+    """Path of a stored profile file, or None if there is none."""
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    path = _profile_path(profile_id, extension)
+    return path if os.path.exists(path) else None
+
+
+def profile_report(profile_id: str, sort: str = "cumulative", limit: int = 50) -> Optional[str]:
+    """The pstats table of a stored profile as text."""
+    path = profile_file(profile_id, "pstats")
+    if not path:
+        return None
+    out = io.StringIO()
+    pstats.Stats(path, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
+
+
+def _requested_mode(scope) -> Tuple[Optional[str], Optional[str]]:
+    """The profiler mode asked for by X-Profile or ?profile=, and the X-Profile-Token sent."""
+    headers = dict(scope["headers"])
+    value = headers.get(b"x-profile", b"").decode("latin-1")
+    if not value:
+        value = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("profile", [""])[0]
+    token = headers.get(b"x-profile-token", b"").decode("latin-1")
+    if not value or value.lower() in ("0", "false"):
+        return None, token
+    if value.lower() in ("1", "true"):
+        return DEFAULT_PROFILER_MODE, token
+    return value.lower(), token
+
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests that carry X-Profile or ?profile=.
+
+    The flag is 1 (the default profiler) or a mode from PROFILER_MODES. The
+    profile is stored under a new id, returned as X-Profile-Id; the
+    request's X-Request-ID is only kept in its metadata. Only installed
+    when PROFILING_ENABLED is set.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        mode, token = _requested_mode(scope)
+        if mode not in PROFILER_MODES or not token_matches(token):
+            if mode:
+                logger.warning(f"Ignoring profile request for {scope['path']}: unknown mode or bad token.")
+            await self.app(scope, receive, send)
+            return
+        if not _active.acquire(blocking=False):
+            logger.warning(f"Not profiling {scope['path']}: another request is being profiled.")
+            await self.app(scope, receive, send)
+            return
+
+        profile_id = uuid.uuid4().hex
+        request_id = dict(scope["headers"]).get(b"x-request-id", b"").decode("latin-1")
+        meta = {
+            "profile_id": profile_id,
+            "request_id": request_id[:_MAX_REQUEST_ID] or None,
+            "mode": mode,
+            "method": scope["method"],
+            "path": scope["path"],
+            "query": scope.get("query_string", b"").decode("latin-1"),
+            "started_at": time.time(),
+            "status": 500,
+        }
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                meta["status"] = message["status"]
+                message["headers"] = [*message.get("headers", []), (b"x-profile-id", profile_id.encode())]
+            await send(message)
+
+        profiler = SamplingProfiler() if mode == "sample" else cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            if mode == "sample":
+                profiler.start()
+            else:
+                profiler.enable()
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if mode == "sample":
+                    profiler.stop()
+                else:
+                    profiler.disable()
+        finally:
+            _active.release()
+            meta["seconds"] = round(time.perf_counter() - start, 4)
+            try:
+                await run_in_threadpool(save_profile, profile_id, meta, profiler)
+                logger.info(f"Saved {mode} profile {profile_id} for {scope['method']} {scope['path']} ({meta['seconds']}s).")
+            except Exception as e:
+                logger.error(f"Could not save profile {profile_id}: {e}")
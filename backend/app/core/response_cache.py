@@ -0,0 +1,139 @@
+from collections import OrderedDict
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from typing import Any, Awaitable, Callable, Optional, Tuple
+import hashlib
+import json
+import os
+import re
+import threading
+
+# Serialized bodies kept for the cached read endpoints
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+
+# A committed statement that writes one of these tables bumps the data generation.
+# Job bookkeeping (the jobs table) does not, so progress updates keep the cache warm.
+_WRITE_STATEMENT = re.compile(r"\b(?:INSERT|UPDATE|DELETE|TRUNCATE)\b", re.IGNORECASE)
+_CACHED_TABLES = re.compile(r"\b(?:contacts|contact_tags|contact_rollup|tags)\b", re.IGNORECASE)
+# DDL such as a foreign key's ON DELETE CASCADE is not a data write
+_DDL_STATEMENT = re.compile(r"^\s*(?:CREATE|ALTER|DROP)\b", re.IGNORECASE)
+_WROTE_KEY = "response_cache_wrote"
+
+# The generation lives in the database (the data_generation row created by
+# migrations), so a write committed by any server process invalidates the
+# cache in all of them.
+_BUMP_GENERATION = "UPDATE data_generation SET generation = generation + 1 WHERE id = 1"
+_READ_GENERATION = text("SELECT generation FROM data_generation WHERE id = 1")
+
+
+def current_generation(db: Session) -> int:
+    return db.execute(_READ_GENERATION).scalar_one()
+
+
+async def current_generation_async(db: AsyncSession) -> int:
+    return (await db.execute(_READ_GENERATION)).scalar_one()
+
+
+def track_writes(engine: Engine) -> None:
+    """Bump the generation in the same transaction when one on engine that wrote contact data commits.
+
+    Covers every write path, ORM or text(), without each one having to
+    remember to invalidate. Pass async_engine.sync_engine for the async engine.
+    """
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _note_write(conn, cursor, statement, parameters, context, executemany):
+        if _WRITE_STATEMENT.search(statement) and _CACHED_TABLES.search(statement) and not _DDL_STATEMENT.match(statement):
+            conn.info[_WROTE_KEY] = True
+
+    @event.listens_for(engine, "commit")
+    def _commit(conn):
+        # Runs just before the COMMIT. The raw cursor keeps the bump out of
+        # these events, and the row lock is only held while committing.
+        if conn.info.pop(_WROTE_KEY, False):
+            cursor = conn.connection.cursor()
+            try:
+                cursor.execute(_BUMP_GENERATION)
+            finally:
+                cursor.close()
+
+    @event.listens_for(engine, "rollback")
+    def _rollback(conn):
+        conn.info.pop(_WROTE_KEY, None)
+
+
+class ResponseCache:
+    """LRU of serialized JSON bodies, each valid for the generation it was built in."""
+
+    def __init__(self, maxsize: int = RESPONSE_CACHE_SIZE):
+        self.maxsize = maxsize
+        # key -> (generation, etag, body)
+        self._entries: "OrderedDict[Tuple, Tuple[int, str, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple, generation: int) -> Optional[Tuple[str, bytes]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != generation:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1], entry[2]
+
+    def put(self, key: Tuple, generation: int, payload: Any) -> Tuple[str, bytes]:
+        body = json.dumps(jsonable_encoder(payload), separators=(",", ":")).encode("utf-8")
+        # Content-based, so an unchanged body still revalidates after a write
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        with self._lock:
+            self._entries[key] = (generation, etag, body)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return etag, body
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+RESPONSE_CACHE = ResponseCache()
+
+
+def _cache_key(request: Request) -> Tuple:
+    return request.url.path, str(request.query_params)
+
+
+def _respond(request: Request, etag: str, body: bytes) -> Response:
+    # no-cache: browsers keep the body but revalidate it with If-None-Match every time
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+def cached_json(request: Request, db: Session, compute: Callable[[], Any]) -> Response:
+    """Serve compute()'s JSON from the cache, with ETag / 304 handling.
+
+    compute only runs when nothing was cached since the last data write.
+    """
+    key = _cache_key(request)
+    # Read before computing, so a write during compute leaves the entry stale
+    generation = current_generation(db)
+    hit = RESPONSE_CACHE.get(key, generation)
+    if hit is None:
+        hit = RESPONSE_CACHE.put(key, generation, compute())
+    return _respond(request, *hit)
+
+
+async def cached_json_async(request: Request, db: AsyncSession, compute: Callable[[], Awaitable[Any]]) -> Response:
+    """cached_json for endpoints that compute their payload asynchronously."""
+    key = _cache_key(request)
+    generation = await current_generation_async(db)
+    hit = RESPONSE_CACHE.get(key, generation)
+    if hit is None:
+        hit = RESPONSE_CACHE.put(key, generation, await compute())
+    return _respond(request, *hit)
@@ -1,23 +1,25 @@
 import logging
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, PlainTextResponse
-from .api import contacts
-from .core.database import engine, Base
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
+from .api import contacts, profiles, uploads
+from .core.database import engine, Base, SessionLocal
+from .core.logging import LOG_FILE, setup_logging, tail_log
+from .core import metrics, profiling
+from .core.migrations import run_migrations
+from .services.job_service import JobService, resume_interrupted_jobs, start_job_sweeper
+from .services.rollup_service import RollupService
+from .services.tag_bitmap_index import TAG_BITMAPS
+from .services.tag_index_service import TagIndexService
+from .services.tag_mapping_service import TagMappingService
 import os
 
-# Set up logging to file and console
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
-)
+# Set up logging to a rotating file and the console, written off the request path
+setup_logging()
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+run_migrations(engine)
 
 app = FastAPI(title="Summit Customer Compass API")
 
@@ -30,8 +32,68 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Per-route latency for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+
+# Opt-in request profiling (X-Profile: 1 or ?profile=1); nothing is installed unless enabled
+if profiling.PROFILING_ENABLED:
+    app.add_middleware(profiling.ProfilingMiddleware)
+
 # Include routers
 app.include_router(contacts.router, prefix="/api/contacts", tags=["contacts"])
+app.include_router(uploads.router, prefix="/api/contacts/uploads", tags=["uploads"])
+if profiling.PROFILING_ENABLED:
+    app.include_router(profiles.router, prefix="/profiles", tags=["profiles"])
+
+@app.on_event("startup")
+def load_tag_mapping():
+    # Record a new mapping version if the Knowledgebase file changed while we were down
+    db = SessionLocal()
+    try:
+        TagMappingService(db).reload()
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def backfill_tag_index():
+    # Contacts uploaded before contact_tags existed still need indexing
+    db = SessionLocal()
+    try:
+        if TagIndexService(db).needs_backfill():
+            JobService(db).enqueue("rebuild_tag_index")
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def backfill_rollup():
+    # Build the dashboard counters once for databases that predate them
+    db = SessionLocal()
+    try:
+        if RollupService(db).needs_backfill():
+            RollupService(db).rebuild()
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def build_tag_bitmaps():
+    # In-memory per-tag contact bitmaps behind /tags/co-occurrence
+    db = SessionLocal()
+    try:
+        TAG_BITMAPS.build(db)
+    finally:
+        db.close()
+
+@app.on_event("startup")
+def resume_jobs():
+    # Pick up jobs left running by a crashed or restarted worker, now and
+    # once the leases of jobs it was still running expire
+    resume_interrupted_jobs()
+    start_job_sweeper()
+
+@app.get("/metrics")
+def get_metrics():
+    # Prometheus text format; metrics are only rendered when scraped
+    return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
 
 @app.get("/")
 async def root():
@@ -46,12 +108,9 @@ async def global_exception_handler(request: Request, exc: Exception):
         content={"detail": "Internal Server Error"}
     )
 
-# Development only: Endpoint to view the last 100 lines of the error log
+# Development only: Endpoint to view the last lines of the error log
 @app.get("/logs", response_class=PlainTextResponse)
-async def get_logs():
-    log_path = "app.log"
-    if not os.path.exists(log_path):
+def get_logs(lines: int = 100):
+    if not os.path.exists(LOG_FILE):
         return "No log file found."
-    with open(log_path, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    return "".join(lines[-100:]) 
\ No newline at end of file
+    return tail_log(min(max(lines, 1), 5000)) 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, String, DateTime, JSON, Boolean, Float, func
+from sqlalchemy import BigInteger, Column, String, DateTime, JSON, Boolean, Float, Identity, Integer, func
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 import uuid
 from ..core.database import Base
@@ -7,6 +7,8 @@ class Contact(Base):
     __tablename__ = "contacts"
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Dense insertion number, the position of the contact in the tag bitmaps
+    ordinal = Column(BigInteger, Identity(), nullable=False, unique=True, index=True)
     email = Column(String, unique=True, nullable=False, index=True)
     full_name = Column(String, nullable=True)
     company = Column(String, nullable=True)
@@ -48,6 +50,8 @@ class Contact(Base):
 
     # Personality Bucket Assignment
     personality_bucket_assignment = Column(String, nullable=True, index=True)
+    # tag_mapping_versions.id the personality bucket was scored with
+    tag_mapping_version = Column(Integer, nullable=True)
 
     engagement_level = Column(String, nullable=True, index=True)
     summit_history = Column(JSONB, nullable=False, default=list)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, Boolean, BigInteger
+from ..core.database import Base
+
+class ContactRollup(Base):
+    """Contact counts per main bucket flags, personality bucket and engagement level.
+
+    Kept in step with contacts by RollupService so the dashboard endpoints
+    read a handful of rows instead of counting the contacts table.
+    """
+    __tablename__ = "contact_rollup"
+
+    is_in_main_bucket_biz = Column(Boolean, primary_key=True)
+    is_in_main_bucket_health = Column(Boolean, primary_key=True)
+    is_in_main_bucket_survivalist = Column(Boolean, primary_key=True)
+    # '' stands for NULL, which cannot be part of a primary key
+    personality_bucket = Column(String, primary_key=True)
+    engagement_level = Column(String, primary_key=True)
+    contacts = Column(BigInteger, nullable=False, default=0)
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy.dialects.postgresql import UUID
+from ..core.database import Base
+
+class ContactTag(Base):
+    """Contact -> tag association, kept in step with contacts.tags by the upsert path."""
+    __tablename__ = "contact_tags"
+
+    contact_id = Column(UUID(as_uuid=True), ForeignKey("contacts.id", ondelete="CASCADE"), primary_key=True)
+    # Indexed on its own for per-tag counts and the tag filter on GET /contacts
+    tag_id = Column(Integer, ForeignKey("tags.id", ondelete="CASCADE"), primary_key=True, index=True)
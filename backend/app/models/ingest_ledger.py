@@ -0,0 +1,29 @@
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, func
+from sqlalchemy.dialects.postgresql import JSONB
+from ..core.database import Base
+
+class IngestedFile(Base):
+    """One CSV file or zip member that was ingested, identified by its content."""
+    __tablename__ = "ingest_ledger"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    sha256 = Column(String(64), nullable=False, index=True)
+    size = Column(BigInteger, nullable=False)
+    filename = Column(String, nullable=False, index=True)
+
+    # What the rows were ingested with; settings_key hashes all of it
+    engagement_level = Column(String, nullable=True)
+    summit_history = Column(String, nullable=True)
+    main_bucket = Column(String, nullable=True)
+    # main_bucket_in_csv, merge_main_buckets, categorize
+    options = Column(JSONB, nullable=False, default=dict)
+    settings_key = Column(String(64), nullable=False)
+
+    # Rows parsed from the whole file (after deduplication), so a longer
+    # version of it can skip that many
+    rows = Column(Integer, nullable=False)
+    # Ingest summary: total, inserted, updated, categorized, skipped, ledger
+    outcome = Column(JSONB, nullable=False, default=dict)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, String, DateTime, Integer, Float, func
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+import uuid
+from ..core.database import Base
+
+class Job(Base):
+    __tablename__ = "jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    kind = Column(String, nullable=False, index=True)
+    # queued -> running -> completed | error
+    status = Column(String, nullable=False, default="queued", index=True)
+    params = Column(JSONB, nullable=False, default=dict)
+
+    # Progress
+    total = Column(Integer, nullable=True)
+    processed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    throughput = Column(Float, nullable=True)  # processed rows per second
+    # Last key fully processed, so an interrupted job can resume after it
+    checkpoint = Column(String, nullable=True)
+
+    # Process running the job, and until when it holds the job; renewed while it runs
+    worker_id = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime(timezone=True), nullable=True)
+
+    result = Column(JSONB, nullable=True)
+    error = Column(String, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -0,0 +1,10 @@
+from sqlalchemy import Column, String, Integer
+from ..core.database import Base
+
+class Tag(Base):
+    """Dictionary of every distinct tag seen on a contact."""
+    __tablename__ = "tags"
+
+    id = Column(Integer, primary_key=True)
+    # Exactly as it appears in contacts.tags
+    name = Column(String, unique=True, nullable=False)
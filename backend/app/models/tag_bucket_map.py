@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, Integer
+from ..core.database import Base
+
+class TagBucketMap(Base):
+    """Copy of the Knowledgebase tag mapping used by the in-database categorizer."""
+    __tablename__ = "tag_bucket_map"
+
+    # Lowercased, stripped tag, matching categorization_engine's lookup key
+    tag = Column(String, primary_key=True)
+    personality_bucket = Column(String, nullable=False)
+    weight = Column(Integer, nullable=False, default=1)
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, String, DateTime, Integer, func
+from sqlalchemy.dialects.postgresql import JSONB
+from ..core.database import Base
+
+class TagMappingVersion(Base):
+    """A snapshot of the Knowledgebase tag mapping and how it differs from the previous one."""
+    __tablename__ = "tag_mapping_versions"
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    checksum = Column(String, nullable=False, index=True)
+    # {lowercased tag: [personality bucket, weight]}
+    mapping = Column(JSONB, nullable=False)
+    # Lowercased tags that differ from the previous version
+    added = Column(JSONB, nullable=False, default=list)
+    removed = Column(JSONB, nullable=False, default=list)
+    changed = Column(JSONB, nullable=False, default=list)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
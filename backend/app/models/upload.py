@@ -0,0 +1,26 @@
+from sqlalchemy import Column, String, DateTime, BigInteger, func
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+import uuid
+from ..core.database import Base
+
+class Upload(Base):
+    """A resumable upload, received in chunks into UPLOAD_DIR."""
+    __tablename__ = "uploads"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # csv | zip
+    kind = Column(String, nullable=False)
+    filename = Column(String, nullable=False)
+    # Declared total size in bytes; the upload is complete once it is all received
+    size = Column(BigInteger, nullable=False)
+    # Bytes on disk as of the last chunk; the data file itself is authoritative
+    received = Column(BigInteger, nullable=False, default=0)
+    # Ingest options: main_bucket, main_bucket_in_csv, use_folders, categorize
+    options = Column(JSONB, nullable=False, default=dict)
+    # receiving -> finalized | aborted
+    status = Column(String, nullable=False, default="receiving", index=True)
+    # The ingest job, started with the first chunk
+    job_id = Column(UUID(as_uuid=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
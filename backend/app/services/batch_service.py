@@ -1,85 +1,82 @@
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from ..models.contact import Contact
-from typing import List, Dict, Union
-from .categorization_engine import assign_buckets
+from typing import List, Dict, Optional, TextIO, Union
+from .categorization_service import CategorizationService
+from .csv_ingest import batched
+from .ingest_service import INGEST_BATCH_SIZE
+from .job_service import JobService
+from .rollup_service import RollupService
 import csv
 from io import StringIO
 import uuid
-from sqlalchemy import func
 
 class BatchService:
-    def __init__(self, db: Session):
+    """The async methods expect an AsyncSession and the sync ones a Session."""
+
+    def __init__(self, db: Union[Session, AsyncSession]):
         self.db = db
 
-    async def process_csv(self, csv_content: str) -> Dict[str, int]:
-        """Process CSV content and create contact records."""
+    async def process_csv(self, csv_content: Union[str, TextIO], batch_size: int = INGEST_BATCH_SIZE) -> Dict[str, int]:
+        """Stream CSV content into contact records, committing in fixed-size batches."""
         try:
-            # Read CSV content
-            csv_file = StringIO(csv_content)
+            # Accept an open text stream so large files are never held in memory
+            csv_file = StringIO(csv_content) if isinstance(csv_content, str) else csv_content
             reader = csv.DictReader(csv_file)
-            
-            # Process each row
-            contacts = []
-            for row in reader:
-                contact = Contact(
-                    email=row.get('email', '').strip(),
-                    full_name=row.get('full_name', '').strip(),
-                    company=row.get('company', '').strip()
-                )
-                contacts.append(contact)
 
-            # Bulk insert contacts
-            self.db.bulk_save_objects(contacts)
-            self.db.commit()
+            total = 0
+            for rows in batched(reader, batch_size):
+                contacts = [
+                    Contact(
+                        id=uuid.uuid4(),
+                        email=row.get('email', '').strip(),
+                        full_name=row.get('full_name', '').strip(),
+                        company=row.get('company', '').strip()
+                    )
+                    for row in rows
+                ]
+                await self.db.run_sync(self._save_contacts, contacts)
+                await self.db.commit()
+                total += len(contacts)
 
             return {
-                "total": len(contacts),
-                "success": len(contacts)
+                "total": total,
+                "success": total
             }
 
         except Exception as e:
-            self.db.rollback()
+            await self.db.rollback()
             raise Exception(f"Batch processing failed: {str(e)}")
 
-    async def auto_categorize_contacts(self) -> Dict[str, int]:
-        """Auto-categorize all uncategorized contacts using rule-based logic."""
-        try:
-            contacts = self.db.query(Contact).filter(
-                Contact.personality_bucket_assignment.is_(None)
-            ).all()
-            print(f"Found {len(contacts)} contacts to categorize.")
-            updated = 0
-            for contact in contacts:
-                # Only update personality_bucket_assignment, do not change main_bucket_assignment
-                _, personality_bucket = assign_buckets(contact.tags or [], contact.main_bucket_assignment)
-                contact.personality_bucket_assignment = personality_bucket
-                updated += 1
-            self.db.commit()
-            return {"total": len(contacts), "updated": updated}
-        except Exception as e:
-            self.db.rollback()
-            raise Exception(f"Auto-categorization failed: {str(e)}")
+    @staticmethod
+    def _save_contacts(session: Session, contacts: List[Contact]) -> None:
+        session.bulk_save_objects(contacts)
+        RollupService(session).add_ids([str(contact.id) for contact in contacts])
+
+    def auto_categorize_contacts(self, progress=None, engine: str = "python") -> Dict[str, int]:
+        """Auto-categorize all uncategorized contacts using rule-based logic.
+
+        Runs on a job worker; progress (a JobProgress) receives the counts
+        and checkpoints. engine is one of CATEGORIZATION_ENGINES.
+        """
+        categorization_service = CategorizationService(self.db)
+        # Only update personality_bucket_assignment, do not change main_bucket_assignment
+        if engine == "sql":
+            result = categorization_service.categorize_in_database(
+                "personality_bucket_assignment IS NULL",
+                progress=progress,
+            )
+        else:
+            result = categorization_service.categorize_in_chunks(
+                Contact.personality_bucket_assignment.is_(None),
+                progress=progress,
+            )
+        return {"total": result["total"], "updated": result["updated"], "engine": engine}
 
-    async def get_batch_status(self, batch_id: str) -> Dict:
-        """Get the status of a batch processing task."""
-        # This would typically query a batch status table
-        # For now, return a mock response
-        return {
-            "batch_id": batch_id,
-            "status": "completed",
-            "total": 100,
-            "processed": 100,
-            "success": 100,
-            "failed": 0
-        } 
+    async def get_batch_status(self, batch_id: str) -> Optional[Dict]:
+        """Get the status of a batch processing task from the jobs table."""
+        return await self.db.run_sync(lambda session: JobService(session).status(batch_id))
 
     async def get_personality_buckets(self) -> List[Dict[str, Union[str, int]]]:
         """Get all unique personality buckets and their counts."""
-        results = self.db.query(
-            Contact.personality_bucket_assignment,
-            func.count(Contact.id)
-        ).group_by(Contact.personality_bucket_assignment).all()
-        return [
-            {"bucket": bucket, "count": count}
-            for bucket, count in results if bucket
-        ]
\ No newline at end of file
+        return await self.db.run_sync(lambda session: RollupService(session).personality_buckets())
\ No newline at end of file
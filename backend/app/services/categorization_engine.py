@@ -1,6 +1,12 @@
 import os
 import csv
+import hashlib
+import io
+import threading
 from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from ..core.metrics import CATEGORIZED_CONTACTS, CATEGORIZE_BATCH_DURATION
 
 # Path to the mapping CSV
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
@@ -9,28 +15,69 @@ CATEGORIZATION_CSV_PATH = os.path.abspath(os.path.join(BASE_DIR, '..', 'Knowledg
 # Load tag to personality bucket mapping
 _tag_to_personality_bucket = None
 _tag_weight = None
+_compiled_mapping = None
+_mapping_version = None
+_mapping_lock = threading.Lock()
+
+# Fallback buckets for contacts whose tags score nothing, by main bucket
+NED_BUCKETS = {
+    "Health": "NED Health",
+    "Business Operations": "NED Business",
+    "Survivalist": "NED Survivalist",
+}
+CANNOT_PLACE = "Cannot Place"
+
+def read_tag_mapping_file(path: Optional[str] = None) -> Tuple[Dict[str, Tuple[str, int]], str]:
+    """Parse the mapping CSV into {lowercased tag: (personality bucket, weight)} and its sha256."""
+    with open(path or CATEGORIZATION_CSV_PATH, 'rb') as f:
+        raw = f.read()
+    mapping = {}
+    reader = csv.DictReader(io.StringIO(raw.decode('utf-8'), newline=''))
+    for row in reader:
+        tag = (row.get('Tag') or '').strip().lower()
+        personality_bucket = (row.get('Personality_Bucket') or '').strip()
+        weight = row.get('Weight')
+        try:
+            weight = int(weight)
+        except (TypeError, ValueError):
+            weight = 1
+        if tag and personality_bucket:
+            mapping[tag] = (personality_bucket, weight)
+    return mapping, hashlib.sha256(raw).hexdigest()
+
+def install_tag_mapping(mapping: Dict[str, Tuple[str, int]], version: Optional[int] = None):
+    """Make mapping the one used by assign_buckets, recording its version."""
+    global _tag_to_personality_bucket, _tag_weight, _compiled_mapping, _mapping_version
+    with _mapping_lock:
+        _tag_to_personality_bucket = {tag: bucket for tag, (bucket, _) in mapping.items()}
+        _tag_weight = {tag: weight for tag, (_, weight) in mapping.items()}
+        _compiled_mapping = None
+        _mapping_version = version
 
 def _load_tag_mapping():
-    global _tag_to_personality_bucket, _tag_weight
-    _tag_to_personality_bucket = {}
-    _tag_weight = {}
-    with open(CATEGORIZATION_CSV_PATH, newline='', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        for row in reader:
-            email = row.get('Email', '').strip()
-            tag = (row.get('Tag') or '').strip().lower()
-            personality_bucket = (row.get('Personality_Bucket') or '').strip()
-            weight = row.get('Weight')
-            try:
-                weight = int(weight)
-            except (TypeError, ValueError):
-                weight = 1
-            engagement_level = row.get('Engagement') or row.get('Engagement Level')
-            email_state = row.get('Email State')
-            email_sub_state = row.get('Email Sub-State')
-            if tag and personality_bucket:
-                _tag_to_personality_bucket[tag] = personality_bucket
-                _tag_weight[tag] = weight
+    mapping, _ = read_tag_mapping_file()
+    install_tag_mapping(mapping)
+
+def get_tag_mapping() -> Dict[str, Tuple[str, int]]:
+    """Return the current mapping as {lowercased tag: (personality bucket, weight)}."""
+    if _tag_to_personality_bucket is None:
+        _load_tag_mapping()
+    return {
+        tag: (bucket, _tag_weight.get(tag, 1))
+        for tag, bucket in _tag_to_personality_bucket.items()
+    }
+
+def get_tag_mapping_version() -> Optional[int]:
+    """Version of the installed mapping, or None before it is synced with the database."""
+    return _mapping_version
+
+def diff_tag_mappings(old: Dict[str, Tuple[str, int]], new: Dict[str, Tuple[str, int]]) -> Dict[str, List[str]]:
+    """Tags added, removed, or moved to another bucket / reweighted between two mappings."""
+    return {
+        "added": sorted(set(new) - set(old)),
+        "removed": sorted(set(old) - set(new)),
+        "changed": sorted(tag for tag in set(old) & set(new) if tuple(old[tag]) != tuple(new[tag])),
+    }
 
 # Assign personality bucket based on tags and main bucket
 # Usage: assign_buckets(tags: list, main_bucket: str) -> tuple
@@ -48,14 +95,98 @@ def assign_buckets(tags: list, main_bucket: str = None) -> tuple:
             scores[bucket] += weight
     if not scores:
         # Assign to NED bucket based on main_bucket
-        if main_bucket == "Health":
-            return (None, "NED Health")
-        elif main_bucket == "Business Operations":
-            return (None, "NED Business")
-        elif main_bucket == "Survivalist":
-            return (None, "NED Survivalist")
-        else:
-            return (None, "Cannot Place")
+        return (None, NED_BUCKETS.get(main_bucket, CANNOT_PLACE))
     max_score = max(scores.values())
     top_buckets = [b for b, s in scores.items() if s == max_score]
     return (None, sorted(top_buckets)[0])
+
+
+class CompiledTagMapping:
+    """The tag mapping compiled for batch scoring with NumPy.
+
+    Tags get integer ids and buckets get columns in alphabetical order, so
+    argmax's first-maximum rule reproduces assign_buckets' tie-break. Each
+    tag maps to exactly one bucket, so a tag is just its bucket column and
+    its weight.
+    """
+
+    # Contacts scored per NumPy pass, to bound the (contacts x buckets) matrices
+    MAX_ROWS = 50000
+
+    def __init__(self, tag_to_bucket: dict, tag_weight: dict):
+        self.buckets = sorted(set(tag_to_bucket.values()))
+        bucket_index = {bucket: i for i, bucket in enumerate(self.buckets)}
+        self.tag_ids = {tag: i for i, tag in enumerate(tag_to_bucket)}
+        self.tag_bucket = np.array([bucket_index[tag_to_bucket[tag]] for tag in self.tag_ids], dtype=np.int64)
+        self.tag_weight = np.array([tag_weight.get(tag, 1) for tag in self.tag_ids], dtype=np.float64)
+        # Raw tag string -> tag id (-1 when unmapped), so each distinct
+        # spelling is stripped and lowercased only once.
+        self._raw_tag_ids = {}
+
+    def _tag_id(self, tag: str) -> int:
+        tag_id = self._raw_tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = self.tag_ids.get(tag.strip().lower(), -1)
+            self._raw_tag_ids[tag] = tag_id
+        return tag_id
+
+    def score(self, tag_lists: Sequence[Sequence[str]], main_buckets: Sequence[Optional[str]]) -> List[str]:
+        """Return the personality bucket for each contact, same as assign_buckets."""
+        results = []
+        for start in range(0, len(tag_lists), self.MAX_ROWS):
+            end = start + self.MAX_ROWS
+            results.extend(self._score(tag_lists[start:end], main_buckets[start:end]))
+        return results
+
+    def _score(self, tag_lists, main_buckets) -> List[str]:
+        n_rows = len(tag_lists)
+        n_buckets = len(self.buckets)
+        rows = []
+        tag_ids = []
+        tag_id = self._tag_id
+        for row, tags in enumerate(tag_lists):
+            for tag in tags or ():
+                tid = tag_id(tag)
+                if tid >= 0:
+                    rows.append(row)
+                    tag_ids.append(tid)
+        tag_ids = np.asarray(tag_ids, dtype=np.int64)
+        # Each matched tag adds its weight to its bucket's cell in the
+        # flattened (contacts x buckets) score matrix.
+        cells = np.asarray(rows, dtype=np.int64) * n_buckets + self.tag_bucket[tag_ids]
+        size = n_rows * n_buckets
+        # bincount returns integers when there are no cells at all, so cast
+        scores = np.bincount(cells, weights=self.tag_weight[tag_ids], minlength=size).astype(np.float64, copy=False)
+        scores = scores.reshape(n_rows, n_buckets)
+        matched = np.bincount(cells, minlength=size).reshape(n_rows, n_buckets) > 0
+        # Only buckets with a matching tag compete, as in assign_buckets
+        scores[~matched] = -np.inf
+        has_match = matched.any(axis=1)
+        best = scores.argmax(axis=1) if n_buckets else np.zeros(n_rows, dtype=np.int64)
+        buckets = self.buckets
+        return [
+            buckets[best[i]] if has_match[i] else NED_BUCKETS.get(main_buckets[i], CANNOT_PLACE)
+            for i in range(n_rows)
+        ]
+
+
+def get_compiled_mapping() -> CompiledTagMapping:
+    """Compile the current tag mapping once and reuse it until it is reloaded."""
+    global _compiled_mapping
+    if _tag_to_personality_bucket is None:
+        _load_tag_mapping()
+    compiled = _compiled_mapping
+    if compiled is None:
+        with _mapping_lock:
+            compiled = _compiled_mapping = CompiledTagMapping(_tag_to_personality_bucket, _tag_weight)
+    return compiled
+
+
+# Batch version of assign_buckets for many contacts at once
+# Usage: assign_buckets_batch(tag_lists: list, main_buckets: list) -> list
+# Returns the personality bucket for each contact
+def assign_buckets_batch(tag_lists: Sequence[Sequence[str]], main_buckets: Sequence[Optional[str]]) -> List[str]:
+    with CATEGORIZE_BATCH_DURATION.time(engine="python"):
+        buckets = get_compiled_mapping().score(tag_lists, main_buckets)
+    CATEGORIZED_CONTACTS.inc(len(buckets), engine="python")
+    return buckets
@@ -1,25 +1,199 @@
 from ..models.contact import Contact
 from sqlalchemy.orm import Session
-from ..services.categorization_engine import assign_buckets
-from typing import List, Dict
-import asyncio
+from sqlalchemy import select, text
+from ..services.categorization_engine import (
+    CANNOT_PLACE,
+    NED_BUCKETS,
+    assign_buckets_batch,
+    get_tag_mapping,
+    get_tag_mapping_version,
+)
+from ..models.tag_bucket_map import TagBucketMap
+from .rollup_service import RollupService
+from ..core.metrics import CATEGORIZED_CONTACTS, CATEGORIZE_BATCH_DURATION
+from typing import List, Dict, Optional
 import json
+import logging
+import os
+import uuid
+
+logger = logging.getLogger(__name__)
+
+# Contacts read, scored and written per chunk in chunked mode
+CATEGORIZE_CHUNK_SIZE = int(os.getenv("CATEGORIZE_CHUNK_SIZE", "5000"))
+
+_BULK_UPDATE_SQL = text("""
+UPDATE contacts AS c
+SET personality_bucket_assignment = v.bucket,
+    tag_mapping_version = :version,
+    updated_at = now()
+FROM unnest(CAST(:ids AS uuid[]), CAST(:buckets AS text[])) AS v(id, bucket)
+WHERE c.id = v.id
+""")
+
+# Engines selectable for /auto-categorize: "python" scores chunks in the
+# app with the compiled mapping, "sql" runs one set-based UPDATE in Postgres.
+CATEGORIZATION_ENGINES = ("python", "sql")
+
+# Every character str.strip() removes in assign_buckets (the str.isspace()
+# set), for matching tags the same way in SQL
+_STRIP_CHARS = (
+    "\t\n\x0b\x0c\r\x1c\x1d\x1e\x1f \x85\xa0\u1680"
+    "\u2000\u2001\u2002\u2003\u2004\u2005\u2006\u2007\u2008\u2009\u200a"
+    "\u2028\u2029\u202f\u205f\u3000"
+)
+
+_SQL_CATEGORIZE = """
+WITH targets AS (
+    SELECT id, tags, main_bucket_assignment
+    FROM contacts
+    WHERE {condition}
+),
+scores AS (
+    SELECT t.id, m.personality_bucket, SUM(m.weight) AS score
+    FROM targets AS t
+    CROSS JOIN LATERAL jsonb_array_elements_text(
+        CASE WHEN jsonb_typeof(t.tags) = 'array' THEN t.tags ELSE '[]'::jsonb END
+    ) AS tag(name)
+    JOIN tag_bucket_map AS m ON m.tag = lower(btrim(tag.name, :strip_chars))
+    GROUP BY t.id, m.personality_bucket
+),
+best AS (
+    SELECT DISTINCT ON (id) id, personality_bucket
+    FROM scores
+    ORDER BY id, score DESC, personality_bucket COLLATE "C"
+)
+UPDATE contacts AS c
+SET personality_bucket_assignment = COALESCE(best.personality_bucket, {fallback}),
+    tag_mapping_version = :version,
+    updated_at = now()
+FROM targets
+LEFT JOIN best ON best.id = targets.id
+WHERE c.id = targets.id
+RETURNING c.id
+"""
+
+def _ned_fallback_sql(params: Dict) -> str:
+    """CASE expression mapping main_bucket_assignment to its NED bucket."""
+    branches = []
+    for i, (main_bucket, ned_bucket) in enumerate(NED_BUCKETS.items()):
+        params[f"main_{i}"] = main_bucket
+        params[f"ned_{i}"] = ned_bucket
+        branches.append(f"WHEN :main_{i} THEN :ned_{i}")
+    params["cannot_place"] = CANNOT_PLACE
+    return f"CASE targets.main_bucket_assignment {' '.join(branches)} ELSE :cannot_place END"
 
 class CategorizationService:
     def __init__(self, db: Session):
         self.db = db
 
-    async def categorize_contacts(self, contacts: List[Contact]) -> Dict[str, int]:
-        """Categorize a batch of contacts using rule-based logic."""
+    def categorize_in_chunks(
+        self,
+        condition,
+        chunk_size: int = CATEGORIZE_CHUNK_SIZE,
+        progress=None,
+    ) -> Dict[str, int]:
+        """Assign personality buckets to every contact matching condition, chunk by chunk.
+
+        Only id, tags and main_bucket_assignment are read, through a
+        server-side cursor on its own connection, ordered by id. Each chunk
+        is written back with one UPDATE and committed, and its last id is
+        recorded as the job checkpoint so a resumed job continues after it.
+        """
+        start_after = uuid.UUID(progress.checkpoint) if progress and progress.checkpoint else None
+        stmt = select(Contact.id, Contact.tags, Contact.main_bucket_assignment).where(condition)
+        if start_after:
+            stmt = stmt.where(Contact.id > start_after)
+        stmt = stmt.order_by(Contact.id)
+
+        if progress:
+            remaining = self.db.query(Contact).filter(condition)
+            if start_after:
+                remaining = remaining.filter(Contact.id > start_after)
+            progress.set_total(progress.processed + remaining.count())
+
+        version = get_tag_mapping_version()
+        updated = 0
+        chunks = 0
+        # A separate connection keeps the cursor open across per-chunk commits.
+        with self.db.get_bind().connect() as read_conn:
+            result = read_conn.execution_options(stream_results=True, yield_per=chunk_size).execute(stmt)
+            for chunk in result.partitions():
+                ids = [str(row.id) for row in chunk]
+                buckets = assign_buckets_batch(
+                    [row.tags for row in chunk],
+                    [row.main_bucket_assignment for row in chunk],
+                )
+                try:
+                    self.write_buckets(ids, buckets, version)
+                    self.db.commit()
+                except Exception as e:
+                    self.db.rollback()
+                    raise Exception(f"Categorization failed: {str(e)}")
+                updated += len(ids)
+                chunks += 1
+                if progress:
+                    progress.advance(len(ids), checkpoint=ids[-1])
+        logger.info(f"Categorized {updated} contacts in {chunks} chunks.")
+        return {"total": updated, "updated": updated, "chunks": chunks}
+
+    def write_buckets(self, ids: List[str], buckets: List[str], version: Optional[int]) -> None:
+        """Store personality buckets for contact ids with one UPDATE; the caller commits."""
+        rollup = RollupService(self.db)
+        rollup.subtract_ids(ids)
+        self.db.execute(_BULK_UPDATE_SQL, {"ids": ids, "buckets": buckets, "version": version})
+        rollup.add_ids(ids)
+
+    def sync_tag_bucket_map(self) -> int:
+        """Replace tag_bucket_map with the currently loaded tag mapping."""
+        mapping = get_tag_mapping()
+        self.db.query(TagBucketMap).delete()
+        self.db.bulk_insert_mappings(TagBucketMap, [
+            {"tag": tag, "personality_bucket": bucket, "weight": weight}
+            for tag, (bucket, weight) in mapping.items()
+        ])
+        return len(mapping)
+
+    def categorize_in_database(self, condition_sql: str, progress=None) -> Dict[str, int]:
+        """Assign personality buckets with a single set-based UPDATE in Postgres.
+
+        Tags are expanded with jsonb_array_elements_text and joined to
+        tag_bucket_map; the highest summed weight wins with the same
+        alphabetical tie-break and NED/Cannot Place fallback as assign_buckets.
+        """
         try:
-            updated = 0
-            for contact in contacts:
-                main_bucket, personality_bucket = assign_buckets(contact.tags or [], contact.main_bucket_assignment)
-                contact.main_bucket_assignment = main_bucket
-                contact.personality_bucket_assignment = personality_bucket
-                updated += 1
+            self.sync_tag_bucket_map()
+            params = {"strip_chars": _STRIP_CHARS, "version": get_tag_mapping_version()}
+            statement = _SQL_CATEGORIZE.format(condition=condition_sql, fallback=_ned_fallback_sql(params))
+            rollup = RollupService(self.db)
+            rollup.subtract(condition_sql)
+            with CATEGORIZE_BATCH_DURATION.time(engine="sql"):
+                ids = [str(contact_id) for contact_id in self.db.execute(text(statement), params).scalars()]
+            rollup.add_ids(ids)
+            updated = len(ids)
             self.db.commit()
-            return {"success": updated}
         except Exception as e:
             self.db.rollback()
-            raise Exception(f"Categorization failed: {str(e)}") 
\ No newline at end of file
+            raise Exception(f"Categorization failed: {str(e)}")
+        CATEGORIZED_CONTACTS.inc(updated, engine="sql")
+        if progress:
+            progress.set_total(progress.processed + updated)
+            progress.advance(updated)
+        logger.info(f"Categorized {updated} contacts in the database.")
+        return {"total": updated, "updated": updated}
+
+    def categorize_uncategorized(self, progress=None) -> Dict[str, int]:
+        """Categorize every contact without a main bucket assignment."""
+        result = self.categorize_in_chunks(Contact.main_bucket_assignment.is_(None), progress=progress)
+        if not result["total"]:
+            return {"message": "No contacts to categorize"}
+        return {"success": result["updated"], "chunks": result["chunks"]}
+
+    def recategorize_tags(self, tags: List[str], progress=None) -> Dict[str, int]:
+        """Recategorize only contacts carrying one of tags (lowercased mapping keys)."""
+        # Matches the ix_contacts_tags_lower expression index
+        condition = text("lower(contacts.tags::text)::jsonb ?| CAST(:impacted_tags AS text[])").bindparams(
+            impacted_tags=list(tags)
+        )
+        result = self.categorize_in_chunks(condition, progress=progress)
+        return {"total": result["total"], "updated": result["updated"], "tags": len(tags)}
@@ -0,0 +1,124 @@
+from sqlalchemy import Boolean, DateTime, Float, Integer, String, cast, literal_column
+from sqlalchemy.dialects.postgresql import UUID
+from typing import Iterator, List, Sequence
+import os
+import pyarrow as pa
+import pyarrow.parquet as pq
+from ..models.contact import Contact
+from .export_service import export_statement, iter_export_batches
+
+# Rows per record batch / Parquet row group
+COLUMNAR_BATCH_SIZE = int(os.getenv("COLUMNAR_BATCH_SIZE", "50000"))
+
+# Media type and file extension per columnar export format
+COLUMNAR_FORMATS = {
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+# JSONB columns holding lists of strings
+_LIST_COLUMNS = ("tags", "summit_history")
+
+# A JSONB list column as text[]; summit_history was stored as a bare
+# string by older uploads, so a non-empty string becomes a one-item list.
+_TEXT_ARRAY_SQL = """ARRAY(SELECT jsonb_array_elements_text(CASE
+    WHEN jsonb_typeof(contacts.{name}) = 'array' THEN contacts.{name}
+    WHEN jsonb_typeof(contacts.{name}) = 'string' AND contacts.{name} <> '""'::jsonb
+        THEN jsonb_build_array(contacts.{name})
+    ELSE '[]'::jsonb END))"""
+
+
+def _arrow_type(column) -> pa.DataType:
+    if column.name in _LIST_COLUMNS:
+        return pa.list_(pa.string())
+    column_type = column.type
+    if isinstance(column_type, DateTime):
+        return pa.timestamp("us", tz="UTC") if column_type.timezone else pa.timestamp("us")
+    if isinstance(column_type, Boolean):
+        return pa.bool_()
+    if isinstance(column_type, Float):
+        return pa.float64()
+    if isinstance(column_type, Integer):
+        return pa.int64()
+    # Strings, UUIDs and any other JSONB
+    return pa.string()
+
+
+def export_schema(fields: Sequence[str]) -> pa.Schema:
+    """Arrow schema for the export fields; unknown fields become null string columns."""
+    columns = Contact.__table__.columns
+    return pa.schema([
+        pa.field(f, _arrow_type(columns[f]) if f in columns else pa.string())
+        for f in fields
+    ])
+
+
+def _columnar_column(column):
+    """Have Postgres shape values the way Arrow wants them, which is cheaper
+    than decoding JSON and UUIDs in Python only to convert them again."""
+    if column.name in _LIST_COLUMNS:
+        return literal_column(_TEXT_ARRAY_SQL.format(name=column.name))
+    if isinstance(column.type, UUID):
+        return cast(column, String)
+    return column
+
+
+def _to_record_batch(rows: List, schema: pa.Schema) -> pa.RecordBatch:
+    columns = list(zip(*rows))
+    arrays = [pa.array(values, type=field.type) for values, field in zip(columns, schema)]
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+class _ChunkSink:
+    """Write-only file object collecting what pyarrow writes until it is drained."""
+
+    def __init__(self):
+        self.chunks = []
+        self.closed = False
+        self.position = 0
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def writable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_columnar(condition, fields: Sequence[str], fmt: str, batch_size: int = COLUMNAR_BATCH_SIZE) -> Iterator[bytes]:
+    """Yield a Parquet file or Arrow IPC stream, one row group / record batch per cursor batch."""
+    schema = export_schema(fields)
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    else:
+        writer = pa.ipc.new_stream(sink, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+    try:
+        stmt = export_statement(condition, fields, column_for=_columnar_column)
+        for batch in iter_export_batches(stmt, batch_size):
+            writer.write_batch(_to_record_batch(batch, schema))
+            data = sink.drain()
+            if data:
+                yield data
+    finally:
+        writer.close()
+    yield sink.drain()
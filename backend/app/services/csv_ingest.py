@@ -0,0 +1,242 @@
+import csv
+import hashlib
+import io
+import os
+import re
+import uuid
+import zipfile
+from itertools import islice
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, TextIO, Tuple
+
+BIZ_BUCKET_NAMES = ['biz', 'business', 'business operations']
+
+
+def parse_engagement_and_history(filename):
+    # Example: H-Common Sense.csv -> ('H', 'Common Sense')
+    base = os.path.splitext(os.path.basename(filename))[0]
+    match = re.match(r'([HMLU])-\s*(.+)', base, re.IGNORECASE)
+    if match:
+        engagement = match.group(1).upper()
+        history = match.group(2).strip()
+        return engagement, history
+    return None, base
+
+
+def main_bucket_flags(main_bucket: Optional[str]) -> Tuple[bool, bool, bool]:
+    """Return the (biz, health, survivalist) flags for a main bucket name."""
+    value = (main_bucket or '').strip().lower()
+    return (
+        value in BIZ_BUCKET_NAMES,
+        value == 'health',
+        value == 'survivalist',
+    )
+
+
+def parse_contact_row(
+    row: Dict[str, str],
+    main_bucket: Optional[str] = None,
+    main_bucket_in_csv: bool = False,
+    engagement_level_file: Optional[str] = None,
+    summit_history_val: Optional[str] = None,
+) -> Optional[Dict]:
+    """Normalize one CSV row into the column values used by the upsert engine.
+
+    Returns None when the row has no email.
+    """
+    email = (row.get('Email') or '').strip()
+    if not email:
+        return None
+    full_name = (row.get('First Name') or '').strip() or (row.get('Name') or '').strip()
+    contact_id = (row.get('Contact ID') or '').strip()
+    tags_raw = row.get('Contact Tags') or row.get('Tag') or ''
+    tags = [t.strip() for t in tags_raw.split(',') if t.strip()]
+    # Validate or generate UUID
+    try:
+        contact_uuid = uuid.UUID(contact_id) if contact_id else uuid.uuid4()
+    except Exception:
+        contact_uuid = uuid.uuid4()
+    if main_bucket_in_csv:
+        is_biz, is_health, is_survivalist = main_bucket_flags(row.get('Main Bucket'))
+    else:
+        is_biz, is_health, is_survivalist = main_bucket_flags(main_bucket)
+    return {
+        "id": contact_uuid,
+        "email": email,
+        "full_name": full_name or None,
+        "tags": tags,
+        "is_in_main_bucket_biz": is_biz,
+        "is_in_main_bucket_health": is_health,
+        "is_in_main_bucket_survivalist": is_survivalist,
+        "engagement_level": row.get('Engagement') or row.get('Engagement Level') or engagement_level_file,
+        "email_state": row.get('Email State') or None,
+        "email_sub_state": row.get('Email Sub-State') or None,
+        "summit_history": [summit_history_val] if summit_history_val else [],
+    }
+
+
+class HashingReader(io.RawIOBase):
+    """Passes a binary stream through while taking its sha256.
+
+    The digests of the first n bytes for each n in prefix_sizes are kept
+    too, for the prefixes that end a line, so the stream can be matched
+    against shorter versions of itself that it appends rows to.
+    """
+
+    def __init__(self, raw: BinaryIO, prefix_sizes: Sequence[int] = ()):
+        self.raw = raw
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.prefixes: Dict[int, str] = {}
+        self._pending = sorted({size for size in prefix_sizes if size > 0})
+        self._last_byte = b""
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        data = self.raw.read(len(b))
+        if not data:
+            return 0
+        b[:len(data)] = data
+        while self._pending and self._pending[0] <= self.size + len(data):
+            cut = self._pending.pop(0) - self.size
+            prefix = self.hasher.copy()
+            prefix.update(data[:cut])
+            if (data[cut - 1:cut] if cut else self._last_byte) == b"\n":
+                self.prefixes[self.size + cut] = prefix.hexdigest()
+        self.hasher.update(data)
+        self.size += len(data)
+        self._last_byte = data[-1:]
+        return len(data)
+
+    def fingerprint(self) -> Dict:
+        """Read whatever is left and return the sha256, size and line-ending prefix digests."""
+        while self.read(1 << 20):
+            pass
+        return {"sha256": self.hasher.hexdigest(), "size": self.size, "prefixes": self.prefixes}
+
+
+def open_text_stream(binary_file: BinaryIO, encoding: str = 'utf-8') -> TextIO:
+    """Wrap a binary file so it is decoded incrementally as it is read."""
+    return io.TextIOWrapper(binary_file, encoding=encoding, newline='')
+
+
+def iter_contact_rows(
+    text_stream: Iterable[str],
+    main_bucket: Optional[str] = None,
+    main_bucket_in_csv: bool = False,
+    engagement_level_file: Optional[str] = None,
+    summit_history_val: Optional[str] = None,
+    on_skip: Optional[Callable[[Dict[str, str]], None]] = None,
+) -> Iterator[Dict]:
+    """Lazily parse a CSV stream into normalized rows, skipping duplicate or missing emails."""
+    emails_seen = set()
+    for row in csv.DictReader(text_stream):
+        contact_row = parse_contact_row(
+            row,
+            main_bucket=main_bucket,
+            main_bucket_in_csv=main_bucket_in_csv,
+            engagement_level_file=engagement_level_file,
+            summit_history_val=summit_history_val,
+        )
+        if not contact_row or contact_row["email"] in emails_seen:
+            if on_skip:
+                on_skip(row)
+            continue
+        emails_seen.add(contact_row["email"])
+        yield contact_row
+
+
+def batched(iterable: Iterable, size: int) -> Iterator[List]:
+    """Yield lists of at most size items from iterable."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def is_csv_member(name: str) -> bool:
+    """True for CSV entries in a zip, ignoring directories and macOS resource forks."""
+    base = os.path.basename(name)
+    return (
+        name.lower().endswith('.csv')
+        and not name.startswith('__MACOSX/')
+        and not base.startswith('._')
+    )
+
+
+def zip_member_main_bucket(name: str, use_folders: bool, main_bucket: Optional[str] = None) -> str:
+    """Determine the main bucket of a zip member from its top-level folder."""
+    if not use_folders:
+        return main_bucket or 'none'
+    parts = name.split('/')
+    folder = parts[0].lower() if len(parts) > 1 else None
+    if folder in BIZ_BUCKET_NAMES:
+        return 'biz'
+    if folder in ['health', 'survivalist']:
+        return folder
+    return 'none'
+
+
+def fingerprint_zip_member(zip_path: str, member: str, prefix_sizes: Sequence[int] = ()) -> Dict:
+    """HashingReader fingerprint of one zip member, read without parsing it.
+
+    Runs in a worker process, so whether (and from which row) the member
+    is ingested can be decided before parse_zip_member streams its rows.
+    """
+    with zipfile.ZipFile(zip_path) as archive, archive.open(member) as raw:
+        return HashingReader(raw, prefix_sizes).fingerprint()
+
+
+def parse_zip_member(
+    zip_path: str,
+    member: str,
+    main_bucket: str,
+    batches,
+    skip_rows: int = 0,
+    batch_size: int = 5000,
+) -> Dict:
+    """Parse, deduplicate and fingerprint one CSV member of a zip archive.
+
+    Runs in a worker process, so it only takes picklable arguments and
+    reads the member straight from the archive without extracting it.
+    Rows after the first skip_rows are put on the batches queue in lists
+    of at most batch_size, followed by None; a bounded queue makes the
+    worker wait for them to be consumed. Returns the counts, with "rows"
+    including the skipped ones, and the fingerprint.
+    """
+    engagement_level_file, summit_history_val = parse_engagement_and_history(member)
+    skipped = 0
+    rows = 0
+
+    def on_skip(row):
+        nonlocal skipped
+        skipped += 1
+
+    def counted(parsed):
+        nonlocal rows
+        for row in parsed:
+            rows += 1
+            yield row
+
+    try:
+        with zipfile.ZipFile(zip_path) as archive, archive.open(member) as raw:
+            hashed = HashingReader(raw)
+            text_stream = open_text_stream(io.BufferedReader(hashed))
+            parsed = counted(iter_contact_rows(
+                text_stream,
+                main_bucket=main_bucket,
+                engagement_level_file=engagement_level_file,
+                summit_history_val=summit_history_val,
+                on_skip=on_skip,
+            ))
+            for batch in batched(islice(parsed, skip_rows, None), batch_size):
+                batches.put(batch)
+            # Detach so closing the text stream leaves hashed open
+            text_stream.detach().detach()
+            fingerprint = hashed.fingerprint()
+    finally:
+        batches.put(None)
+    return {"file": member, "main_bucket": main_bucket, "rows": rows, "skipped": skipped, "fingerprint": fingerprint}
@@ -0,0 +1,101 @@
+from sqlalchemy import literal, or_, select
+from typing import Dict, Iterable, Iterator, List, Sequence
+import csv
+import io
+import logging
+import os
+import zlib
+from ..core.database import SessionLocal
+from ..models.contact import Contact
+
+logger = logging.getLogger(__name__)
+
+# Rows fetched from the server-side cursor (and written out) per batch
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+
+DEFAULT_EXPORT_FIELDS = [
+    "email", "full_name", "company", "main_bucket_assignment",
+    "personality_bucket_assignment", "tags", "summit_history"
+]
+
+# wbits for zlib.compressobj that produce a gzip container
+GZIP_WBITS = 31
+
+
+def bucket_condition(buckets: Sequence[str]):
+    return or_(
+        Contact.main_bucket_assignment.in_(buckets),
+        Contact.personality_bucket_assignment.in_(buckets)
+    )
+
+
+def export_statement(condition, fields: Sequence[str], column_for=None):
+    """Select just the requested fields; unknown fields export as empty values.
+
+    column_for(column) may replace a column with another expression.
+    """
+    columns = Contact.__table__.columns
+    selected = []
+    for f in fields:
+        if f not in columns:
+            selected.append(literal(None).label(f))
+        elif column_for:
+            selected.append(column_for(columns[f]).label(f))
+        else:
+            selected.append(columns[f])
+    return select(*selected).where(condition)
+
+
+def iter_export_batches(stmt, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[List]:
+    """Yield lists of row tuples for stmt from a server-side cursor.
+
+    Runs on its own session because the response keeps streaming after the
+    request's session has been closed.
+    """
+    db = SessionLocal()
+    try:
+        with db.get_bind().connect() as conn:
+            result = conn.execution_options(stream_results=True, yield_per=batch_size).execute(stmt)
+            exported = 0
+            for batch in result.partitions():
+                exported += len(batch)
+                yield batch
+            logger.info(f"Exported {exported} contacts.")
+    finally:
+        db.close()
+
+
+def _csv_value(value):
+    if isinstance(value, list):
+        return ",".join(value)
+    return value
+
+
+def iter_csv(condition, fields: Sequence[str], batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[str]:
+    """Yield the export as CSV text: the header, then one chunk per batch."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([f.replace("_", " ").title() for f in fields])
+    yield buffer.getvalue()
+    for batch in iter_export_batches(export_statement(condition, fields), batch_size):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows([_csv_value(value) for value in row] for row in batch)
+        yield buffer.getvalue()
+
+
+def gzip_chunks(chunks: Iterable, level: int = 6) -> Iterator[bytes]:
+    """Compress a stream of str/bytes chunks into a gzip stream as it goes."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, GZIP_WBITS)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode("utf-8")
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def accepts_gzip(headers: Dict[str, str]) -> bool:
+    encodings = headers.get("accept-encoding", "")
+    return any(part.split(";")[0].strip() in ("gzip", "*") for part in encodings.split(","))
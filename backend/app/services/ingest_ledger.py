@@ -0,0 +1,101 @@
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional, Tuple
+import hashlib
+import json
+import logging
+from .csv_ingest import parse_engagement_and_history
+from ..models.ingest_ledger import IngestedFile
+
+logger = logging.getLogger(__name__)
+
+# How an upload relates to what the ledger has seen with the same settings:
+# "identical" content is skipped, "appended" skips the rows of the earlier
+# version it starts with, and "new" is ingested in full.
+LEDGER_MATCHES = ("identical", "appended", "new")
+
+
+def ledger_settings(
+    filename: str,
+    main_bucket: Optional[str] = None,
+    main_bucket_in_csv: bool = False,
+    merge_main_buckets: bool = False,
+    categorize: bool = False,
+) -> Dict:
+    """Everything besides the content that decides what ingesting a file writes."""
+    engagement_level, summit_history = parse_engagement_and_history(filename)
+    return {
+        "engagement_level": engagement_level,
+        "summit_history": summit_history,
+        "main_bucket": main_bucket,
+        "main_bucket_in_csv": bool(main_bucket_in_csv),
+        "merge_main_buckets": bool(merge_main_buckets),
+        "categorize": bool(categorize),
+    }
+
+
+def settings_key(settings: Dict) -> str:
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class IngestLedger:
+    """Content hashes of ingested files, so re-uploads skip what was already written.
+
+    Keyed on the sha256 of a file (or zip member) together with its
+    ledger_settings. Only contents are tracked, not the contacts they
+    produced: pass force to the upload endpoints to ingest a file again
+    after its contacts changed.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def versions(self, filenames: Iterable[str], settings: Dict[str, Dict]) -> Dict[str, List[IngestedFile]]:
+        """Earlier ingests of each filename with its settings, largest first."""
+        filenames = list(filenames)
+        found: Dict[str, List[IngestedFile]] = {name: [] for name in filenames}
+        if not filenames:
+            return found
+        keys = {name: settings_key(settings[name]) for name in filenames}
+        entries = self.db.query(IngestedFile).filter(IngestedFile.filename.in_(filenames)).order_by(IngestedFile.size.desc())
+        for entry in entries:
+            if entry.settings_key == keys[entry.filename]:
+                found[entry.filename].append(entry)
+        return found
+
+    def match(self, fingerprint: Dict, settings: Dict, versions: List[IngestedFile]) -> Tuple[str, Optional[IngestedFile]]:
+        """Classify a fingerprinted file as one of LEDGER_MATCHES, with the entry it matched."""
+        identical = self.db.query(IngestedFile).filter(
+            IngestedFile.sha256 == fingerprint["sha256"],
+            IngestedFile.settings_key == settings_key(settings),
+        ).order_by(IngestedFile.id.desc()).first()
+        if identical is not None:
+            return "identical", identical
+        for entry in versions:
+            # The earlier version is exactly where this one starts, up to a line end
+            if entry.size < fingerprint["size"] and fingerprint["prefixes"].get(entry.size) == entry.sha256:
+                return "appended", entry
+        return "new", None
+
+    def record(self, filename: str, fingerprint: Dict, settings: Dict, rows: int, outcome: Dict) -> IngestedFile:
+        entry = IngestedFile(
+            sha256=fingerprint["sha256"],
+            size=fingerprint["size"],
+            filename=filename,
+            engagement_level=settings["engagement_level"],
+            summit_history=settings["summit_history"],
+            main_bucket=settings["main_bucket"],
+            options={key: settings[key] for key in ("main_bucket_in_csv", "merge_main_buckets", "categorize")},
+            settings_key=settings_key(settings),
+            rows=rows,
+            outcome=outcome,
+        )
+        self.db.add(entry)
+        self.db.commit()
+        return entry
+
+
+def ledger_outcome(summary: Dict, match: str) -> Dict:
+    """The part of an ingest summary kept in the ledger."""
+    outcome = {key: summary.get(key, 0) for key in ("total", "inserted", "updated", "categorized", "skipped")}
+    outcome["ledger"] = match
+    return outcome
@@ -0,0 +1,357 @@
+from sqlalchemy.orm import Session
+from typing import BinaryIO, Callable, Dict, Iterable, Iterator, Optional, Union
+from collections import deque
+from itertools import islice
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing.managers import SyncManager
+import io
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import zipfile
+from .csv_ingest import (
+    HashingReader,
+    batched,
+    is_csv_member,
+    fingerprint_zip_member,
+    iter_contact_rows,
+    open_text_stream,
+    parse_engagement_and_history,
+    parse_zip_member,
+    zip_member_main_bucket,
+)
+from .ingest_ledger import IngestLedger, ledger_outcome, ledger_settings
+from .upsert_service import ContactUpsertService
+from ..core.metrics import INGEST_BATCH_DURATION, INGEST_ROWS
+
+logger = logging.getLogger(__name__)
+
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "5000"))
+ZIP_INGEST_WORKERS = int(os.getenv("ZIP_INGEST_WORKERS", str(os.cpu_count() or 2)))
+
+# Parsed batches a zip member may have waiting before its worker blocks
+PARSE_QUEUE_BATCHES = 2
+
+_parse_pool = None
+_parse_manager = None
+_parse_pool_lock = threading.Lock()
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    """Shared process pool used to parse zip members in parallel."""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=ZIP_INGEST_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _parse_pool
+
+
+def get_parse_manager() -> SyncManager:
+    """Shared manager process whose queues carry parsed batches back from the parse pool."""
+    global _parse_manager
+    with _parse_pool_lock:
+        if _parse_manager is None:
+            _parse_manager = multiprocessing.get_context("spawn").Manager()
+        return _parse_manager
+
+
+def _queued_rows(batches, future: Future) -> Iterator[Dict]:
+    """Rows a parse_zip_member worker puts on batches, up to its closing None."""
+    while True:
+        try:
+            batch = batches.get(timeout=1)
+        except queue.Empty:
+            if future.done():
+                # Every put of a finished worker has landed, so it failed
+                # before sending None (e.g. its process died)
+                future.result()
+                return
+            continue
+        if batch is None:
+            return
+        yield from batch
+
+
+def _worker_path(zip_file: Union[str, BinaryIO]) -> Optional[str]:
+    """A path the parse pool can open zip_file by without copying it, if there is one."""
+    if isinstance(zip_file, str):
+        return zip_file
+    try:
+        # Spooled uploads roll over to an unnamed temp file here
+        fd = zip_file.fileno()
+        zip_file.flush()
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        return None
+    # Linux exposes every open file, named or not, to processes of the same user
+    path = f"/proc/{os.getpid()}/fd/{fd}"
+    return path if os.path.exists(path) else None
+
+
+class IngestService:
+    """Streams parsed CSV rows into the database in fixed-size batches."""
+
+    def __init__(self, db: Session, batch_size: int = INGEST_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+
+    def ingest_rows(
+        self,
+        rows: Iterable[Dict],
+        merge_main_buckets: bool = False,
+        on_batch: Optional[Callable[[Dict], None]] = None,
+        categorize: bool = False,
+    ) -> Dict:
+        """Upsert rows batch by batch, committing after each batch.
+
+        With categorize, each batch is also assigned personality buckets
+        from its merged tags before the commit.
+        """
+        summary = {"total": 0, "inserted": 0, "updated": 0, "categorized": 0, "batches": []}
+        upserter = ContactUpsertService(self.db)
+        try:
+            for number, batch in enumerate(batched(rows, self.batch_size), start=1):
+                with INGEST_BATCH_DURATION.time():
+                    result = upserter.upsert(batch, merge_main_buckets=merge_main_buckets, categorize=categorize)
+                    self.db.commit()
+                INGEST_ROWS.inc(result["total"], stage="upserted")
+                progress = {"batch": number, **result, "processed": summary["total"] + result["total"]}
+                summary["total"] += result["total"]
+                summary["inserted"] += result["inserted"]
+                summary["updated"] += result["updated"]
+                summary["categorized"] += result["categorized"]
+                summary["batches"].append(progress)
+                logger.info(
+                    f"Batch {number}: upserted {result['total']} contacts "
+                    f"({result['inserted']} new, {result['updated']} updated), {progress['processed']} so far."
+                )
+                if on_batch:
+                    on_batch(progress)
+        except Exception:
+            self.db.rollback()
+            raise
+        return summary
+
+    def ingest_csv(
+        self,
+        text_stream: Iterable[str],
+        filename: str,
+        main_bucket: Optional[str] = None,
+        main_bucket_in_csv: bool = False,
+        merge_main_buckets: bool = False,
+        on_batch: Optional[Callable[[Dict], None]] = None,
+        categorize: bool = False,
+        skip_rows: int = 0,
+    ) -> Dict:
+        """Stream a CSV file into contacts using the /upload-csv row semantics.
+
+        The first skip_rows parsed rows are left out of the upsert, and
+        "rows" in the summary counts every parsed row.
+        """
+        engagement_level_file, summit_history_val = parse_engagement_and_history(filename)
+        skipped = 0
+        parsed = 0
+
+        def on_skip(row):
+            nonlocal skipped
+            skipped += 1
+            logger.warning(
+                f"Duplicate or missing email in upload: {row.get('Email', '')}. Skipping row.",
+                extra={"sample_key": "upload_skipped_row"},
+            )
+
+        def counted(rows):
+            nonlocal parsed
+            for row in rows:
+                parsed += 1
+                yield row
+
+        rows = counted(iter_contact_rows(
+            text_stream,
+            main_bucket=main_bucket,
+            main_bucket_in_csv=main_bucket_in_csv,
+            engagement_level_file=engagement_level_file,
+            summit_history_val=summit_history_val,
+            on_skip=on_skip,
+        ))
+        if skip_rows:
+            rows = islice(rows, skip_rows, None)
+        summary = self.ingest_rows(rows, merge_main_buckets=merge_main_buckets, on_batch=on_batch, categorize=categorize)
+        summary["skipped"] = skipped
+        summary["rows"] = parsed
+        # Rows parsed, including any skip_rows prefix, as the zip and upload paths count them
+        INGEST_ROWS.inc(parsed + skipped, stage="parsed")
+        INGEST_ROWS.inc(skipped, stage="skipped")
+        if skipped:
+            logger.info(f"Skipped {skipped} duplicate or missing-email rows in {filename}.")
+        return summary
+
+    def ingest_csv_file(
+        self,
+        raw: BinaryIO,
+        filename: str,
+        main_bucket: Optional[str] = None,
+        main_bucket_in_csv: bool = False,
+        merge_main_buckets: bool = False,
+        on_batch: Optional[Callable[[Dict], None]] = None,
+        categorize: bool = False,
+        force: bool = False,
+    ) -> Dict:
+        """ingest_csv for a seekable binary file, checked against the ingest ledger first.
+
+        A file already ingested byte for byte with the same settings is
+        skipped, and one that only appended rows to an earlier version has
+        just the new rows upserted. force ingests the whole file regardless.
+        "ledger" in the summary says which of LEDGER_MATCHES applied.
+        """
+        ledger = IngestLedger(self.db)
+        settings = ledger_settings(filename, main_bucket, main_bucket_in_csv, merge_main_buckets, categorize)
+        versions = ledger.versions([filename], {filename: settings})[filename]
+        start = raw.tell()
+        fingerprint = HashingReader(raw, [entry.size for entry in versions]).fingerprint()
+        raw.seek(start)
+        match, entry = ("new", None) if force else ledger.match(fingerprint, settings, versions)
+        if match == "identical":
+            logger.info(f"Skipping {filename}: identical to the file ingested as {entry.filename} at {entry.created_at}.")
+            return {"total": 0, "inserted": 0, "updated": 0, "categorized": 0, "skipped": 0, "batches": [], "rows": entry.rows, "ledger": match}
+        skip_rows = entry.rows if match == "appended" else 0
+        if skip_rows:
+            logger.info(f"{filename} appends to a version ingested at {entry.created_at}; skipping its first {skip_rows} rows.")
+        text_stream = open_text_stream(raw)
+        try:
+            summary = self.ingest_csv(
+                text_stream,
+                filename,
+                main_bucket=main_bucket,
+                main_bucket_in_csv=main_bucket_in_csv,
+                merge_main_buckets=merge_main_buckets,
+                on_batch=on_batch,
+                categorize=categorize,
+                skip_rows=skip_rows,
+            )
+        finally:
+            text_stream.detach()
+        summary["ledger"] = match
+        ledger.record(filename, fingerprint, settings, summary["rows"], ledger_outcome(summary, match))
+        return summary
+
+    def ingest_zip(
+        self,
+        zip_file: Union[str, BinaryIO],
+        use_folders: bool = True,
+        main_bucket: Optional[str] = None,
+        on_batch: Optional[Callable[[Dict], None]] = None,
+        categorize: bool = False,
+        force: bool = False,
+    ) -> Dict:
+        """Ingest every CSV in a zip archive with /upload-csv semantics.
+
+        Members are parsed, deduplicated and hashed in the parse pool
+        straight from the archive, and their rows are upserted in archive
+        order as the workers send them over. Each member is checked against
+        the ingest ledger like ingest_csv_file does for a file, unless force
+        is set. zip_file is either a path or a binary file object.
+        """
+        summary = {"total": 0, "inserted": 0, "updated": 0, "categorized": 0, "skipped": 0, "files": []}
+        zip_path = _worker_path(zip_file)
+        owns_copy = zip_path is None
+        if owns_copy:
+            # Worker processes need a path to open the archive from.
+            with tempfile.NamedTemporaryFile(suffix=".zip", delete=False) as tmp:
+                shutil.copyfileobj(zip_file, tmp)
+                zip_path = tmp.name
+        try:
+            with zipfile.ZipFile(zip_path) as archive:
+                members = [info.filename for info in archive.infolist() if not info.is_dir() and is_csv_member(info.filename)]
+            buckets = {member: zip_member_main_bucket(member, use_folders, main_bucket) for member in members}
+            settings = {member: ledger_settings(member, buckets[member], categorize=categorize) for member in members}
+            ledger = IngestLedger(self.db)
+            versions = ledger.versions(members, settings)
+            pool = get_parse_pool()
+            # Hashed ahead of parsing, so each member's ledger match is known before its rows are read
+            fingerprints = {} if force else {
+                member: pool.submit(fingerprint_zip_member, zip_path, member, [entry.size for entry in versions[member]])
+                for member in members
+            }
+            pending = deque()
+            try:
+                # Keep a bounded window of members in flight; each holds at most
+                # PARSE_QUEUE_BATCHES parsed batches until it is upserted.
+                for member in members:
+                    match, entry = ("new", None)
+                    if not force:
+                        match, entry = ledger.match(fingerprints[member].result(), settings[member], versions[member])
+                    parsing = {"file": member, "main_bucket": buckets[member], "match": match, "entry": entry}
+                    if match != "identical":
+                        parsing["batches"] = get_parse_manager().Queue(maxsize=PARSE_QUEUE_BATCHES)
+                        parsing["future"] = pool.submit(
+                            parse_zip_member, zip_path, member, buckets[member], parsing["batches"],
+                            entry.rows if match == "appended" else 0, self.batch_size,
+                        )
+                    pending.append(parsing)
+                    if len(pending) >= ZIP_INGEST_WORKERS * 2:
+                        self._ingest_zip_member(pending[0], summary, on_batch, categorize, settings[pending[0]["file"]])
+                        pending.popleft()
+                while pending:
+                    self._ingest_zip_member(pending[0], summary, on_batch, categorize, settings[pending[0]["file"]])
+                    pending.popleft()
+            finally:
+                # After an error, let the workers still sending rows finish so the pool stays usable
+                for parsing in pending:
+                    if "future" in parsing and not parsing["future"].cancel():
+                        try:
+                            for _ in _queued_rows(parsing["batches"], parsing["future"]):
+                                pass
+                        except Exception:
+                            pass
+        finally:
+            if owns_copy:
+                os.remove(zip_path)
+        return summary
+
+    def _ingest_zip_member(
+        self,
+        parsing: Dict,
+        summary: Dict,
+        on_batch: Optional[Callable[[Dict], None]],
+        categorize: bool,
+        settings: Dict,
+    ) -> None:
+        match, entry = parsing["match"], parsing["entry"]
+        if match == "identical":
+            logger.info(f"Skipping {parsing['file']}: identical to the file ingested as {entry.filename} at {entry.created_at}.")
+            result = {"total": 0, "inserted": 0, "updated": 0, "categorized": 0}
+            parsed = {"rows": 0, "skipped": 0}
+        else:
+            rows = _queued_rows(parsing["batches"], parsing["future"])
+            result = self.ingest_rows(rows, on_batch=on_batch, categorize=categorize)
+            parsed = parsing["future"].result()
+            IngestLedger(self.db).record(
+                parsing["file"], parsed["fingerprint"], settings, parsed["rows"],
+                ledger_outcome({**result, "skipped": parsed["skipped"]}, match),
+            )
+            logger.info(
+                f"Processed {parsing['file']} with main_bucket={parsing['main_bucket']}: "
+                f"{result['total']} upserted, {parsed['skipped']} skipped"
+                + (f", {entry.rows} rows already ingested." if match == "appended" else ".")
+            )
+        summary["total"] += result["total"]
+        summary["inserted"] += result["inserted"]
+        summary["updated"] += result["updated"]
+        summary["categorized"] += result["categorized"]
+        summary["skipped"] += parsed["skipped"]
+        INGEST_ROWS.inc(parsed["rows"] + parsed["skipped"], stage="parsed")
+        INGEST_ROWS.inc(parsed["skipped"], stage="skipped")
+        summary["files"].append({
+            "file": parsing["file"],
+            "main_bucket": parsing["main_bucket"],
+            "total": result["total"],
+            "skipped": parsed["skipped"],
+            "ledger": match,
+        })
@@ -0,0 +1,79 @@
+from sqlalchemy.orm import Session
+from typing import Dict
+import os
+from .batch_service import BatchService
+from .categorization_service import CategorizationService
+from .ingest_service import IngestService
+from .job_service import JobProgress, job_handler
+from .tag_index_service import TagIndexService
+from .tag_mapping_service import TagMappingService
+from .upload_service import UploadService
+
+# Importing this module registers the handlers with the job service.
+
+
+@job_handler("auto_categorize")
+def _auto_categorize(db: Session, params: Dict, progress: JobProgress):
+    TagMappingService(db).ensure_installed()
+    return BatchService(db).auto_categorize_contacts(progress=progress, engine=params.get("engine", "python"))
+
+
+@job_handler("categorize")
+def _categorize(db: Session, params: Dict, progress: JobProgress):
+    TagMappingService(db).ensure_installed()
+    return CategorizationService(db).categorize_uncategorized(progress=progress)
+
+
+@job_handler("recategorize_tags")
+def _recategorize_tags(db: Session, params: Dict, progress: JobProgress):
+    TagMappingService(db).ensure_installed()
+    return CategorizationService(db).recategorize_tags(params["tags"], progress=progress)
+
+
+@job_handler("rebuild_tag_index")
+def _rebuild_tag_index(db: Session, params: Dict, progress: JobProgress):
+    return TagIndexService(db).rebuild()
+
+
+@job_handler("ingest_csv")
+def _ingest_csv(db: Session, params: Dict, progress: JobProgress):
+    if params.get("categorize"):
+        TagMappingService(db).ensure_installed()
+    try:
+        with open(params["path"], "rb") as raw:
+            result = IngestService(db).ingest_csv_file(
+                raw,
+                params["filename"],
+                main_bucket=params.get("main_bucket"),
+                main_bucket_in_csv=params.get("main_bucket_in_csv", False),
+                merge_main_buckets=params.get("merge_main_buckets", False),
+                on_batch=lambda batch: progress.advance(batch["total"]),
+                categorize=params.get("categorize", False),
+                force=params.get("force", False),
+            )
+    finally:
+        os.remove(params["path"])
+    return {key: value for key, value in result.items() if key != "batches"}
+
+
+@job_handler("ingest_zip")
+def _ingest_zip(db: Session, params: Dict, progress: JobProgress):
+    if params.get("categorize"):
+        TagMappingService(db).ensure_installed()
+    try:
+        result = IngestService(db).ingest_zip(
+            params["path"],
+            use_folders=params.get("use_folders", True),
+            main_bucket=params.get("main_bucket"),
+            on_batch=lambda batch: progress.advance(batch["total"]),
+            categorize=params.get("categorize", False),
+            force=params.get("force", False),
+        )
+    finally:
+        os.remove(params["path"])
+    return result
+
+
+@job_handler("ingest_upload", pool="uploads")
+def _ingest_upload(db: Session, params: Dict, progress: JobProgress):
+    return UploadService(db).ingest(params["upload_id"], progress)
@@ -0,0 +1,342 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, func, or_
+from typing import Callable, Dict, Optional, Set
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from ..core.database import SessionLocal
+from ..models.job import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Minimum seconds between progress writes to the jobs table
+PROGRESS_INTERVAL = 0.5
+# Queued jobs (and running ones without a lease) untouched for this long are considered abandoned
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "300"))
+# Seconds a running job's lease lasts; its process renews it every third of
+# that, whether or not the job reports progress
+JOB_LEASE_SECONDS = int(os.getenv("JOB_LEASE_SECONDS", "60"))
+
+# Seconds between sweeps for jobs abandoned by stopped processes
+JOB_SWEEP_INTERVAL = float(os.getenv("JOB_SWEEP_INTERVAL", str(JOB_LEASE_SECONDS)))
+
+# Identifies this process in jobs.worker_id
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+TERMINAL_STATUSES = ("completed", "error")
+
+# Worker pools by name; job kinds that spend most of their time waiting get
+# their own pool (see define_job_pool) so they do not hold the shared workers
+_executors: Dict[str, ThreadPoolExecutor] = {
+    "default": ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job-worker"),
+}
+_handlers: Dict[str, Callable] = {}
+_handler_pools: Dict[str, str] = {}
+
+# Jobs running in this process, whose leases the renewal thread keeps alive
+_leased: Set[uuid.UUID] = set()
+_lease_lock = threading.Lock()
+_lease_thread: Optional[threading.Thread] = None
+_sweeper_thread: Optional[threading.Thread] = None
+_sweeper_lock = threading.Lock()
+
+
+def define_job_pool(name: str, workers: int) -> None:
+    """Create a named worker pool for job_handler(..., pool=name)."""
+    if name not in _executors:
+        _executors[name] = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f"{name}-worker")
+
+
+def job_handler(kind: str, pool: str = "default"):
+    """Register a function as the handler for a job kind.
+
+    Handlers are called as handler(db, params, progress) on a worker thread
+    of pool with their own session and return a JSON-serializable result.
+    """
+    if pool not in _executors:
+        raise ValueError(f"Unknown job pool: {pool}")
+
+    def decorator(func):
+        _handlers[kind] = func
+        _handler_pools[kind] = pool
+        return func
+    return decorator
+
+
+def _submit(job: Job) -> None:
+    _executors[_handler_pools.get(job.kind, "default")].submit(run_job, job.id)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def _lease_expiry():
+    return _now() + timedelta(seconds=JOB_LEASE_SECONDS)
+
+
+def _renew_leases() -> None:
+    while True:
+        time.sleep(JOB_LEASE_SECONDS / 3)
+        with _lease_lock:
+            job_ids = list(_leased)
+        if not job_ids:
+            continue
+        db = SessionLocal()
+        try:
+            db.query(Job).filter(Job.id.in_(job_ids), Job.worker_id == WORKER_ID).update(
+                {Job.lease_expires_at: _lease_expiry()}, synchronize_session=False
+            )
+            db.commit()
+        except Exception as e:
+            logger.warning(f"Could not renew job leases: {e}")
+        finally:
+            db.close()
+
+
+def _hold_lease(job_id: uuid.UUID) -> None:
+    global _lease_thread
+    with _lease_lock:
+        _leased.add(job_id)
+        if _lease_thread is None:
+            _lease_thread = threading.Thread(target=_renew_leases, name="job-lease", daemon=True)
+            _lease_thread.start()
+
+
+def _release_lease(job_id: uuid.UUID) -> None:
+    with _lease_lock:
+        _leased.discard(job_id)
+
+
+class JobProgress:
+    """Records processed/failed counts for a running job, throttled to PROGRESS_INTERVAL."""
+
+    def __init__(self, job_id: uuid.UUID, processed: int = 0, failed: int = 0, checkpoint: Optional[str] = None):
+        self.job_id = job_id
+        self.total = None
+        self.processed = processed
+        self.failed = failed
+        self.checkpoint = checkpoint
+        self._started = time.monotonic()
+        self._start_processed = processed
+        self._last_flush = 0.0
+        self._lock = threading.Lock()
+
+    def set_total(self, total: int) -> None:
+        self.total = total
+        self.flush(force=True)
+
+    def advance(self, processed: int, failed: int = 0, checkpoint: Optional[str] = None) -> None:
+        """Add to the counts; checkpoint marks work up to that key as committed."""
+        with self._lock:
+            self.processed += processed
+            self.failed += failed
+            if checkpoint is not None:
+                self.checkpoint = checkpoint
+        self.flush()
+
+    @property
+    def throughput(self) -> float:
+        elapsed = time.monotonic() - self._started
+        return (self.processed - self._start_processed) / elapsed if elapsed > 0 else 0.0
+
+    def flush(self, force: bool = False, values: Optional[Dict] = None) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_flush < PROGRESS_INTERVAL:
+            return
+        self._last_flush = now
+        db = SessionLocal()
+        try:
+            db.query(Job).filter(Job.id == self.job_id).update({
+                Job.total: self.total,
+                Job.processed: self.processed,
+                Job.failed: self.failed,
+                Job.throughput: self.throughput,
+                Job.checkpoint: self.checkpoint,
+                Job.updated_at: _now(),
+                **(values or {}),
+            })
+            db.commit()
+        finally:
+            db.close()
+
+
+class JobService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, kind: str, params: Optional[Dict] = None) -> Job:
+        """Create a queued job and hand it to the local worker pool."""
+        if kind not in _handlers:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job = Job(kind=kind, params=params or {}, status="queued")
+        self.db.add(job)
+        self.db.commit()
+        self.db.refresh(job)
+        _submit(job)
+        logger.info(f"Enqueued {kind} job {job.id}")
+        return job
+
+    def requeue(self, job: Job) -> None:
+        """Run a failed job again; it resumes from its checkpoint."""
+        job.status = "queued"
+        job.error = None
+        job.finished_at = None
+        job.worker_id = None
+        job.lease_expires_at = None
+        job.updated_at = _now()
+        self.db.commit()
+        _submit(job)
+        logger.info(f"Requeued {job.kind} job {job.id} from checkpoint {job.checkpoint}")
+
+    def get(self, job_id: str, for_update: bool = False) -> Optional[Job]:
+        try:
+            job_uuid = uuid.UUID(str(job_id))
+        except ValueError:
+            return None
+        query = self.db.query(Job).filter(Job.id == job_uuid)
+        if for_update:
+            query = query.with_for_update()
+        return query.first()
+
+    def status(self, job_id: str) -> Optional[Dict]:
+        job = self.get(job_id)
+        return job_status(job) if job else None
+
+
+def job_status(job: Job) -> Dict:
+    """Serialize a job for the status and stream endpoints."""
+    if job.status == "completed":
+        progress = 100
+    elif job.total:
+        progress = min(100, round(job.processed * 100 / job.total))
+    else:
+        progress = 0
+    if job.status == "error":
+        message = job.error
+    elif job.status == "completed":
+        message = f"Processed {job.processed} records"
+    else:
+        message = f"{job.processed} of {job.total if job.total is not None else '?'} processed"
+    return {
+        "batch_id": str(job.id),
+        "task_id": str(job.id),
+        "kind": job.kind,
+        "status": job.status,
+        "total": job.total,
+        "processed": job.processed,
+        "success": job.processed - job.failed,
+        "failed": job.failed,
+        "throughput": job.throughput,
+        "progress": progress,
+        "message": message,
+        "result": job.result,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def run_job(job_id: uuid.UUID) -> None:
+    """Execute a queued job on the current worker thread."""
+    db = SessionLocal()
+    try:
+        # Claim the job atomically so a duplicate submission is a no-op
+        claimed = db.query(Job).filter(Job.id == job_id, Job.status == "queued").update({
+            Job.status: "running",
+            Job.started_at: func.coalesce(Job.started_at, func.now()),
+            Job.updated_at: func.now(),
+            Job.worker_id: WORKER_ID,
+            Job.lease_expires_at: _lease_expiry(),
+        }, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            return
+        _hold_lease(job_id)
+        job = db.query(Job).filter(Job.id == job_id).first()
+        progress = JobProgress(job.id, processed=job.processed or 0, failed=job.failed or 0, checkpoint=job.checkpoint)
+        progress.total = job.total
+        handler = _handlers[job.kind]
+        params = dict(job.params or {})
+        try:
+            result = handler(db, params, progress)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Job {job_id} ({job.kind}) failed: {e}", exc_info=True)
+            progress.flush(force=True, values={
+                Job.status: "error", Job.error: str(e), Job.finished_at: _now(), Job.lease_expires_at: None,
+            })
+            return
+        progress.flush(force=True, values={
+            Job.status: "completed", Job.result: result, Job.finished_at: _now(), Job.lease_expires_at: None,
+        })
+        logger.info(f"Job {job_id} ({job.kind}) completed: {progress.processed} processed at {progress.throughput:.0f}/s")
+    finally:
+        _release_lease(job_id)
+        db.close()
+
+
+def lease_expired(job: Job) -> bool:
+    """True for a running job whose process stopped renewing its lease."""
+    return job.status == "running" and job.lease_expires_at is not None and job.lease_expires_at < _now()
+
+
+def resume_interrupted_jobs() -> int:
+    """Requeue jobs abandoned by a stopped process so they continue from their checkpoint.
+
+    A running job is only reclaimed once its lease expired, so jobs that
+    live workers are still running are left alone however slow they are.
+    """
+    db = SessionLocal()
+    try:
+        now = _now()
+        cutoff = now - timedelta(seconds=JOB_STALE_AFTER)
+        stale = db.query(Job).filter(or_(
+            and_(Job.status == "running", Job.lease_expires_at < now),
+            # Queued jobs, and running ones from before leases were recorded
+            and_(
+                Job.status.in_(("queued", "running")),
+                Job.lease_expires_at.is_(None),
+                func.coalesce(Job.updated_at, Job.created_at) < cutoff,
+            ),
+        )).with_for_update(skip_locked=True).all()
+        for job in stale:
+            job.status = "queued"
+            job.worker_id = None
+            job.lease_expires_at = None
+            job.updated_at = _now()
+        db.commit()
+        for job in stale:
+            logger.info(f"Resuming interrupted {job.kind} job {job.id} from checkpoint {job.checkpoint}")
+            _submit(job)
+        return len(stale)
+    finally:
+        db.close()
+
+
+def _sweep_jobs() -> None:
+    while True:
+        time.sleep(JOB_SWEEP_INTERVAL)
+        try:
+            resume_interrupted_jobs()
+        except Exception as e:
+            logger.warning(f"Could not sweep for interrupted jobs: {e}")
+
+
+def start_job_sweeper() -> None:
+    """Keep calling resume_interrupted_jobs every JOB_SWEEP_INTERVAL seconds.
+
+    Leases of jobs left by a process that stopped moments ago are still
+    valid at startup, so those jobs are only picked up by a later sweep.
+    """
+    global _sweeper_thread
+    with _sweeper_lock:
+        if _sweeper_thread is None:
+            _sweeper_thread = threading.Thread(target=_sweep_jobs, name="job-sweeper", daemon=True)
+            _sweeper_thread.start()
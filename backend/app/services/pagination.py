@@ -0,0 +1,151 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import and_, or_, select, func, text, tuple_
+from sqlalchemy.sql import Select
+from typing import Dict, List, Optional, Tuple
+import base64
+import json
+import os
+import threading
+import time
+import uuid
+from ..models.contact import Contact
+
+PAGING_MODES = ("offset", "cursor")
+# "exact" runs COUNT(*), "estimate" reads the planner's row estimate and
+# "cached" reuses an exact count for COUNT_CACHE_TTL seconds.
+TOTAL_MODES = ("exact", "estimate", "cached")
+
+# Columns that can order a cursor page; each has a (column, id) index
+KEYSET_SORT_FIELDS = (
+    "email",
+    "full_name",
+    "company",
+    "main_bucket_assignment",
+    "personality_bucket_assignment",
+)
+
+COUNT_CACHE_TTL = float(os.getenv("COUNT_CACHE_TTL", "30"))
+COUNT_CACHE_SIZE = 256
+
+_count_cache: Dict[Tuple, Tuple[float, int]] = {}
+_count_cache_lock = threading.Lock()
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(sort_field: str, sort_dir: str, value, contact_id, direction: str) -> str:
+    payload = {"f": sort_field, "d": sort_dir, "v": value, "id": str(contact_id), "p": direction}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        payload["id"] = uuid.UUID(payload["id"])
+        if payload["p"] not in ("next", "prev") or payload["f"] not in KEYSET_SORT_FIELDS:
+            raise ValueError(payload["p"])
+        return payload
+    except (ValueError, KeyError, TypeError) as e:
+        raise InvalidCursor(f"Invalid cursor: {e}")
+
+
+def _order(column, descending: bool):
+    # Ascending puts NULLs last and descending puts them first, like Postgres'
+    # default, so cursor and offset pages agree on the order.
+    if descending:
+        return [column.desc().nulls_first(), Contact.id.desc()]
+    return [column.asc().nulls_last(), Contact.id.asc()]
+
+
+def _after(column, value, contact_id, descending: bool):
+    """Rows strictly after (value, contact_id) in the _order(column, descending) order."""
+    if descending:
+        if value is None:
+            return or_(and_(column.is_(None), Contact.id < contact_id), column.isnot(None))
+        return tuple_(column, Contact.id) < tuple_(value, contact_id)
+    if value is None:
+        return and_(column.is_(None), Contact.id > contact_id)
+    return or_(tuple_(column, Contact.id) > tuple_(value, contact_id), column.is_(None))
+
+
+def keyset_page(
+    db: Session,
+    stmt: Select,
+    sort_field: str,
+    sort_dir: str,
+    limit: int,
+    cursor: Optional[str] = None,
+) -> Dict:
+    """Fetch one page of stmt ordered by (sort_field, id), starting at cursor.
+
+    A "next" cursor continues after the last row of a page and a "prev"
+    cursor continues before the first one, so every page is an index range
+    scan of limit + 1 rows no matter how deep it is.
+    """
+    column = getattr(Contact, sort_field)
+    descending = sort_dir == "desc"
+    backward = False
+    if cursor:
+        position = decode_cursor(cursor)
+        if position["f"] != sort_field or position["d"] != sort_dir:
+            raise InvalidCursor("Cursor was issued for a different sort order")
+        backward = position["p"] == "prev"
+        # Walking backwards is walking forwards in the reversed order
+        stmt = stmt.where(_after(column, position["v"], position["id"], descending != backward))
+    rows: List[Contact] = list(
+        db.execute(stmt.order_by(*_order(column, descending != backward)).limit(limit + 1)).scalars()
+    )
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if backward:
+        rows.reverse()
+
+    def cursor_for(contact: Contact, direction: str) -> str:
+        return encode_cursor(sort_field, sort_dir, getattr(contact, sort_field), contact.id, direction)
+
+    # Going forwards there is a previous page whenever we started from a
+    # cursor; going backwards we came from a page, so there is a next one.
+    more_after = True if backward else has_more
+    more_before = has_more if backward else cursor is not None
+    next_cursor = cursor_for(rows[-1], "next") if rows and more_after else None
+    prev_cursor = cursor_for(rows[0], "prev") if rows and more_before else None
+    return {"contacts": rows, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
+
+
+def estimate_count(db: Session, stmt: Select) -> int:
+    """The planner's row estimate for stmt, without running it."""
+    compiled = stmt.order_by(None).compile(dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def exact_count(db: Session, stmt: Select) -> int:
+    return db.execute(select(func.count()).select_from(stmt.order_by(None).subquery())).scalar()
+
+
+def cached_count(db: Session, stmt: Select, key: Tuple) -> int:
+    """Exact count of stmt, reused for COUNT_CACHE_TTL seconds per filter key."""
+    now = time.monotonic()
+    with _count_cache_lock:
+        hit = _count_cache.get(key)
+        if hit and now - hit[0] < COUNT_CACHE_TTL:
+            return hit[1]
+    count = exact_count(db, stmt)
+    with _count_cache_lock:
+        if len(_count_cache) >= COUNT_CACHE_SIZE:
+            _count_cache.pop(min(_count_cache, key=lambda k: _count_cache[k][0]))
+        _count_cache[key] = (now, count)
+    return count
+
+
+def count_total(db: Session, stmt: Select, mode: str, key: Tuple) -> int:
+    if mode == "estimate":
+        return estimate_count(db, stmt)
+    if mode == "cached":
+        return cached_count(db, stmt, key)
+    return exact_count(db, stmt)
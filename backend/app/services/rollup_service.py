@@ -0,0 +1,143 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, text
+from typing import Dict, List, Optional
+import logging
+from ..models.contact_rollup import ContactRollup
+
+logger = logging.getLogger(__name__)
+
+_KEY_COLUMNS = [
+    "is_in_main_bucket_biz",
+    "is_in_main_bucket_health",
+    "is_in_main_bucket_survivalist",
+    "personality_bucket",
+    "engagement_level",
+]
+
+# The rollup key of a contacts row aliased as c
+_KEY_EXPRESSIONS = [
+    "c.is_in_main_bucket_biz",
+    "c.is_in_main_bucket_health",
+    "c.is_in_main_bucket_survivalist",
+    "COALESCE(c.personality_bucket_assignment, '')",
+    "COALESCE(c.engagement_level, '')",
+]
+
+# Counts the matching contacts per key and adds sign * count to the rollup.
+# The rows are locked so no other writer can move them between the
+# subtract-before and add-after of one transaction.
+_APPLY_SQL = """
+INSERT INTO contact_rollup ({keys}, contacts)
+SELECT {keys}, :sign * count(*)
+FROM (
+    SELECT {expressions}
+    FROM contacts AS c
+    {join}
+    WHERE {condition}
+    FOR UPDATE OF c
+) AS c ({keys})
+GROUP BY {keys}
+ON CONFLICT ({keys}) DO UPDATE SET contacts = contact_rollup.contacts + EXCLUDED.contacts
+"""
+
+_REBUILD_SQL = """
+INSERT INTO contact_rollup ({keys}, contacts)
+SELECT {expressions}, count(*)
+FROM contacts AS c
+GROUP BY {expressions}
+"""
+
+
+class RollupService:
+    """Maintains contact_rollup and answers the dashboard counts from it.
+
+    Writers call subtract() for the contacts they are about to change and
+    add() for the same contacts afterwards, in the same transaction.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def subtract(self, condition: str, params: Optional[Dict] = None, join: str = "") -> None:
+        self._apply(-1, condition, params, join)
+
+    def add(self, condition: str, params: Optional[Dict] = None, join: str = "") -> None:
+        self._apply(1, condition, params, join)
+
+    def subtract_ids(self, ids: List[str]) -> None:
+        self.subtract("c.id = ANY(CAST(:rollup_ids AS uuid[]))", {"rollup_ids": ids})
+
+    def add_ids(self, ids: List[str]) -> None:
+        self.add("c.id = ANY(CAST(:rollup_ids AS uuid[]))", {"rollup_ids": ids})
+
+    def _apply(self, sign: int, condition: str, params: Optional[Dict], join: str) -> None:
+        statement = _APPLY_SQL.format(
+            keys=", ".join(_KEY_COLUMNS),
+            expressions=", ".join(_KEY_EXPRESSIONS),
+            join=join,
+            condition=condition,
+        )
+        self.db.execute(text(statement), {"sign": sign, **(params or {})})
+
+    def rebuild(self) -> Dict[str, int]:
+        """Recount contact_rollup from the contacts table.
+
+        Blocks writers until the rebuild commits, so deltas from
+        transactions in flight are neither lost nor counted twice.
+        """
+        try:
+            self.db.execute(text("LOCK TABLE contact_rollup IN SHARE ROW EXCLUSIVE MODE"))
+            self.db.execute(text("DELETE FROM contact_rollup"))
+            self.db.execute(text(_REBUILD_SQL.format(
+                keys=", ".join(_KEY_COLUMNS),
+                expressions=", ".join(_KEY_EXPRESSIONS),
+            )))
+            rows = self.db.query(ContactRollup).count()
+            total = self.total()
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise Exception(f"Rollup rebuild failed: {str(e)}")
+        logger.info(f"Rebuilt contact rollup: {rows} rows covering {total} contacts.")
+        return {"rows": rows, "total": total}
+
+    def needs_backfill(self) -> bool:
+        """True when contacts exist but the rollup has never been built."""
+        if self.db.query(ContactRollup).first() is not None:
+            return False
+        return self.db.execute(text("SELECT EXISTS (SELECT 1 FROM contacts)")).scalar()
+
+    def total(self, *conditions) -> int:
+        stmt = select(func.coalesce(func.sum(ContactRollup.contacts), 0))
+        for condition in conditions:
+            stmt = stmt.where(condition)
+        return int(self.db.execute(stmt).scalar())
+
+    def personality_buckets(self) -> List[Dict]:
+        """Contacts per personality bucket, uncategorized contacts excluded."""
+        count = func.sum(ContactRollup.contacts)
+        rows = self.db.execute(
+            select(ContactRollup.personality_bucket, count)
+            .where(ContactRollup.personality_bucket != "")
+            .group_by(ContactRollup.personality_bucket)
+            .having(count > 0)
+            .order_by(ContactRollup.personality_bucket)
+        ).all()
+        return [{"bucket": bucket, "count": int(total)} for bucket, total in rows]
+
+    def stats(self) -> Dict[str, int]:
+        count = func.sum(ContactRollup.contacts)
+        # Distinct personality buckets in use, with uncategorized counting as one
+        categories = self.db.execute(
+            select(func.count()).select_from(
+                select(ContactRollup.personality_bucket)
+                .group_by(ContactRollup.personality_bucket)
+                .having(count > 0)
+                .subquery()
+            )
+        ).scalar()
+        return {
+            "total_contacts": self.total(),
+            "unique_categorized": self.total(ContactRollup.personality_bucket != ""),
+            "categories": categories,
+        }
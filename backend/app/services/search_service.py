@@ -0,0 +1,98 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, or_, select, text
+from sqlalchemy.sql import Select
+from typing import Dict, List, Optional
+import json
+from ..models.contact import Contact
+from ..models.contact_tag import ContactTag
+from ..models.tag import Tag
+
+# "contains" matches anywhere in email or name through the trigram indexes,
+# "prefix" only matches the start and is served by the text_pattern_ops indexes.
+SEARCH_MODES = ("contains", "prefix")
+
+# Indexes backing GET /contacts filters, created in core/migrations.py
+SEARCH_INDEXES = (
+    "ix_contacts_email_trgm",
+    "ix_contacts_full_name_trgm",
+    "ix_contacts_email_prefix",
+    "ix_contacts_full_name_prefix",
+)
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_condition(search: str, mode: str = "contains"):
+    """Case-insensitive match on email or full name, shaped to hit the lower() indexes."""
+    term = _escape_like(search.lower())
+    pattern = f"{term}%" if mode == "prefix" else f"%{term}%"
+    return or_(
+        func.lower(Contact.email).like(pattern, escape="\\"),
+        func.lower(Contact.full_name).like(pattern, escape="\\"),
+    )
+
+
+def tag_condition(tag: str):
+    """Contacts carrying tag, looked up through contact_tags."""
+    tag_id = select(Tag.id).where(Tag.name == tag).scalar_subquery()
+    return (
+        select(ContactTag.contact_id)
+        .where(ContactTag.contact_id == Contact.id, ContactTag.tag_id == tag_id)
+        .exists()
+    )
+
+
+class ContactSearchService:
+    """Builds the filtered contact statements behind GET /contacts."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def filtered(
+        self,
+        main_bucket: Optional[str] = None,
+        personality_bucket: Optional[str] = None,
+        tag: Optional[str] = None,
+        search: Optional[str] = None,
+        search_mode: str = "contains",
+    ) -> Select:
+        stmt = select(Contact)
+        if main_bucket:
+            stmt = stmt.where(Contact.main_bucket_assignment == main_bucket)
+        if personality_bucket:
+            stmt = stmt.where(Contact.personality_bucket_assignment == personality_bucket)
+        if tag:
+            stmt = stmt.where(tag_condition(tag))
+        if search:
+            stmt = stmt.where(search_condition(search, search_mode))
+        return stmt
+
+    def explain(self, stmt: Select, analyze: bool = False) -> Dict:
+        """Run EXPLAIN on stmt and report which of the search indexes the planner chose."""
+        compiled = stmt.compile(dialect=self.db.get_bind().dialect, compile_kwargs={"literal_binds": True})
+        options = "ANALYZE, FORMAT JSON" if analyze else "FORMAT JSON"
+        plan = self.db.execute(text(f"EXPLAIN ({options}) {compiled}")).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        root = plan[0]["Plan"]
+        indexes = sorted(set(_plan_indexes(root)))
+        return {
+            "indexes": indexes,
+            "uses_search_index": any(index in SEARCH_INDEXES for index in indexes),
+            "sequential_scan": _has_node(root, "Seq Scan"),
+            "total_cost": root.get("Total Cost"),
+            "plan": plan,
+        }
+
+
+def _plan_indexes(node: Dict) -> List[str]:
+    names = [node["Index Name"]] if "Index Name" in node else []
+    for child in node.get("Plans", []):
+        names.extend(_plan_indexes(child))
+    return names
+
+
+def _has_node(node: Dict, node_type: str) -> bool:
+    return node.get("Node Type") == node_type or any(_has_node(child, node_type) for child in node.get("Plans", []))
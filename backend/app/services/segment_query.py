@@ -0,0 +1,202 @@
+from dataclasses import dataclass
+from sqlalchemy import and_, or_
+from typing import List, Optional, Tuple, Union
+import re
+from ..models.contact import Contact
+from .search_service import tag_condition
+
+MAX_QUERY_LENGTH = 4000
+MAX_TERMS = 200
+# Nested parentheses and NOTs
+MAX_DEPTH = 50
+
+# Segment expressions compile to one condition on contacts: tag terms go
+# through the contact_tags index, the other fields compare indexed columns.
+# Field -> contact columns compared for equality; tag is handled separately
+SEGMENT_FIELDS = {
+    "tag": (),
+    "bucket": (Contact.main_bucket_assignment, Contact.personality_bucket_assignment),
+    "main": (Contact.main_bucket_assignment,),
+    "personality": (Contact.personality_bucket_assignment,),
+    "engagement": (Contact.engagement_level,),
+}
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<lparen>\()
+      | (?P<rparen>\))
+      | (?P<field>[A-Za-z_]+):(?:"(?P<quoted>(?:[^"\\]|\\.)*)"|(?P<bare>[^\s()"]+))
+      | (?P<word>[^\s()"]+)
+    )
+""", re.VERBOSE)
+
+_KEYWORDS = ("AND", "OR", "NOT")
+
+
+class SegmentQueryError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Term:
+    field: str
+    value: str
+
+
+@dataclass(frozen=True)
+class Not:
+    operand: "Node"
+
+
+@dataclass(frozen=True)
+class And:
+    operands: Tuple["Node", ...]
+
+
+@dataclass(frozen=True)
+class Or:
+    operands: Tuple["Node", ...]
+
+
+Node = Union[Term, Not, And, Or]
+
+
+def _tokenize(query: str) -> List[Tuple[str, object]]:
+    tokens = []
+    position = 0
+    query = query.rstrip()
+    while position < len(query):
+        match = _TOKEN.match(query, position)
+        if not match or match.end() == position:
+            raise SegmentQueryError(f"Unexpected character at position {position}: {query[position:position + 10]!r}")
+        position = match.end()
+        if match.group("lparen"):
+            tokens.append(("(", None))
+        elif match.group("rparen"):
+            tokens.append((")", None))
+        elif match.group("field"):
+            field = match.group("field").lower()
+            if field not in SEGMENT_FIELDS:
+                raise SegmentQueryError(f"Unknown field {field!r}; use one of {', '.join(SEGMENT_FIELDS)}")
+            quoted = match.group("quoted")
+            value = re.sub(r"\\(.)", r"\1", quoted) if quoted is not None else match.group("bare")
+            if field == "engagement":
+                value = value.upper()
+            tokens.append(("term", Term(field, value)))
+        elif match.group("word").upper() in _KEYWORDS:
+            tokens.append((match.group("word").upper(), None))
+        else:
+            raise SegmentQueryError(f"Expected field:value, AND, OR, NOT or parentheses, got {match.group('word')!r}")
+    return tokens
+
+
+class _Parser:
+    def __init__(self, tokens: List[Tuple[str, object]]):
+        self.tokens = tokens
+        self.position = 0
+        self.depth = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.position][0] if self.position < len(self.tokens) else None
+
+    def take(self, kind: str):
+        if self.peek() != kind:
+            expected = "a field:value term" if kind == "term" else repr(kind)
+            found = repr(self.peek()) if self.peek() else "the end of the query"
+            raise SegmentQueryError(f"Expected {expected} but found {found}")
+        value = self.tokens[self.position][1]
+        self.position += 1
+        return value
+
+    def parse(self) -> Node:
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise SegmentQueryError(f"Unexpected {self.peek()!r} after a complete expression")
+        return node
+
+    def parse_or(self) -> Node:
+        operands = [self.parse_and()]
+        while self.peek() == "OR":
+            self.take("OR")
+            operands.append(self.parse_and())
+        return operands[0] if len(operands) == 1 else Or(tuple(operands))
+
+    def parse_and(self) -> Node:
+        operands = [self.parse_not()]
+        # An operand directly after another one is an implicit AND
+        while self.peek() in ("AND", "NOT", "(", "term"):
+            if self.peek() == "AND":
+                self.take("AND")
+            operands.append(self.parse_not())
+        return operands[0] if len(operands) == 1 else And(tuple(operands))
+
+    def parse_not(self) -> Node:
+        if self.peek() not in ("NOT", "("):
+            return self.take("term")
+        self.depth += 1
+        if self.depth > MAX_DEPTH:
+            raise SegmentQueryError(f"Segment query is nested more than {MAX_DEPTH} levels deep")
+        if self.peek() == "NOT":
+            self.take("NOT")
+            node = Not(self.parse_not())
+        else:
+            self.take("(")
+            node = self.parse_or()
+            self.take(")")
+        self.depth -= 1
+        return node
+
+
+def parse_segment(query: str) -> Node:
+    """Parse a segment expression, raising SegmentQueryError on bad input.
+
+        (tag:A OR tag:B) AND bucket:"NED Health" AND NOT engagement:L
+
+    Terms are field:value with a field from SEGMENT_FIELDS; values holding
+    spaces or parentheses are double-quoted, with \\" and \\\\ escapes.
+    NOT binds tightest, then AND, then OR; terms written side by side are
+    AND-ed. Keywords are case-insensitive.
+    """
+    if not query or not query.strip():
+        raise SegmentQueryError("Segment query is empty")
+    if len(query) > MAX_QUERY_LENGTH:
+        raise SegmentQueryError(f"Segment query is longer than {MAX_QUERY_LENGTH} characters")
+    tokens = _tokenize(query)
+    if sum(1 for kind, _ in tokens if kind == "term") > MAX_TERMS:
+        raise SegmentQueryError(f"Segment query has more than {MAX_TERMS} terms")
+    return _Parser(tokens).parse()
+
+
+def _term_condition(term: Term, negated: bool):
+    if term.field == "tag":
+        exists = tag_condition(term.value)
+        return ~exists if negated else exists
+    columns = SEGMENT_FIELDS[term.field]
+    if negated:
+        # NULL is "not this value" too, so uncategorized contacts stay in NOT bucket:X
+        return and_(*(column.is_distinct_from(term.value) for column in columns))
+    return or_(*(column == term.value for column in columns))
+
+
+def compile_segment(node: Node, negated: bool = False):
+    """SQL condition for node, with NOT pushed down to the terms."""
+    if isinstance(node, Term):
+        return _term_condition(node, negated)
+    if isinstance(node, Not):
+        return compile_segment(node.operand, not negated)
+    parts = [compile_segment(operand, negated) for operand in node.operands]
+    # De Morgan: NOT (a AND b) is NOT a OR NOT b
+    if isinstance(node, And) != negated:
+        return and_(*parts)
+    return or_(*parts)
+
+
+def format_segment(node: Node) -> str:
+    """Canonical text for node, fully parenthesized and with quoted values."""
+    if isinstance(node, Term):
+        value = node.value.replace("\\", "\\\\").replace('"', '\\"')
+        return f'{node.field}:"{value}"'
+    if isinstance(node, Not):
+        return f"NOT {format_segment(node.operand)}"
+    joiner = " AND " if isinstance(node, And) else " OR "
+    return "(" + joiner.join(format_segment(operand) for operand in node.operands) + ")"
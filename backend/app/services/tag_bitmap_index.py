@@ -0,0 +1,243 @@
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import logging
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Roaring layout: values are split into 2**16-wide chunks by their high bits;
+# a chunk holds a sorted uint16 array while sparse and a 1024-word bitmap once
+# it has more than ARRAY_MAX values (where the bitmap becomes smaller).
+CHUNK_BITS = 16
+CHUNK_MASK = (1 << CHUNK_BITS) - 1
+ARRAY_MAX = 4096
+
+_LOAD_SQL = """
+SELECT t.name, array_agg(c.ordinal)
+FROM contact_tags AS ct
+JOIN tags AS t ON t.id = ct.tag_id
+JOIN contacts AS c ON c.id = ct.contact_id
+GROUP BY t.name
+"""
+
+# Tags per /tags/co-occurrence request; pairs grow with its square
+CO_OCCURRENCE_MAX_TAGS = 100
+
+# Session.info key for tag additions waiting for their transaction to commit
+_PENDING_KEY = "tag_bitmap_pending"
+
+if hasattr(np, "bitwise_count"):
+    def _popcount(words: np.ndarray) -> int:
+        return int(np.bitwise_count(words).sum())
+else:
+    def _popcount(words: np.ndarray) -> int:
+        return int(np.unpackbits(words.view(np.uint8)).sum())
+
+
+def _to_bitmap(lows: np.ndarray) -> np.ndarray:
+    bits = np.zeros(1 << CHUNK_BITS, dtype=bool)
+    bits[lows] = True
+    return np.packbits(bits, bitorder="little").view(np.uint64)
+
+
+def _container(lows: np.ndarray) -> np.ndarray:
+    """A chunk's container for its sorted, unique low bits."""
+    return lows.astype(np.uint16) if len(lows) <= ARRAY_MAX else _to_bitmap(lows)
+
+
+def _lows(container: np.ndarray) -> np.ndarray:
+    if container.dtype == np.uint16:
+        return container
+    bits = np.unpackbits(container.view(np.uint8), bitorder="little")
+    return np.flatnonzero(bits).astype(np.uint16)
+
+
+def _cardinality(container: np.ndarray) -> int:
+    return len(container) if container.dtype == np.uint16 else _popcount(container)
+
+
+def _intersection_cardinality(a: np.ndarray, b: np.ndarray) -> int:
+    a_array, b_array = a.dtype == np.uint16, b.dtype == np.uint16
+    if a_array and b_array:
+        if len(a) > len(b):
+            a, b = b, a
+        if not len(a):
+            return 0
+        # Look the smaller sorted array up in the larger one
+        positions = b.searchsorted(a)
+        positions[positions == len(b)] = 0
+        return int((b[positions] == a).sum())
+    if not a_array and not b_array:
+        return _popcount(a & b)
+    array, bitmap = (a, b) if a_array else (b, a)
+    positions = array.astype(np.uint64)
+    return int(np.count_nonzero((bitmap[positions >> 6] >> (positions & 63)) & 1))
+
+
+class RoaringBitmap:
+    """A compressed set of non-negative integers (contact ordinals)."""
+
+    __slots__ = ("containers",)
+
+    def __init__(self, values: Iterable[int] = ()):
+        # chunk (high bits) -> container
+        self.containers: Dict[int, np.ndarray] = {}
+        self.update(values)
+
+    def update(self, values: Iterable[int]) -> None:
+        values = np.unique(np.fromiter(values, dtype=np.uint64) if not isinstance(values, np.ndarray) else values.astype(np.uint64))
+        if not len(values):
+            return
+        highs = values >> CHUNK_BITS
+        chunks, starts = np.unique(highs, return_index=True)
+        for chunk, lows in zip(chunks.tolist(), np.split(values & CHUNK_MASK, starts[1:])):
+            existing = self.containers.get(chunk)
+            if existing is not None:
+                lows = np.union1d(_lows(existing), lows)
+            self.containers[chunk] = _container(lows)
+
+    def __len__(self) -> int:
+        return sum(_cardinality(container) for container in self.containers.values())
+
+    def __contains__(self, value: int) -> bool:
+        container = self.containers.get(value >> CHUNK_BITS)
+        if container is None:
+            return False
+        low = value & CHUNK_MASK
+        if container.dtype == np.uint16:
+            i = np.searchsorted(container, low)
+            return i < len(container) and container[i] == low
+        return bool((int(container[low >> 6]) >> (low & 63)) & 1)
+
+    def intersection_len(self, other: "RoaringBitmap") -> int:
+        if len(other.containers) < len(self.containers):
+            self, other = other, self
+        total = 0
+        for chunk, container in self.containers.items():
+            match = other.containers.get(chunk)
+            if match is not None:
+                total += _intersection_cardinality(container, match)
+        return total
+
+    @property
+    def nbytes(self) -> int:
+        return sum(container.nbytes for container in self.containers.values())
+
+
+class TagBitmapIndex:
+    """One RoaringBitmap of contact ordinals per tag, held in memory.
+
+    Tags are interned to dense integer ids in first-seen order. The index is
+    built from contact_tags and kept current by the upsert path (see
+    queue_additions); it only covers this process's own writes, and
+    /tags/rebuild rebuilds it along with contact_tags.
+    """
+
+    def __init__(self):
+        self.tag_ids: Dict[str, int] = {}
+        self.tag_names: List[str] = []
+        self.bitmaps: List[RoaringBitmap] = []
+        self.built = False
+        # Additions made while a build is reading, replayed onto the new index
+        self._replay: Optional[List[Tuple[Sequence[int], Sequence[Sequence[str]]]]] = None
+        self._lock = threading.RLock()
+
+    def _intern(self, name: str) -> int:
+        tag_id = self.tag_ids.get(name)
+        if tag_id is None:
+            tag_id = self.tag_ids[name] = len(self.tag_names)
+            self.tag_names.append(name)
+            self.bitmaps.append(RoaringBitmap())
+        return tag_id
+
+    def build(self, db: Session) -> Dict:
+        """Load every tag's contact ordinals from contact_tags, replacing the index."""
+        start = time.perf_counter()
+        with self._lock:
+            self._replay = []
+        try:
+            rows = db.execute(text(_LOAD_SQL)).all()
+            fresh = TagBitmapIndex()
+            for name, ordinals in rows:
+                fresh.bitmaps[fresh._intern(name)].update(np.asarray(ordinals, dtype=np.uint64))
+            with self._lock:
+                for ordinals, tag_lists in self._replay:
+                    fresh.add(ordinals, tag_lists)
+                self.tag_ids, self.tag_names, self.bitmaps = fresh.tag_ids, fresh.tag_names, fresh.bitmaps
+                self.built = True
+        finally:
+            with self._lock:
+                self._replay = None
+        stats = self.stats()
+        logger.info(
+            f"Built tag bitmap index: {stats['tags']} tags, {stats['entries']} entries, "
+            f"{stats['bytes']} bytes in {time.perf_counter() - start:.2f}s."
+        )
+        return stats
+
+    def add(self, ordinals: Sequence[int], tag_lists: Sequence[Sequence[str]]) -> None:
+        """Record that contact ordinals[i] carries tag_lists[i]."""
+        by_tag: Dict[str, List[int]] = {}
+        for ordinal, tags in zip(ordinals, tag_lists):
+            for tag in tags or ():
+                by_tag.setdefault(tag, []).append(ordinal)
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((ordinals, tag_lists))
+            for tag, tagged in by_tag.items():
+                self.bitmaps[self._intern(tag)].update(tagged)
+
+    def count(self, tag: str) -> int:
+        with self._lock:
+            tag_id = self.tag_ids.get(tag)
+            return len(self.bitmaps[tag_id]) if tag_id is not None else 0
+
+    def co_occurrence(self, tags: Sequence[str]) -> Tuple[List[Dict], List[Dict]]:
+        """Contacts per tag and per pair of tags, for the given tags."""
+        with self._lock:
+            bitmaps = [self.bitmaps[self.tag_ids[tag]] if tag in self.tag_ids else None for tag in tags]
+            counts = [{"tag": tag, "count": len(bitmap) if bitmap is not None else 0} for tag, bitmap in zip(tags, bitmaps)]
+            pairs = []
+            for i in range(len(tags)):
+                for j in range(i + 1, len(tags)):
+                    both = bitmaps[i] is not None and bitmaps[j] is not None
+                    overlap = bitmaps[i].intersection_len(bitmaps[j]) if both else 0
+                    pairs.append({"tags": [tags[i], tags[j]], "count": overlap})
+        return counts, pairs
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "tags": len(self.tag_names),
+                "entries": sum(len(bitmap) for bitmap in self.bitmaps),
+                "bytes": sum(bitmap.nbytes for bitmap in self.bitmaps),
+            }
+
+
+TAG_BITMAPS = TagBitmapIndex()
+
+
+def queue_additions(db: Session, ordinals: Sequence[int], tag_lists: Sequence[Sequence[str]]) -> None:
+    """Add contact tags to TAG_BITMAPS once db's transaction commits."""
+    db.info.setdefault(_PENDING_KEY, []).append((list(ordinals), list(tag_lists)))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session: Session) -> None:
+    for ordinals, tag_lists in session.info.pop(_PENDING_KEY, ()):
+        TAG_BITMAPS.add(ordinals, tag_lists)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+def ensure_built(db: Session) -> Optional[Dict]:
+    """Build TAG_BITMAPS if this process has not built it yet."""
+    if TAG_BITMAPS.built:
+        return None
+    return TAG_BITMAPS.build(db)
@@ -0,0 +1,94 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, text
+from typing import Dict, List
+import logging
+from ..models.contact_tag import ContactTag
+from ..models.tag import Tag
+from .tag_bitmap_index import TAG_BITMAPS
+
+logger = logging.getLogger(__name__)
+
+# contacts.tags as a jsonb array, treating anything else as no tags
+_TAG_ARRAY = "CASE WHEN jsonb_typeof(c.tags) = 'array' THEN c.tags ELSE '[]'::jsonb END"
+
+_INSERT_TAGS_SQL = f"""
+INSERT INTO tags (name)
+SELECT DISTINCT tag.name
+FROM contacts AS c
+CROSS JOIN LATERAL jsonb_array_elements_text({_TAG_ARRAY}) AS tag(name)
+WHERE {{condition}}
+ORDER BY tag.name
+ON CONFLICT (name) DO NOTHING
+"""
+
+_INSERT_CONTACT_TAGS_SQL = f"""
+INSERT INTO contact_tags (contact_id, tag_id)
+SELECT DISTINCT c.id, t.id
+FROM contacts AS c
+CROSS JOIN LATERAL jsonb_array_elements_text({_TAG_ARRAY}) AS tag(name)
+JOIN tags AS t ON t.name = tag.name
+WHERE {{condition}}
+ON CONFLICT DO NOTHING
+"""
+
+
+class TagIndexService:
+    """Maintains the tags dictionary and contact_tags association from contacts.tags."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def index_contacts(self, contact_ids: List[str]) -> None:
+        """Add dictionary entries and associations for the current tags of contact_ids.
+
+        Upserts only ever add tags to a contact, so existing associations are
+        left alone. The caller owns the transaction.
+        """
+        if not contact_ids:
+            return
+        condition = "c.id = ANY(CAST(:ids AS uuid[]))"
+        params = {"ids": contact_ids}
+        self.db.execute(text(_INSERT_TAGS_SQL.format(condition=condition)), params)
+        self.db.execute(text(_INSERT_CONTACT_TAGS_SQL.format(condition=condition)), params)
+
+    def rebuild(self) -> Dict[str, int]:
+        """Rebuild contact_tags (and prune unused tags) from every contact's tags, then the tag bitmaps."""
+        try:
+            self.db.execute(text("TRUNCATE contact_tags"))
+            self.db.execute(text(_INSERT_TAGS_SQL.format(condition="true")))
+            associations = self.db.execute(text(_INSERT_CONTACT_TAGS_SQL.format(condition="true"))).rowcount
+            self.db.execute(text(
+                "DELETE FROM tags WHERE NOT EXISTS (SELECT 1 FROM contact_tags ct WHERE ct.tag_id = tags.id)"
+            ))
+            tags = self.db.query(Tag).count()
+            self.db.commit()
+        except Exception as e:
+            self.db.rollback()
+            raise Exception(f"Tag index rebuild failed: {str(e)}")
+        logger.info(f"Rebuilt tag index: {tags} tags, {associations} contact tags.")
+        TAG_BITMAPS.build(self.db)
+        return {"tags": tags, "contact_tags": associations}
+
+    def needs_backfill(self) -> bool:
+        """True when contacts carry tags but the association table is still empty."""
+        if self.db.query(ContactTag).first() is not None:
+            return False
+        return self.db.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM contacts WHERE jsonb_typeof(tags) = 'array' AND tags <> '[]'::jsonb)"
+        )).scalar()
+
+    def tag_counts(self) -> List[Dict]:
+        """Number of contacts per tag, most used first."""
+        count = func.count(ContactTag.contact_id)
+        rows = self.db.execute(
+            select(Tag.name, count)
+            .join(ContactTag, ContactTag.tag_id == Tag.id)
+            .group_by(Tag.name)
+            .order_by(count.desc(), Tag.name.collate("C"))
+        ).all()
+        return [{"tag": name, "count": total} for name, total in rows]
+
+    def tag_names(self) -> List[str]:
+        """Every tag carried by at least one contact, in code point order."""
+        used = select(ContactTag.tag_id).where(ContactTag.tag_id == Tag.id).exists()
+        return list(self.db.execute(select(Tag.name).where(used).order_by(Tag.name.collate("C"))).scalars())
@@ -0,0 +1,91 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, Optional
+import logging
+from ..models.tag_mapping_version import TagMappingVersion
+from .categorization_engine import (
+    diff_tag_mappings,
+    get_tag_mapping_version,
+    install_tag_mapping,
+    read_tag_mapping_file,
+)
+from .job_service import JobService
+
+logger = logging.getLogger(__name__)
+
+# pg_advisory_xact_lock key serializing mapping reloads across workers
+MAPPING_LOCK_KEY = 3601
+
+
+def _as_mapping(stored: Dict) -> Dict:
+    return {tag: (bucket, weight) for tag, (bucket, weight) in stored.items()}
+
+
+class TagMappingService:
+    """Versions the Knowledgebase tag mapping and scopes recategorization to what changed."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def latest(self) -> Optional[TagMappingVersion]:
+        return self.db.query(TagMappingVersion).order_by(TagMappingVersion.id.desc()).first()
+
+    def ensure_installed(self) -> Optional[int]:
+        """Install the latest stored version if this process is running an older one."""
+        latest = self.latest()
+        if latest and latest.id != get_tag_mapping_version():
+            install_tag_mapping(_as_mapping(latest.mapping), latest.id)
+            logger.info(f"Installed tag mapping version {latest.id}")
+        return get_tag_mapping_version()
+
+    def reload(self, recategorize: bool = True) -> Dict:
+        """Re-read the mapping file, recording a new version if its content changed.
+
+        When a previous version exists, a recategorize_tags job is enqueued
+        for just the contacts carrying an added, removed or changed tag.
+        """
+        mapping, checksum = read_tag_mapping_file()
+        # Held until commit, so concurrent workers agree on a single new version.
+        self.db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MAPPING_LOCK_KEY})
+        latest = self.latest()
+        if latest and latest.checksum == checksum:
+            self.db.commit()
+            install_tag_mapping(_as_mapping(latest.mapping), latest.id)
+            return {"version": latest.id, "new_version": False, "task_id": None}
+
+        diff = diff_tag_mappings(_as_mapping(latest.mapping) if latest else {}, mapping)
+        version = TagMappingVersion(
+            checksum=checksum,
+            mapping={tag: [bucket, weight] for tag, (bucket, weight) in mapping.items()},
+            **diff,
+        )
+        self.db.add(version)
+        self.db.commit()
+        install_tag_mapping(mapping, version.id)
+        logger.info(
+            f"Tag mapping version {version.id}: {len(diff['added'])} added, "
+            f"{len(diff['removed'])} removed, {len(diff['changed'])} changed."
+        )
+
+        impacted = sorted(set(diff["added"]) | set(diff["removed"]) | set(diff["changed"]))
+        task_id = None
+        # The first version has nothing to diff against, so leave existing assignments alone.
+        if recategorize and latest and impacted:
+            job = JobService(self.db).enqueue("recategorize_tags", {"version": version.id, "tags": impacted})
+            task_id = str(job.id)
+        return {"version": version.id, "new_version": True, **diff, "task_id": task_id}
+
+    def describe(self) -> Dict:
+        latest = self.latest()
+        if not latest:
+            return {"version": None}
+        return {
+            "version": latest.id,
+            "installed_version": get_tag_mapping_version(),
+            "checksum": latest.checksum,
+            "tags": len(latest.mapping),
+            "added": latest.added,
+            "removed": latest.removed,
+            "changed": latest.changed,
+            "created_at": latest.created_at.isoformat() if latest.created_at else None,
+        }
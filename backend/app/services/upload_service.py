@@ -0,0 +1,379 @@
+from sqlalchemy.orm import Session
+from typing import BinaryIO, Dict, Iterator, List, Optional
+from datetime import datetime, timedelta, timezone
+import fcntl
+import io
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+import zipfile
+from .csv_ingest import (
+    HashingReader,
+    is_csv_member,
+    iter_contact_rows,
+    open_text_stream,
+    parse_engagement_and_history,
+    zip_member_main_bucket,
+)
+from .ingest_ledger import IngestLedger, ledger_outcome, ledger_settings
+from .ingest_service import IngestService
+from .job_service import JobProgress, JobService, define_job_pool, lease_expired
+from .tag_mapping_service import TagMappingService
+from .zip_stream import StreamingUnsupported, iter_zip_entries
+from ..core.metrics import INGEST_ROWS
+from ..models.upload import Upload
+
+logger = logging.getLogger(__name__)
+
+# Where chunks are appended, one directory per upload
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "contact-uploads"))
+UPLOAD_MAX_SIZE = int(os.getenv("UPLOAD_MAX_SIZE", str(20 * 1024 ** 3)))
+# Chunk size suggested to clients; PUT bodies of any size are accepted
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(8 * 1024 ** 2)))
+# An ingest waiting this long for the next chunk gives up; finalize or the next chunk restarts it.
+# A little over the frontend's retry budget (about a minute of backoff).
+UPLOAD_STALL_TIMEOUT = int(os.getenv("UPLOAD_STALL_TIMEOUT", "120"))
+# Ingests run while chunks arrive and mostly wait on them, so they have their
+# own job workers instead of holding the shared JOB_WORKERS
+UPLOAD_INGEST_WORKERS = int(os.getenv("UPLOAD_INGEST_WORKERS", "4"))
+define_job_pool("uploads", UPLOAD_INGEST_WORKERS)
+# Unfinished uploads untouched for this long are deleted
+UPLOAD_EXPIRE_AFTER = int(os.getenv("UPLOAD_EXPIRE_AFTER", str(24 * 3600)))
+# Seconds between checks of the data file while waiting for chunks (other
+# processes' chunks are only seen by polling)
+UPLOAD_POLL_INTERVAL = 1.0
+
+UPLOAD_KINDS = {".csv": "csv", ".zip": "zip"}
+
+# Signalled whenever a chunk lands, so waiting ingests in this process wake at once
+_chunk_arrived = threading.Condition()
+
+
+class UploadConflict(Exception):
+    """A chunk that does not start where the received data ends."""
+
+    def __init__(self, message: str, offset: int):
+        super().__init__(message)
+        self.offset = offset
+
+
+class UploadAborted(Exception):
+    pass
+
+
+def upload_path(upload_id) -> str:
+    return os.path.join(UPLOAD_DIR, str(upload_id), "data")
+
+
+def received_bytes(upload: Upload) -> int:
+    try:
+        return os.path.getsize(upload_path(upload.id))
+    except FileNotFoundError:
+        return upload.received
+
+
+class ChunkWriter:
+    """Appends one chunk to an upload's data file under an exclusive lock.
+
+    The lock is a flock on the data file, so concurrent PUTs for the same
+    upload conflict even across server processes.
+    """
+
+    def __init__(self, upload: Upload, offset: int):
+        self.size = upload.size
+        self.file = open(upload_path(upload.id), "ab")
+        try:
+            fcntl.flock(self.file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.file.close()
+            raise UploadConflict("Another chunk of this upload is being received", received_bytes(upload))
+        self.offset = os.fstat(self.file.fileno()).st_size
+        if offset != self.offset:
+            self.close()
+            raise UploadConflict(f"Chunk starts at {offset} but {self.offset} bytes have been received", self.offset)
+
+    def write(self, data: bytes) -> bool:
+        """Append data, dropping anything past the declared size; False if some was dropped."""
+        room = self.size - self.offset
+        self.file.write(data[:room])
+        self.offset += min(len(data), room)
+        return len(data) <= room
+
+    def close(self) -> None:
+        if self.file.closed:
+            return
+        try:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        finally:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+        with _chunk_arrived:
+            _chunk_arrived.notify_all()
+
+
+class UploadReader(io.RawIOBase):
+    """Reads an upload's data file up to its declared size, waiting for chunks still to come."""
+
+    def __init__(self, path: str, size: int):
+        self.path = path
+        self.size = size
+        self.position = 0
+        self.file = open(path, "rb", buffering=0)
+        self._received = 0
+        self._last_growth = time.monotonic()
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        want = min(len(b), self.size - self.position)
+        if want <= 0:
+            return 0
+        while True:
+            read = self.file.readinto(memoryview(b)[:want])
+            if read:
+                self.position += read
+                return read
+            self._wait(self.position + 1)
+
+    def wait_complete(self) -> None:
+        """Block until every byte of the upload has been received."""
+        self._wait(self.size)
+
+    def _wait(self, target: int) -> None:
+        """Wait until target bytes have been received."""
+        while True:
+            try:
+                received = os.path.getsize(self.path)
+            except FileNotFoundError:
+                raise UploadAborted("The upload was aborted")
+            if received >= target:
+                return
+            now = time.monotonic()
+            if received != self._received:
+                self._received, self._last_growth = received, now
+            elif now - self._last_growth > UPLOAD_STALL_TIMEOUT:
+                raise TimeoutError(f"No chunk received for {UPLOAD_STALL_TIMEOUT}s")
+            with _chunk_arrived:
+                _chunk_arrived.wait(UPLOAD_POLL_INTERVAL)
+
+    def close(self) -> None:
+        self.file.close()
+        super().close()
+
+
+def _member_rows(name: str, raw: BinaryIO, main_bucket: Optional[str], main_bucket_in_csv: bool, files: List[Dict]) -> Iterator[Dict]:
+    """Rows of one CSV with /upload-csv semantics, counted and fingerprinted into files."""
+    engagement_level_file, summit_history_val = parse_engagement_and_history(name)
+    counts = {"file": name, "main_bucket": main_bucket, "main_bucket_in_csv": main_bucket_in_csv, "total": 0, "skipped": 0}
+    files.append(counts)
+
+    def on_skip(row):
+        counts["skipped"] += 1
+
+    hashed = HashingReader(raw)
+    text_stream = open_text_stream(io.BufferedReader(hashed))
+    for row in iter_contact_rows(
+        text_stream,
+        main_bucket=main_bucket,
+        main_bucket_in_csv=main_bucket_in_csv,
+        engagement_level_file=engagement_level_file,
+        summit_history_val=summit_history_val,
+        on_skip=on_skip,
+    ):
+        counts["total"] += 1
+        yield row
+    text_stream.detach().detach()
+    counts["fingerprint"] = hashed.fingerprint()
+    INGEST_ROWS.inc(counts["total"] + counts["skipped"], stage="parsed")
+    INGEST_ROWS.inc(counts["skipped"], stage="skipped")
+
+
+def iter_upload_rows(upload: Upload, source: UploadReader, files: List[Dict]) -> Iterator[Dict]:
+    """Parse an upload as it arrives: a CSV row by row, a zip entry by entry.
+
+    Zip entries are read through their local headers; from an entry that
+    cannot be streamed on, the rest of the archive is read with zipfile
+    once the upload is complete.
+    """
+    options = upload.options or {}
+    if upload.kind == "csv":
+        yield from _member_rows(upload.filename, source, options.get("main_bucket"), options.get("main_bucket_in_csv", False), files)
+        return
+    use_folders = options.get("use_folders", True)
+    streamed = set()
+    try:
+        for name, entry in iter_zip_entries(source):
+            if is_csv_member(name):
+                bucket = zip_member_main_bucket(name, use_folders, options.get("main_bucket"))
+                yield from _member_rows(name, entry, bucket, False, files)
+            streamed.add(name)
+    except StreamingUnsupported as e:
+        logger.info(f"Reading the rest of {upload.filename} once it is complete: {e}")
+        source.wait_complete()
+        with zipfile.ZipFile(source.path) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or not is_csv_member(info.filename) or info.filename in streamed:
+                    continue
+                bucket = zip_member_main_bucket(info.filename, use_folders, options.get("main_bucket"))
+                with archive.open(info) as entry:
+                    yield from _member_rows(info.filename, entry, bucket, False, files)
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+class UploadService:
+    """Resumable uploads: chunks are appended to UPLOAD_DIR and ingested as they arrive.
+
+    The ingest job starts with the first chunk and reads the data file
+    behind the writer, so rows are upserted while later chunks are still
+    on their way; it holds a job worker until the last byte is in.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get(self, upload_id: str, for_update: bool = False) -> Optional[Upload]:
+        try:
+            upload_uuid = uuid.UUID(str(upload_id))
+        except ValueError:
+            return None
+        query = self.db.query(Upload).filter(Upload.id == upload_uuid)
+        return (query.with_for_update() if for_update else query).first()
+
+    def create(self, filename: str, size: int, options: Dict) -> Upload:
+        kind = UPLOAD_KINDS.get(os.path.splitext(filename or "")[1].lower())
+        if kind is None:
+            raise ValueError("Only CSV and ZIP files are supported")
+        if not isinstance(size, int) or size <= 0:
+            raise ValueError("size must be a positive number of bytes")
+        if size > UPLOAD_MAX_SIZE:
+            raise ValueError(f"Uploads are limited to {UPLOAD_MAX_SIZE} bytes")
+        self.expire_stale()
+        upload = Upload(kind=kind, filename=filename, size=size, options=options, status="receiving")
+        self.db.add(upload)
+        self.db.flush()
+        os.makedirs(os.path.dirname(upload_path(upload.id)), exist_ok=True)
+        open(upload_path(upload.id), "wb").close()
+        self.db.commit()
+        logger.info(f"Started {kind} upload {upload.id} of {filename} ({size} bytes)")
+        return upload
+
+    def chunk_received(self, upload_id, received: int) -> Upload:
+        """Record a written chunk and make sure an ingest job is reading the upload."""
+        upload = self.get(upload_id, for_update=True)
+        upload.received = received
+        upload.updated_at = _now()
+        self._ensure_ingesting(upload)
+        self.db.commit()
+        return upload
+
+    def finalize(self, upload_id) -> Upload:
+        upload = self.get(upload_id, for_update=True)
+        received = received_bytes(upload)
+        if upload.status == "aborted":
+            raise UploadConflict("The upload was aborted", received)
+        if received < upload.size:
+            raise UploadConflict(f"Only {received} of {upload.size} bytes have been received", received)
+        upload.status = "finalized"
+        upload.received = received
+        self._ensure_ingesting(upload)
+        self.db.commit()
+        logger.info(f"Finalized upload {upload.id} of {upload.filename}")
+        return upload
+
+    def abort(self, upload_id) -> Upload:
+        upload = self.get(upload_id, for_update=True)
+        upload.status = "aborted"
+        self.db.commit()
+        # A waiting ingest notices the missing file and stops
+        shutil.rmtree(os.path.dirname(upload_path(upload.id)), ignore_errors=True)
+        with _chunk_arrived:
+            _chunk_arrived.notify_all()
+        logger.info(f"Aborted upload {upload.id} of {upload.filename}")
+        return upload
+
+    def expire_stale(self) -> int:
+        """Abort unfinished uploads that saw no chunk for UPLOAD_EXPIRE_AFTER."""
+        cutoff = _now() - timedelta(seconds=UPLOAD_EXPIRE_AFTER)
+        stale = self.db.query(Upload.id).filter(Upload.status == "receiving", Upload.updated_at < cutoff).all()
+        for (upload_id,) in stale:
+            self.abort(upload_id)
+        return len(stale)
+
+    def _ensure_ingesting(self, upload: Upload) -> None:
+        jobs = JobService(self.db)
+        # Locked, so a sweep reclaiming the same job cannot start it twice
+        job = jobs.get(upload.job_id, for_update=True) if upload.job_id else None
+        if job is None:
+            upload.job_id = jobs.enqueue("ingest_upload", {"upload_id": str(upload.id)}).id
+        elif job.status == "error" or lease_expired(job):
+            # It gave up waiting for chunks, or the process running it stopped;
+            # carry on from its checkpoint
+            jobs.requeue(job)
+
+    def describe(self, upload: Upload) -> Dict:
+        return {
+            "upload_id": str(upload.id),
+            "filename": upload.filename,
+            "kind": upload.kind,
+            "size": upload.size,
+            "offset": received_bytes(upload),
+            "status": upload.status,
+            "chunk_size": UPLOAD_CHUNK_SIZE,
+            "task_id": str(upload.job_id) if upload.job_id else None,
+        }
+
+    def ingest(self, upload_id: str, progress: JobProgress) -> Dict:
+        """Upsert an upload's rows as its chunks arrive; the ingest_upload job.
+
+        The checkpoint is the number of rows committed, so a restarted job
+        skips them without upserting again.
+        """
+        upload = self.get(upload_id)
+        if upload is None or upload.status == "aborted":
+            raise UploadAborted("The upload was aborted")
+        options = upload.options or {}
+        if options.get("categorize"):
+            TagMappingService(self.db).ensure_installed()
+        done = int(progress.checkpoint or 0)
+        consumed = 0
+        files: List[Dict] = []
+
+        def counted(rows):
+            nonlocal consumed
+            for row in rows:
+                consumed += 1
+                yield row
+
+        def on_batch(batch):
+            # Whole batches are read before they are upserted, so consumed rows are committed
+            progress.advance(batch["total"], checkpoint=str(done + consumed))
+
+        with UploadReader(upload_path(upload.id), upload.size) as source:
+            rows = counted(itertools.islice(iter_upload_rows(upload, source, files), done, None))
+            result = IngestService(self.db).ingest_rows(rows, on_batch=on_batch, categorize=options.get("categorize", False))
+        shutil.rmtree(os.path.dirname(upload_path(upload.id)), ignore_errors=True)
+        # The rows were already upserted as they arrived, so the ledger can only
+        # record these files for later uploads to skip, not skip them here
+        ledger = IngestLedger(self.db)
+        for file in files:
+            settings = ledger_settings(file["file"], file["main_bucket"], file.pop("main_bucket_in_csv"), categorize=options.get("categorize", False))
+            ledger.record(file["file"], file.pop("fingerprint"), settings, file["total"], ledger_outcome(file, "new"))
+        logger.info(f"Ingested upload {upload.id} of {upload.filename}: {result['total']} contacts from {len(files)} files.")
+        return {
+            "total": result["total"],
+            "inserted": result["inserted"],
+            "updated": result["updated"],
+            "categorized": result["categorized"],
+            "skipped": sum(file["skipped"] for file in files),
+            "files": files,
+        }
@@ -0,0 +1,176 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import text
+from typing import Dict, Iterable, List
+import csv
+import json
+from io import StringIO
+from .categorization_engine import assign_buckets_batch, get_tag_mapping_version
+from .categorization_service import CategorizationService
+from .rollup_service import RollupService
+from .tag_bitmap_index import queue_additions
+from .tag_index_service import TagIndexService
+
+STAGING_COLUMNS = [
+    "id",
+    "email",
+    "full_name",
+    "tags",
+    "is_in_main_bucket_biz",
+    "is_in_main_bucket_health",
+    "is_in_main_bucket_survivalist",
+    "engagement_level",
+    "email_state",
+    "email_sub_state",
+    "summit_history",
+]
+
+CREATE_STAGING_SQL = """
+CREATE TEMP TABLE IF NOT EXISTS contacts_staging (
+    id uuid NOT NULL,
+    email text NOT NULL,
+    full_name text,
+    tags jsonb NOT NULL,
+    is_in_main_bucket_biz boolean NOT NULL,
+    is_in_main_bucket_health boolean NOT NULL,
+    is_in_main_bucket_survivalist boolean NOT NULL,
+    engagement_level text,
+    email_state text,
+    email_sub_state text,
+    summit_history jsonb NOT NULL
+) ON COMMIT DROP
+"""
+
+# summit_history used to be written as a bare string by older uploads, so
+# normalize it to an array before merging.
+_EXISTING_HISTORY = """
+CASE jsonb_typeof(c.summit_history)
+    WHEN 'array' THEN c.summit_history
+    WHEN 'string' THEN CASE WHEN c.summit_history = '""'::jsonb THEN '[]'::jsonb
+                            ELSE jsonb_build_array(c.summit_history) END
+    ELSE '[]'::jsonb
+END
+"""
+
+_MERGE_SQL = """
+INSERT INTO contacts AS c ({columns})
+SELECT {columns} FROM contacts_staging
+ON CONFLICT (email) DO UPDATE SET
+    full_name = COALESCE(EXCLUDED.full_name, c.full_name),
+    tags = COALESCE(c.tags, '[]'::jsonb) || COALESCE((
+        SELECT jsonb_agg(t)
+        FROM jsonb_array_elements(EXCLUDED.tags) AS t
+        WHERE NOT COALESCE(c.tags, '[]'::jsonb) @> jsonb_build_array(t)
+    ), '[]'::jsonb),
+    is_in_main_bucket_biz = {biz},
+    is_in_main_bucket_health = {health},
+    is_in_main_bucket_survivalist = {survivalist},
+    engagement_level = COALESCE(EXCLUDED.engagement_level, c.engagement_level),
+    email_state = COALESCE(EXCLUDED.email_state, c.email_state),
+    email_sub_state = COALESCE(EXCLUDED.email_sub_state, c.email_sub_state),
+    summit_history = CASE
+        WHEN ({history}) @> EXCLUDED.summit_history THEN ({history})
+        ELSE ({history}) || EXCLUDED.summit_history
+    END,
+    updated_at = now()
+RETURNING (xmax = 0) AS inserted, c.id, c.ordinal, c.email, {returning}
+"""
+
+
+def _merge_sql(merge_main_buckets: bool, return_tags: bool = False) -> str:
+    flags = {}
+    for key, column in (
+        ("biz", "is_in_main_bucket_biz"),
+        ("health", "is_in_main_bucket_health"),
+        ("survivalist", "is_in_main_bucket_survivalist"),
+    ):
+        if merge_main_buckets:
+            flags[key] = f"c.{column} OR EXCLUDED.{column}"
+        else:
+            flags[key] = f"EXCLUDED.{column}"
+    return _MERGE_SQL.format(
+        columns=", ".join(STAGING_COLUMNS),
+        history=_EXISTING_HISTORY,
+        # The merged tags are only shipped back when they are needed
+        returning="c.tags, c.main_bucket_assignment" if return_tags else "NULL::jsonb AS tags, NULL::text AS main_bucket_assignment",
+        **flags,
+    )
+
+
+class ContactUpsertService:
+    """Set-based contact upserts: COPY into a staging table, then merge."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def upsert(self, rows: Iterable[Dict], merge_main_buckets: bool = False, categorize: bool = False) -> Dict[str, int]:
+        """Upsert normalized contact rows (see csv_ingest.parse_contact_row).
+
+        Rows must already be unique by email. With merge_main_buckets the
+        main bucket flags of existing contacts are OR-ed with the new ones,
+        otherwise they are replaced. The tag index (tags / contact_tags) and
+        the dashboard rollup are updated for every merged contact, and the
+        in-memory tag bitmaps once the transaction commits. With categorize, personality
+        buckets are computed from the merged tags and written in the same
+        transaction. The caller owns the transaction.
+        """
+        buffer = StringIO()
+        writer = csv.writer(buffer)
+        count = 0
+        new_tags = {}
+        for row in rows:
+            writer.writerow(self._staging_values(row))
+            new_tags[row["email"]] = row.get("tags") or []
+            count += 1
+        if not count:
+            return {"total": 0, "inserted": 0, "updated": 0, "categorized": 0}
+        buffer.seek(0)
+
+        self.db.execute(text(CREATE_STAGING_SQL))
+        self.db.execute(text("TRUNCATE contacts_staging"))
+        cursor = self.db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY contacts_staging ({', '.join(STAGING_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+        finally:
+            cursor.close()
+        rollup = RollupService(self.db)
+        rollup.subtract("true", join="JOIN contacts_staging AS s ON s.email = c.email")
+        merged = self.db.execute(text(_merge_sql(merge_main_buckets, return_tags=categorize))).all()
+        inserted = sum(1 for row in merged if row.inserted)
+        self.db.execute(text("TRUNCATE contacts_staging"))
+        ids = [str(row.id) for row in merged]
+        rollup.add_ids(ids)
+        TagIndexService(self.db).index_contacts(ids)
+        queue_additions(self.db, [row.ordinal for row in merged], [new_tags[row.email] for row in merged])
+        categorized = self._categorize(merged) if categorize else 0
+        return {"total": count, "inserted": inserted, "updated": count - inserted, "categorized": categorized}
+
+    def _categorize(self, merged: List) -> int:
+        buckets = assign_buckets_batch(
+            [row.tags for row in merged],
+            [row.main_bucket_assignment for row in merged],
+        )
+        CategorizationService(self.db).write_buckets(
+            [str(row.id) for row in merged],
+            buckets,
+            get_tag_mapping_version(),
+        )
+        return len(buckets)
+
+    @staticmethod
+    def _staging_values(row: Dict) -> List:
+        return [
+            row["id"],
+            row["email"],
+            row.get("full_name"),
+            json.dumps(row.get("tags") or []),
+            row.get("is_in_main_bucket_biz", False),
+            row.get("is_in_main_bucket_health", False),
+            row.get("is_in_main_bucket_survivalist", False),
+            row.get("engagement_level"),
+            row.get("email_state"),
+            row.get("email_sub_state"),
+            json.dumps(row.get("summit_history") or []),
+        ]
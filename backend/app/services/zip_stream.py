@@ -0,0 +1,163 @@
+from typing import BinaryIO, Iterator, Optional, Tuple
+import io
+import struct
+import zipfile
+import zlib
+
+# Reading a zip front to back through its local file headers, so entries can
+# be parsed while the rest of the archive is still arriving. zipfile needs the
+# central directory at the very end of the file before it can open anything.
+
+_LOCAL_HEADER = b"PK\x03\x04"
+_END_OF_CENTRAL_DIRECTORY = b"PK\x05\x06"
+_DATA_DESCRIPTOR = b"PK\x07\x08"
+# version, flags, method, time, date, crc, compressed size, size, name length, extra length
+_LOCAL_HEADER_FORMAT = "<HHHHHIIIHH"
+_LOCAL_HEADER_SIZE = struct.calcsize(_LOCAL_HEADER_FORMAT)
+_ZIP64_EXTRA = 0x0001
+_ZIP64_LIMIT = 0xFFFFFFFF
+_READ_SIZE = 1 << 16
+
+_FLAG_ENCRYPTED = 0x1
+_FLAG_DATA_DESCRIPTOR = 0x8
+_FLAG_UTF8 = 0x800
+
+
+class StreamingUnsupported(Exception):
+    """An entry that can only be located through the central directory."""
+
+
+class _PushbackReader:
+    """Reads exact byte counts from a stream and takes back what was read too far."""
+
+    def __init__(self, raw: BinaryIO):
+        self.raw = raw
+        self.buffer = bytearray()
+
+    def read(self, size: int) -> bytes:
+        while len(self.buffer) < size:
+            data = self.raw.read(max(size - len(self.buffer), _READ_SIZE))
+            if not data:
+                break
+            self.buffer += data
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def read_exact(self, size: int) -> bytes:
+        data = self.read(size)
+        if len(data) < size:
+            raise zipfile.BadZipFile("Truncated zip archive")
+        return data
+
+    def unread(self, data: bytes) -> None:
+        self.buffer[:0] = data
+
+
+class _EntryReader(io.RawIOBase):
+    """The uncompressed bytes of one entry, read straight from the archive stream."""
+
+    def __init__(self, source: _PushbackReader, method: int, compressed_size: Optional[int]):
+        self.source = source
+        # None when the size is only given in the data descriptor after the data
+        self.remaining = compressed_size
+        self.inflater = zlib.decompressobj(-zlib.MAX_WBITS) if method == zipfile.ZIP_DEFLATED else None
+        self.pending = b""
+        self.done = False
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self.pending and not self.done:
+            self._fill()
+        size = min(len(b), len(self.pending))
+        b[:size] = self.pending[:size]
+        self.pending = self.pending[size:]
+        return size
+
+    def _fill(self) -> None:
+        want = _READ_SIZE if self.remaining is None else min(_READ_SIZE, self.remaining)
+        data = self.source.read(want) if want else b""
+        if self.remaining is not None:
+            self.remaining -= len(data)
+        if self.inflater is None:
+            self.pending = data
+            self.done = self.remaining == 0
+            if not data and not self.done:
+                raise zipfile.BadZipFile("Truncated zip entry")
+            return
+        if not data and not self.inflater.eof:
+            raise zipfile.BadZipFile("Truncated or corrupt deflate stream")
+        self.pending = self.inflater.decompress(data)
+        if self.inflater.eof:
+            # A deflate stream knows where it ends, so a data descriptor entry
+            # stops here and the bytes after it go back to the archive stream
+            self.source.unread(self.inflater.unused_data)
+            self.done = True
+            if self.remaining:
+                self.source.read_exact(self.remaining)
+
+    def skip_rest(self) -> None:
+        while not self.done:
+            self._fill()
+        self.pending = b""
+
+
+def _zip64_sizes(extra: bytes) -> Optional[Tuple[int, int]]:
+    """(size, compressed size) from a local header's zip64 extra field, if it has one."""
+    position = 0
+    while position + 4 <= len(extra):
+        header_id, length = struct.unpack_from("<HH", extra, position)
+        if header_id == _ZIP64_EXTRA and length >= 16:
+            return struct.unpack_from("<QQ", extra, position + 4)
+        position += 4 + length
+    return None
+
+
+def iter_zip_entries(raw: BinaryIO) -> Iterator[Tuple[str, io.RawIOBase]]:
+    """Yield (name, uncompressed stream) for each entry, in archive order.
+
+    raw is only read forwards, so it can be a file that is still being
+    written. Each stream is valid until the next entry is requested, and
+    whatever was not read of it is skipped. Raises StreamingUnsupported for
+    an entry whose end cannot be found without the central directory
+    (encrypted, an unknown method, or stored with a data descriptor).
+    """
+    source = _PushbackReader(raw)
+    first = True
+    while True:
+        signature = source.read(4)
+        if signature != _LOCAL_HEADER:
+            if first and signature != _END_OF_CENTRAL_DIRECTORY:
+                raise zipfile.BadZipFile("File is not a zip file")
+            # The central directory follows the last entry
+            return
+        first = False
+        _, flags, method, _, _, _, compressed_size, _, name_length, extra_length = struct.unpack(
+            _LOCAL_HEADER_FORMAT, source.read_exact(_LOCAL_HEADER_SIZE)
+        )
+        name = source.read_exact(name_length).decode("utf-8" if flags & _FLAG_UTF8 else "cp437")
+        zip64 = _zip64_sizes(source.read_exact(extra_length))
+        if zip64 and compressed_size == _ZIP64_LIMIT:
+            compressed_size = zip64[1]
+        has_descriptor = bool(flags & _FLAG_DATA_DESCRIPTOR)
+        if flags & _FLAG_ENCRYPTED:
+            raise StreamingUnsupported(f"{name} is encrypted")
+        if method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise StreamingUnsupported(f"{name} uses compression method {method}")
+        if has_descriptor and method == zipfile.ZIP_STORED:
+            if not name.endswith("/"):
+                raise StreamingUnsupported(f"{name} is stored with its size after the data")
+            # A directory has no data, so its end is known anyway
+            entry = _EntryReader(source, method, 0)
+        else:
+            entry = _EntryReader(source, method, None if has_descriptor else compressed_size)
+        yield name, entry
+        entry.skip_rest()
+        if has_descriptor:
+            # Optional signature, then crc and both sizes (8 bytes each for zip64)
+            descriptor = source.read_exact(4)
+            if descriptor != _DATA_DESCRIPTOR:
+                source.unread(descriptor)
+            source.read_exact(4 + (16 if zip64 else 8))
@@ -0,0 +1,166 @@
+"""Synthetic contact exports for benchmarking.
+
+Tags are drawn with the frequencies in Knowledgebase/All Tags.csv (mixed
+with the tags of the categorization mapping, so categorization has work to
+do) and files are named like "H-Summit Name.csv", as exported per summit and
+engagement level and parsed by csv_ingest.parse_engagement_and_history.
+
+    python -m benchmarks.generate --rows 100000 --out /tmp/contacts.csv
+    python -m benchmarks.generate --rows 100000 --zip --out /tmp/contacts.zip
+"""
+import argparse
+import csv
+import io
+import math
+import os
+import random
+import zipfile
+from typing import Dict, List, Optional, Sequence, Tuple
+
+KNOWLEDGEBASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "app", "Knowledgebase"))
+ALL_TAGS_PATH = os.path.join(KNOWLEDGEBASE_DIR, "All Tags.csv")
+MAPPING_PATH = os.path.join(KNOWLEDGEBASE_DIR, "tagsandsummitsandbuckets.csv")
+
+ENGAGEMENT_LEVELS = ("H", "M", "L", "U")
+MAIN_BUCKET_FOLDERS = ("Business", "Health", "Survivalist")
+CSV_COLUMNS = ["Email", "First Name", "Contact Tags"]
+# Share of mapping tags among all tags drawn; the rest follow All Tags.csv
+MAPPED_TAG_SHARE = 0.5
+
+
+class TagSampler:
+    """Draws tag lists with All Tags.csv frequencies and its tags-per-contact rate."""
+
+    def __init__(self, rng: random.Random, all_tags_path: str = ALL_TAGS_PATH, mapping_path: str = MAPPING_PATH):
+        self.rng = rng
+        self.tags: List[str] = []
+        weights: List[float] = []
+        occurrences = 0
+        with open(all_tags_path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                if row.get("Type") == "Summary" or not row.get("Usage Count"):
+                    continue
+                count = int(row["Usage Count"])
+                self.tags.append(row["Tag"])
+                weights.append(count)
+                occurrences += count
+        self.cumulative = _cumulative(weights)
+        # From the All Tags.csv summary: 261574 occurrences over 490546 contacts
+        self.tags_per_contact = occurrences / 490546 if occurrences else 0.5
+        self.mapped_tags, self.summits = _read_mapping(mapping_path)
+
+    def sample(self) -> List[str]:
+        count = _poisson(self.rng, self.tags_per_contact * 2)
+        tags = []
+        for _ in range(count):
+            if self.mapped_tags and self.rng.random() < MAPPED_TAG_SHARE:
+                tags.append(self.rng.choice(self.mapped_tags))
+            else:
+                tags.append(self.rng.choices(self.tags, cum_weights=self.cumulative)[0])
+        # Contacts carry each tag once
+        return list(dict.fromkeys(tags))
+
+    def filename(self) -> str:
+        summit = self.rng.choice(self.summits) if self.summits else "Summit"
+        return f"{self.rng.choice(ENGAGEMENT_LEVELS)}-{summit}.csv"
+
+
+def _cumulative(weights: Sequence[float]) -> List[float]:
+    total = 0.0
+    cumulative = []
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return cumulative
+
+
+def _poisson(rng: random.Random, lam: float) -> int:
+    threshold = math.exp(-lam)
+    k, p = 0, rng.random()
+    while p > threshold:
+        k += 1
+        p *= rng.random()
+    return k
+
+
+def _read_mapping(path: str) -> Tuple[List[str], List[str]]:
+    tags, summits = [], set()
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get("Tag"):
+                tags.append(row["Tag"].strip())
+            if row.get("Summit"):
+                summits.add(row["Summit"].strip())
+    return tags, sorted(summits)
+
+
+def contact_rows(rows: int, sampler: TagSampler, start: int = 0, duplicate_rate: float = 0.01):
+    """Yield CSV rows; duplicate_rate of them repeat an earlier email, as real exports do."""
+    rng = sampler.rng
+    for i in range(start, start + rows):
+        n = rng.randrange(start, i) if i > start and rng.random() < duplicate_rate else i
+        yield {
+            "Email": f"contact{n}@example.com",
+            "First Name": f"Contact {n}",
+            "Contact Tags": ", ".join(sampler.sample()),
+        }
+
+
+def write_csv(out, rows: int, sampler: TagSampler, start: int = 0) -> None:
+    writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    writer.writerows(contact_rows(rows, sampler, start))
+
+
+def generate_csv(path: str, rows: int, seed: int = 0) -> str:
+    """Write a CSV of rows contacts to path."""
+    sampler = TagSampler(random.Random(seed))
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        write_csv(f, rows, sampler)
+    return path
+
+
+def generate_zip(path: str, rows: int, seed: int = 0, files: Optional[int] = None, start: int = 0) -> Dict[str, int]:
+    """Write a zip of per-summit CSVs in main bucket folders, rows contacts in total.
+
+    Contacts are numbered from start, so a zip can add new contacts next to a CSV.
+    """
+    sampler = TagSampler(random.Random(seed))
+    files = files or max(1, min(60, rows // 5000))
+    per_file = math.ceil(rows / files)
+    members = {}
+    end = start + rows
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for i in range(files):
+            count = min(per_file, end - start)
+            if count <= 0:
+                break
+            name = f"{MAIN_BUCKET_FOLDERS[i % len(MAIN_BUCKET_FOLDERS)]}/{sampler.filename()}"
+            # Summit names repeat, so keep member names unique
+            if name in members:
+                name = name.replace(".csv", f" {i}.csv")
+            buffer = io.StringIO()
+            write_csv(buffer, count, sampler, start)
+            archive.writestr(name, buffer.getvalue())
+            members[name] = count
+            start += count
+    return members
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--zip", action="store_true", help="write a zip of per-summit CSVs")
+    parser.add_argument("--out", required=True)
+    args = parser.parse_args()
+    if args.zip:
+        members = generate_zip(args.out, args.rows, args.seed)
+        print(f"Wrote {args.rows} contacts in {len(members)} files to {args.out}")
+    else:
+        generate_csv(args.out, args.rows, args.seed)
+        print(f"Wrote {args.rows} contacts to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
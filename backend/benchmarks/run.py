@@ -0,0 +1,339 @@
+"""Benchmark the contact pipeline against a local Postgres.
+
+For each size, synthetic exports (see benchmarks.generate) are uploaded and
+the main endpoints are timed in-process through the FastAPI test client, on
+the database in DATABASE_URL. Results are written as JSON so runs can be
+compared:
+
+    cd backend
+    DATABASE_URL=postgresql://localhost/cleaner_bench python -m benchmarks.run --sizes 10k,100k --reset
+    python -m benchmarks.run --compare benchmarks/results/before.json benchmarks/results/after.json
+
+--reset empties the contact tables before every size; without it the run
+refuses to start on a database that already holds contacts. Set
+LOG_LEVEL=WARNING to keep the app's request logging out of the output.
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+from .generate import generate_csv, generate_zip
+
+DEFAULT_SIZES = "10k,100k,1m"
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+API = "/api/contacts"
+# Tables emptied by --reset; tags and the rollup are derived from contacts
+RESET_TABLES = ("contact_tags", "tags", "contact_rollup", "contacts", "jobs", "ingest_ledger")
+JOB_TIMEOUT = 3600
+# Requests repeated for the quick read endpoints; the median is reported
+READ_REPEATS = 5
+CURSOR_PAGES = 20
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    for suffix, factor in (("k", 1_000), ("m", 1_000_000)):
+        if value.endswith(suffix):
+            return int(float(value[:-1]) * factor)
+    return int(value)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=os.path.dirname(__file__), text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _result(seconds: float, rows: Optional[int] = None, **extra) -> Dict:
+    result = {"seconds": round(seconds, 4)}
+    if rows is not None:
+        result["rows"] = rows
+        result["rows_per_sec"] = round(rows / seconds, 1) if seconds else None
+    result.update(extra)
+    return result
+
+
+@contextmanager
+def _timer():
+    timing = {}
+    start = time.perf_counter()
+    yield timing
+    timing["seconds"] = time.perf_counter() - start
+
+
+def _median(fn: Callable[[], None], repeats: int = READ_REPEATS) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+class Benchmark:
+    """Times one dataset size against the app; every step returns a result dict."""
+
+    def __init__(self, client, size: int, data_dir: str, seed: int):
+        self.client = client
+        self.size = size
+        self.data_dir = data_dir
+        self.seed = seed
+
+    def run(self) -> Dict:
+        results = {}
+        steps = [
+            ("upload_csv", self.upload_csv),
+            ("upload_zip", self.upload_zip),
+            ("auto_categorize_python", lambda: self.auto_categorize("python")),
+            ("auto_categorize_sql", lambda: self.auto_categorize("sql")),
+            ("assign_buckets", self.assign_buckets),
+            ("search", self.search),
+            ("paging", self.paging),
+            ("tags_with_counts", self.tags_with_counts),
+            ("export", self.export),
+        ]
+        for name, step in steps:
+            print(f"  {name}...", flush=True)
+            results[name] = step()
+            print(f"  {name}: {json.dumps(results[name])}", flush=True)
+        return results
+
+    def _check(self, response):
+        if response.status_code >= 400:
+            raise RuntimeError(f"{response.request.method} {response.request.url} -> {response.status_code}: {response.text[:500]}")
+        return response
+
+    def upload_csv(self) -> Dict:
+        path = os.path.join(self.data_dir, f"H-Benchmark Summit {self.size}.csv")
+        generate_csv(path, self.size, self.seed)
+        with open(path, "rb") as f, _timer() as timing:
+            summary = self._check(self.client.post(
+                f"{API}/upload-csv",
+                files={"file": (os.path.basename(path), f, "text/csv")},
+                data={"main_bucket": "Health"},
+            )).json()
+        return _result(timing["seconds"], self.size, bytes=os.path.getsize(path),
+                       upserted=summary.get("total"), skipped=summary.get("skipped"))
+
+    def upload_zip(self) -> Dict:
+        # Numbered after the CSV contacts, so the zip inserts rather than merges
+        path = os.path.join(self.data_dir, f"benchmark-{self.size}.zip")
+        members = generate_zip(path, self.size, self.seed + 1, start=self.size)
+        with open(path, "rb") as f, _timer() as timing:
+            summary = self._check(self.client.post(
+                f"{API}/upload-zip",
+                files={"file": (os.path.basename(path), f, "application/zip")},
+            )).json()
+        return _result(timing["seconds"], self.size, bytes=os.path.getsize(path), files=len(members),
+                       upserted=summary.get("total"), skipped=summary.get("skipped"))
+
+    def auto_categorize(self, engine: str) -> Dict:
+        self._check(self.client.post(f"{API}/clear-personality-buckets"))
+        with _timer() as timing:
+            job = self._check(self.client.post(f"{API}/auto-categorize", params={"engine": engine})).json()
+            status = self._wait(job["task_id"])
+        if status["status"] != "completed":
+            raise RuntimeError(f"auto-categorize ({engine}) ended with {status}")
+        updated = (status.get("result") or {}).get("updated")
+        return _result(timing["seconds"], updated)
+
+    def _wait(self, task_id: str) -> Dict:
+        deadline = time.monotonic() + JOB_TIMEOUT
+        while time.monotonic() < deadline:
+            status = self._check(self.client.get(f"{API}/categorize/status/{task_id}")).json()
+            if status["status"] in ("completed", "error"):
+                return status
+            time.sleep(0.2)
+        raise RuntimeError(f"Job {task_id} did not finish within {JOB_TIMEOUT}s")
+
+    def assign_buckets(self) -> Dict:
+        """Score every contact with assign_buckets and with assign_buckets_batch."""
+        from app.core.database import SessionLocal
+        from app.models.contact import Contact
+        from app.services.categorization_engine import assign_buckets, assign_buckets_batch
+
+        with SessionLocal() as db:
+            rows = db.query(Contact.tags, Contact.main_bucket_assignment).all()
+        tag_lists = [row.tags or [] for row in rows]
+        main_buckets = [row.main_bucket_assignment for row in rows]
+        with _timer() as reference:
+            expected = [assign_buckets(tags, main)[1] for tags, main in zip(tag_lists, main_buckets)]
+        with _timer() as batch:
+            actual = assign_buckets_batch(tag_lists, main_buckets)
+        return {
+            "reference": _result(reference["seconds"], len(rows)),
+            "batch": _result(batch["seconds"], len(rows)),
+            "speedup": round(reference["seconds"] / batch["seconds"], 2) if batch["seconds"] else None,
+            "matches": expected == actual,
+        }
+
+    def search(self) -> Dict:
+        # A needle that matches a handful of contacts wherever it sits in the table
+        needle = f"contact{self.size // 2}"
+        results = {}
+        for mode in ("contains", "prefix"):
+            params = {"search": needle, "search_mode": mode, "limit": 50}
+            results[mode] = _result(_median(lambda: self._check(self.client.get(f"{API}/", params=params))))
+        tag = self._top_tag()
+        if tag:
+            params = {"tag": tag, "limit": 50}
+            results["tag"] = _result(_median(lambda: self._check(self.client.get(f"{API}/", params=params))), tag=tag)
+        return results
+
+    def _top_tag(self) -> Optional[str]:
+        tags = self._check(self.client.get(f"{API}/tags-with-counts")).json()["tags"]
+        return max(tags, key=lambda t: t["count"])["tag"] if tags else None
+
+    def paging(self) -> Dict:
+        """A deep offset page against walking cursor pages, 50 contacts a page."""
+        limit = 50
+        deep = {"skip": max(0, int(self.size * 1.8)), "limit": limit, "sort_field": "email"}
+        results = {"offset_deep": _result(_median(lambda: self._check(self.client.get(f"{API}/", params=deep))), skip=deep["skip"])}
+        for total_mode in ("exact", "cached"):
+            params = {"paging": "cursor", "limit": limit, "sort_field": "email", "total_mode": total_mode}
+            start = time.perf_counter()
+            for _ in range(CURSOR_PAGES):
+                page = self._check(self.client.get(f"{API}/", params=params)).json()
+                if not page.get("next_cursor"):
+                    break
+                params["cursor"] = page["next_cursor"]
+            seconds = time.perf_counter() - start
+            results[f"cursor_{total_mode}"] = _result(seconds, pages=CURSOR_PAGES, seconds_per_page=round(seconds / CURSOR_PAGES, 4))
+        return results
+
+    def tags_with_counts(self) -> Dict:
+        response = self._check(self.client.get(f"{API}/tags-with-counts"))
+        seconds = _median(lambda: self._check(self.client.get(f"{API}/tags-with-counts")))
+        return _result(seconds, tags=len(response.json()["tags"]))
+
+    def export(self) -> Dict:
+        # Every contact has a personality bucket by now, so this exports them all
+        buckets = [row["bucket"] for row in self._check(self.client.get(f"{API}/personality-buckets")).json()]
+        rows = contact_count()
+        results = {}
+        for name, body, headers in (
+            ("csv", {"format": "csv"}, {"Accept-Encoding": "identity"}),
+            ("csv_gzip", {"format": "csv", "gzip": True}, {}),
+            ("parquet", {"format": "parquet"}, {}),
+        ):
+            body["buckets"] = buckets
+            size = 0
+            with _timer() as timing:
+                with self.client.stream("POST", f"{API}/export", json=body, headers=headers) as response:
+                    self._check(response)
+                    for chunk in response.iter_raw():
+                        size += len(chunk)
+            results[name] = _result(timing["seconds"], rows, bytes=size)
+        return results
+
+
+def reset_database() -> None:
+    from sqlalchemy import text
+    from app.core.database import engine
+
+    with engine.begin() as conn:
+        conn.execute(text(f"TRUNCATE {', '.join(RESET_TABLES)}"))
+
+
+def contact_count() -> int:
+    from sqlalchemy import text
+    from app.core.database import engine
+
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT count(*) FROM contacts")).scalar()
+
+
+def run(sizes: List[str], seed: int, reset: bool, data_dir: Optional[str]) -> Dict:
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    report = {
+        "meta": {
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "seed": seed,
+            "sizes": sizes,
+        },
+        "results": {},
+    }
+    owns_data_dir = data_dir is None
+    data_dir = data_dir or tempfile.mkdtemp(prefix="contact-bench-")
+    try:
+        with TestClient(app) as client:
+            for label in sizes:
+                if reset:
+                    reset_database()
+                elif contact_count():
+                    raise SystemExit("The database already holds contacts; pass --reset to empty it first.")
+                print(f"Size {label}:", flush=True)
+                report["results"][label] = Benchmark(client, parse_size(label), data_dir, seed).run()
+    finally:
+        if owns_data_dir:
+            shutil.rmtree(data_dir, ignore_errors=True)
+    report["meta"]["finished_at"] = datetime.now(timezone.utc).isoformat()
+    return report
+
+
+def _seconds(tree, prefix=""):
+    """Flatten a result tree to {"size.step.sub": seconds}."""
+    if isinstance(tree, dict):
+        if "seconds" in tree:
+            yield prefix, tree["seconds"]
+        for key, value in tree.items():
+            yield from _seconds(value, f"{prefix}.{key}" if prefix else key)
+
+
+def compare(before_path: str, after_path: str) -> None:
+    with open(before_path) as f:
+        before = dict(_seconds(json.load(f)["results"]))
+    with open(after_path) as f:
+        after = dict(_seconds(json.load(f)["results"]))
+    width = max((len(key) for key in after), default=10)
+    print(f"{'step':<{width}}  {'before':>10}  {'after':>10}  {'change':>8}")
+    for key, seconds in after.items():
+        if key not in before:
+            continue
+        change = f"{(seconds - before[key]) / before[key] * 100:+.1f}%" if before[key] else "n/a"
+        print(f"{key:<{width}}  {before[key]:>10.4f}  {seconds:>10.4f}  {change:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"comma-separated contact counts (default {DEFAULT_SIZES})")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reset", action="store_true", help="empty the contact tables before each size")
+    parser.add_argument("--data-dir", help="keep the generated files here instead of a temporary directory")
+    parser.add_argument("--output", help="results file (default benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="compare two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    sizes = [size.strip() for size in args.sizes.split(",") if size.strip()]
+    report = run(sizes, args.seed, args.reset, args.data_dir)
+    output = args.output or os.path.join(RESULTS_DIR, datetime.now().strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
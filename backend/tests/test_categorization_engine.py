@@ -0,0 +1,90 @@
+import random
+import pytest
+from app.services import categorization_engine as engine
+from app.services.categorization_engine import (
+    CANNOT_PLACE,
+    NED_BUCKETS,
+    assign_buckets,
+    assign_buckets_batch,
+    install_tag_mapping,
+)
+
+MAPPING = {
+    "keto": ("Wellness", 3),
+    "yoga": ("Wellness", 1),
+    "fasting": ("Biohacker", 2),
+    "cold plunge": ("Biohacker", 2),
+    "sales": ("Closer", 2),
+    "marketing": ("Amplifier", 2),
+    "ads": ("Amplifier", 1),
+    "bunker": ("Prepper", 0),
+    "ammo": ("Prepper", -1),
+    "garden": ("Homesteader", -2),
+    "seeds": ("Homesteader", 1),
+}
+UNMAPPED = ["crypto", "golf", "", "keto diet"]
+MAIN_BUCKETS = list(NED_BUCKETS) + [None, "", "Other"]
+
+
+@pytest.fixture(autouse=True)
+def tag_mapping(monkeypatch):
+    # Restore the real mapping after each test
+    for name in ("_tag_to_personality_bucket", "_tag_weight", "_compiled_mapping", "_mapping_version"):
+        monkeypatch.setattr(engine, name, getattr(engine, name))
+    install_tag_mapping(MAPPING)
+
+
+def _spell(tag, rng):
+    tag = "".join(c.upper() if rng.random() < 0.3 else c for c in tag)
+    return rng.choice(["", " ", "\t"]) + tag + rng.choice(["", " ", "\n"])
+
+
+def _expected(tag_lists, main_buckets):
+    return [assign_buckets(tags, main_bucket)[1] for tags, main_bucket in zip(tag_lists, main_buckets)]
+
+
+def test_batch_matches_assign_buckets_on_random_contacts():
+    rng = random.Random(1234)
+    vocabulary = list(MAPPING) + UNMAPPED
+    tag_lists = [
+        [_spell(rng.choice(vocabulary), rng) for _ in range(rng.randint(0, 6))]
+        for _ in range(5000)
+    ]
+    main_buckets = [rng.choice(MAIN_BUCKETS) for _ in tag_lists]
+    assert assign_buckets_batch(tag_lists, main_buckets) == _expected(tag_lists, main_buckets)
+
+
+@pytest.mark.parametrize("tags, expected", [
+    # Amplifier and Wellness both score 3; the alphabetically first wins
+    (["marketing", "ads", "keto"], "Amplifier"),
+    (["fasting", "sales"], "Biohacker"),
+    (["Keto", " YOGA "], "Wellness"),
+    # Zero and negative totals still place the contact in a matched bucket
+    (["bunker"], "Prepper"),
+    (["ammo"], "Prepper"),
+    (["garden", "ammo"], "Prepper"),
+    (["garden", "seeds", "bunker"], "Prepper"),
+    (["garden", "seeds", "ammo"], "Homesteader"),
+    (["bunker", "crypto"], "Prepper"),
+])
+def test_ties_and_weights(tags, expected):
+    assert assign_buckets(tags, "Health")[1] == expected
+    assert assign_buckets_batch([tags], ["Health"]) == [expected]
+
+
+@pytest.mark.parametrize("tags", [[], ["crypto", " golf "], ["keto diet"]])
+@pytest.mark.parametrize("main_bucket", MAIN_BUCKETS)
+def test_fallback_without_matching_tags(tags, main_bucket):
+    expected = NED_BUCKETS.get(main_bucket, CANNOT_PLACE)
+    assert assign_buckets(tags, main_bucket)[1] == expected
+    assert assign_buckets_batch([tags], [main_bucket]) == [expected]
+
+
+def test_empty_batch():
+    assert assign_buckets_batch([], []) == []
+
+
+def test_reinstalled_mapping_is_recompiled():
+    assert assign_buckets_batch([["keto"]], [None]) == ["Wellness"]
+    install_tag_mapping({"keto": ("Biohacker", 1)})
+    assert assign_buckets_batch([["keto"], ["yoga"]], [None, "Survivalist"]) == ["Biohacker", "NED Survivalist"]
@@ -0,0 +1,77 @@
+import os
+import time
+from datetime import timedelta
+import pytest
+
+if not os.getenv("DATABASE_URL"):
+    pytest.skip("needs DATABASE_URL pointing at a Postgres database", allow_module_level=True)
+
+import app.main  # noqa: F401  (creates and migrates the schema)
+from app.core.database import SessionLocal
+from app.models.job import Job
+from app.services import job_service
+from app.services.job_service import job_handler, resume_interrupted_jobs, start_job_sweeper
+
+
+@job_handler("test_resume")
+def _resume(db, params, progress):
+    return {"resumed_from": progress.checkpoint, "processed": progress.processed}
+
+
+@pytest.fixture
+def db():
+    session = SessionLocal()
+    yield session
+    session.query(Job).filter(Job.kind == "test_resume").delete()
+    session.commit()
+    session.close()
+
+
+def _wait_for(db, job_id, status, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        db.expire_all()
+        job = db.get(Job, job_id)
+        if job.status == status:
+            return job
+        time.sleep(0.1)
+    raise AssertionError(f"job is {job.status}, not {status}")
+
+
+def test_expired_lease_is_resumed_after_startup(db, monkeypatch):
+    monkeypatch.setattr(job_service, "JOB_SWEEP_INTERVAL", 0.2)
+    # Left running by a process that stopped a moment before this one started
+    job = Job(
+        kind="test_resume",
+        status="running",
+        processed=42,
+        checkpoint="42",
+        worker_id="stopped-worker",
+        lease_expires_at=job_service._now() + timedelta(seconds=1),
+    )
+    db.add(job)
+    db.commit()
+
+    resume_interrupted_jobs()
+    start_job_sweeper()
+    db.expire_all()
+    assert db.get(Job, job.id).status == "running"
+
+    job = _wait_for(db, job.id, "completed")
+    assert job.result == {"resumed_from": "42", "processed": 42}
+    assert job.worker_id == job_service.WORKER_ID
+    assert job.lease_expires_at is None
+
+
+def test_live_lease_is_left_alone(db):
+    job = Job(
+        kind="test_resume",
+        status="running",
+        worker_id="live-worker",
+        lease_expires_at=job_service._now() + timedelta(seconds=60),
+    )
+    db.add(job)
+    db.commit()
+    resume_interrupted_jobs()
+    db.expire_all()
+    assert db.get(Job, job.id).status == "running"
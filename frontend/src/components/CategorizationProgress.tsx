@@ -1,9 +1,13 @@
 import { useEffect, useState } from 'react'
 import { toast } from 'sonner'
 
+// Interval for polling the task status once the event stream is lost
+const STATUS_POLL_MS = 2000
+
 interface CategorizationProgressProps {
   taskId: string
   onComplete: () => void
+  onError?: (message: string) => void
 }
 
 interface ProgressData {
@@ -12,41 +16,73 @@ interface ProgressData {
   message?: string
 }
 
-function CategorizationProgress({ taskId, onComplete }: CategorizationProgressProps) {
+function CategorizationProgress({ taskId, onComplete, onError }: CategorizationProgressProps) {
   const [progress, setProgress] = useState<ProgressData>({
     status: 'running',
     progress: 0,
   })
 
   useEffect(() => {
-    const checkProgress = async () => {
-      try {
-        const response = await fetch(`/api/contacts/categorize/status/${taskId}`)
-        const data = await response.json()
+    // Set once the task finished or the component unmounted
+    let stopped = false
+    let pollTimer: ReturnType<typeof setTimeout> | undefined
 
-        if (response.ok) {
-          setProgress({
-            status: data.status,
-            progress: data.progress,
-            message: data.message,
-          })
+    const fail = (message: string) => {
+      stopped = true
+      toast.error(message)
+      onError?.(message)
+    }
 
-          if (data.status === 'completed') {
-            onComplete()
-          } else if (data.status === 'error') {
-            toast.error(data.message || 'Categorization failed')
-            onComplete()
-          }
-        }
-      } catch (error) {
-        toast.error('Failed to check progress')
+    // Show a status payload; returns true once the task is finished
+    const update = (data: { status: string; progress: number; message?: string }) => {
+      setProgress({
+        status: data.status === 'queued' ? 'running' : (data.status as ProgressData['status']),
+        progress: data.progress,
+        message: data.message,
+      })
+      if (data.status === 'completed') {
+        stopped = true
         onComplete()
+      } else if (data.status === 'error') {
+        fail(data.message || 'Categorization failed')
       }
+      return stopped
     }
 
-    const interval = setInterval(checkProgress, 1000)
-    return () => clearInterval(interval)
-  }, [taskId, onComplete])
+    // Fallback when the stream drops: poll the status endpoint until the task finishes
+    const poll = async () => {
+      try {
+        const response = await fetch(`/api/contacts/categorize/status/${taskId}`)
+        if (stopped) return
+        if (response.status === 404) {
+          fail('Categorization task not found')
+          return
+        }
+        if (response.ok && update(await response.json())) return
+      } catch {
+        // Network error; try again on the next tick
+      }
+      if (!stopped) pollTimer = setTimeout(poll, STATUS_POLL_MS)
+    }
+
+    // Progress is pushed over server-sent events instead of polled
+    const source = new EventSource(`/api/contacts/categorize/stream/${taskId}`)
+
+    source.onmessage = (event) => {
+      if (update(JSON.parse(event.data))) source.close()
+    }
+
+    source.onerror = () => {
+      source.close()
+      if (!stopped) poll()
+    }
+
+    return () => {
+      stopped = true
+      source.close()
+      clearTimeout(pollTimer)
+    }
+  }, [taskId, onComplete, onError])
 
   return (
     <div className="space-y-4">
@@ -11,6 +11,7 @@ interface Contact {
 }
 
 interface ContactsTableProps {
+  // When set, pages by offset; otherwise the table pages with cursors
   page?: number
   limit?: number
   mainBucket?: string
@@ -19,7 +20,7 @@ interface ContactsTableProps {
 }
 
 function ContactsTable({
-  page = 1,
+  page,
   limit = 10,
   mainBucket,
   personalityBucket,
@@ -33,6 +34,15 @@ function ContactsTable({
   const [sortField, setSortField] = useState('email')
   const [sortDir, setSortDir] = useState<'asc' | 'desc'>('asc')
   const [search, setSearch] = useState(parentSearch)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const [prevCursor, setPrevCursor] = useState<string | null>(null)
+
+  // A cursor only applies to the filters and sort order it was issued for;
+  // any change to them starts again from the first page.
+  const queryKey = JSON.stringify([mainBucket, personalityBucket, selectedTag, sortField, sortDir, search])
+  const [cursorState, setCursorState] = useState<{ key: string; cursor: string | null }>({ key: queryKey, cursor: null })
+  const cursor = cursorState.key === queryKey ? cursorState.cursor : null
+  const setCursor = (next: string | null) => setCursorState({ key: queryKey, cursor: next })
 
   // Fetch all unique tags for the dropdown
   useEffect(() => {
@@ -56,11 +66,16 @@ function ContactsTable({
       setLoading(true)
       try {
         const params = new URLSearchParams({
-          skip: String((page - 1) * limit),
           limit: String(limit),
           sort_field: sortField,
           sort_dir: sortDir,
         })
+        if (page !== undefined) {
+          params.append('skip', String((page - 1) * limit))
+        } else {
+          params.append('paging', 'cursor')
+          if (cursor) params.append('cursor', cursor)
+        }
         if (mainBucket) params.append('main_bucket', mainBucket)
         if (personalityBucket) params.append('personality_bucket', personalityBucket)
         if (selectedTag) params.append('tag', selectedTag)
@@ -70,6 +85,8 @@ function ContactsTable({
         if (response.ok) {
           setContacts(data.contacts)
           setTotal(data.total)
+          setNextCursor(data.next_cursor ?? null)
+          setPrevCursor(data.prev_cursor ?? null)
         }
       } catch (error) {
         console.error('Failed to fetch contacts:', error)
@@ -78,7 +95,7 @@ function ContactsTable({
       }
     }
     fetchContacts()
-  }, [page, limit, mainBucket, personalityBucket, selectedTag, sortField, sortDir, search])
+  }, [page, cursor, limit, mainBucket, personalityBucket, selectedTag, sortField, sortDir, search])
 
   const handleSort = (field: string) => {
     if (sortField === field) {
@@ -159,6 +176,27 @@ function ContactsTable({
           ))}
         </tbody>
       </table>
+      {page === undefined && (
+        <div className="flex items-center justify-between mt-4">
+          <span className="text-sm text-muted-foreground">{total.toLocaleString()} contacts</span>
+          <div className="flex gap-2">
+            <button
+              onClick={() => setCursor(prevCursor)}
+              disabled={!prevCursor}
+              className="border rounded px-3 py-1 disabled:opacity-50"
+            >
+              Previous
+            </button>
+            <button
+              onClick={() => setCursor(nextCursor)}
+              disabled={!nextCursor}
+              className="border rounded px-3 py-1 disabled:opacity-50"
+            >
+              Next
+            </button>
+          </div>
+        </div>
+      )}
     </div>
   )
 }
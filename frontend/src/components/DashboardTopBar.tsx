@@ -1,6 +1,7 @@
-import { useState, useEffect } from 'react'
+import { useState, useEffect, useCallback } from 'react'
 import UploadCsvModal from './UploadCsvModal'
 import UploadZipModal from './UploadZipModal'
+import CategorizationProgress from './CategorizationProgress'
 
 type DashboardTopBarProps = {
   onUploadComplete: () => void
@@ -18,6 +19,7 @@ function DashboardTopBar({ onUploadComplete, selectedMainBucket, selectedPersona
   const [uploadZipModalOpen, setUploadZipModalOpen] = useState(false)
   const [categorizeStatus, setCategorizeStatus] = useState<'idle' | 'loading' | 'success' | 'error'>("idle")
   const [categorizeMessage, setCategorizeMessage] = useState<string>("")
+  const [categorizeTaskId, setCategorizeTaskId] = useState<string | null>(null)
   const [exportFields, setExportFields] = useState<string[]>([])
   const [selectedExportFields, setSelectedExportFields] = useState<string[]>([])
   const [exportModalOpen, setExportModalOpen] = useState(false)
@@ -39,15 +41,26 @@ function DashboardTopBar({ onUploadComplete, selectedMainBucket, selectedPersona
       const res = await fetch('/api/contacts/auto-categorize', { method: 'POST' });
       if (!res.ok) throw new Error(await res.text());
       const data = await res.json();
-      setCategorizeStatus('success');
-      setCategorizeMessage(data.message || 'Categorization complete!');
-      if (onUploadComplete) onUploadComplete();
+      setCategorizeTaskId(data.task_id);
     } catch (e: any) {
       setCategorizeStatus('error');
       setCategorizeMessage(e.message || 'Categorization failed.');
     }
   };
 
+  const handleCategorizeComplete = useCallback(() => {
+    setCategorizeTaskId(null);
+    setCategorizeStatus('success');
+    setCategorizeMessage('Categorization complete!');
+    if (onUploadComplete) onUploadComplete();
+  }, [onUploadComplete]);
+
+  const handleCategorizeError = useCallback((message: string) => {
+    setCategorizeTaskId(null);
+    setCategorizeStatus('error');
+    setCategorizeMessage(message);
+  }, []);
+
   const closeCategorizeModal = () => {
     setCategorizeStatus('idle');
     setCategorizeMessage('');
@@ -199,6 +212,11 @@ function DashboardTopBar({ onUploadComplete, selectedMainBucket, selectedPersona
           <div className="fixed inset-0 flex items-center justify-center bg-black bg-opacity-40 z-50">
             <div className="bg-white p-6 rounded shadow-lg min-w-[300px] text-center">
               {categorizeStatus === 'loading' && <div>⏳ {categorizeMessage}</div>}
+              {categorizeStatus === 'loading' && categorizeTaskId && (
+                <div className="mt-4">
+                  <CategorizationProgress taskId={categorizeTaskId} onComplete={handleCategorizeComplete} onError={handleCategorizeError} />
+                </div>
+              )}
               {categorizeStatus === 'success' && <div>✅ {categorizeMessage}</div>}
               {categorizeStatus === 'error' && <div>❌ {categorizeMessage}</div>}
               <button className="mt-4 px-4 py-2 bg-blue-500 text-white rounded" onClick={closeCategorizeModal}>OK</button>
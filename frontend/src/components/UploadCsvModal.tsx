@@ -1,4 +1,5 @@
 import { useState } from 'react'
+import { CHUNKED_UPLOAD_THRESHOLD, chunkedUpload, waitForTask } from '../lib/chunkedUpload'
 
 const MAIN_BUCKETS = [
   { label: 'Business Operations', value: 'biz', description: 'Business-focused contacts and operations', color: 'blue' },
@@ -17,6 +18,7 @@ function UploadCsvModal({ open, onClose, onUploadComplete }: UploadCsvModalProps
   const [file, setFile] = useState<File | null>(null)
   const [mainBucket, setMainBucket] = useState<string>('')
   const [isUploading, setIsUploading] = useState(false)
+  const [progress, setProgress] = useState<number | null>(null)
   const [mainBucketInCsv, setMainBucketInCsv] = useState(false)
 
   if (!open) return null
@@ -37,6 +39,16 @@ function UploadCsvModal({ open, onClose, onUploadComplete }: UploadCsvModalProps
       formData.append('main_bucket', mainBucket)
     }
     try {
+      if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+        const taskId = await chunkedUpload(file, {
+          main_bucket_in_csv: mainBucketInCsv,
+          main_bucket: mainBucketInCsv ? undefined : mainBucket,
+        }, (sent, total) => setProgress(Math.floor((sent * 100) / total)))
+        await waitForTask(taskId)
+        onUploadComplete()
+        onClose()
+        return
+      }
       const response = await fetch('/api/contacts/upload-csv', {
         method: 'POST',
         body: formData,
@@ -51,6 +63,7 @@ function UploadCsvModal({ open, onClose, onUploadComplete }: UploadCsvModalProps
       alert('Upload failed')
     } finally {
       setIsUploading(false)
+      setProgress(null)
     }
   }
 
@@ -97,7 +110,7 @@ function UploadCsvModal({ open, onClose, onUploadComplete }: UploadCsvModalProps
             onClick={handleUpload}
             disabled={!file || (!mainBucketInCsv && !mainBucket) || isUploading}
           >
-            {isUploading ? 'Uploading...' : 'Upload & Process'}
+            {isUploading ? (progress === null ? 'Uploading...' : progress < 100 ? `Uploading... ${progress}%` : 'Processing...') : 'Upload & Process'}
           </button>
         </div>
       </div>
@@ -1,4 +1,5 @@
 import { useState } from 'react'
+import { CHUNKED_UPLOAD_THRESHOLD, chunkedUpload, waitForTask } from '../lib/chunkedUpload'
 
 const MAIN_BUCKETS = [
   { label: 'Business Operations', value: 'biz', description: 'Business-focused contacts and operations', color: 'blue' },
@@ -18,6 +19,7 @@ function UploadZipModal({ open, onClose, onUploadComplete }: UploadZipModalProps
   const [useFolders, setUseFolders] = useState(true)
   const [mainBucket, setMainBucket] = useState('')
   const [isUploading, setIsUploading] = useState(false)
+  const [progress, setProgress] = useState<number | null>(null)
 
   if (!open) return null
 
@@ -37,6 +39,16 @@ function UploadZipModal({ open, onClose, onUploadComplete }: UploadZipModalProps
       formData.append('main_bucket', mainBucket)
     }
     try {
+      if (file.size > CHUNKED_UPLOAD_THRESHOLD) {
+        const taskId = await chunkedUpload(file, {
+          use_folders: useFolders,
+          main_bucket: useFolders ? undefined : mainBucket,
+        }, (sent, total) => setProgress(Math.floor((sent * 100) / total)))
+        await waitForTask(taskId)
+        onUploadComplete()
+        onClose()
+        return
+      }
       const response = await fetch('/api/contacts/upload-zip', {
         method: 'POST',
         body: formData,
@@ -51,6 +63,7 @@ function UploadZipModal({ open, onClose, onUploadComplete }: UploadZipModalProps
       alert('Upload failed')
     } finally {
       setIsUploading(false)
+      setProgress(null)
     }
   }
 
@@ -98,7 +111,7 @@ function UploadZipModal({ open, onClose, onUploadComplete }: UploadZipModalProps
             onClick={handleUpload}
             disabled={!file || (!useFolders && !mainBucket) || isUploading}
           >
-            {isUploading ? 'Uploading...' : 'Upload & Process'}
+            {isUploading ? (progress === null ? 'Uploading...' : progress < 100 ? `Uploading... ${progress}%` : 'Processing...') : 'Upload & Process'}
           </button>
         </div>
       </div>
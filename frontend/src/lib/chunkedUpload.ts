@@ -0,0 +1,79 @@
+// Files above this size go through the resumable /api/contacts/uploads API
+// instead of a single multipart POST, so a dropped connection only costs a chunk
+export const CHUNKED_UPLOAD_THRESHOLD = 50 * 1024 * 1024
+
+const UPLOADS_URL = '/api/contacts/uploads'
+const MAX_RETRIES = 5
+const STATUS_POLL_MS = 2000
+
+type UploadStatus = {
+  upload_id: string
+  offset: number
+  chunk_size: number
+  task_id: string | null
+}
+
+const sleep = (ms: number) => new Promise(resolve => setTimeout(resolve, ms))
+
+async function readStatus(response: Response): Promise<UploadStatus> {
+  // 409 also carries the offset the server expects next
+  if (!response.ok && response.status !== 409) {
+    throw new Error(`Upload request failed with ${response.status}`)
+  }
+  return response.json()
+}
+
+// Upload file in chunks, resuming from the server's offset after a failure.
+// Ingestion starts with the first chunk; resolves with the ingest task id.
+export async function chunkedUpload(
+  file: File,
+  options: Record<string, string | boolean | undefined>,
+  onProgress?: (sent: number, total: number) => void,
+): Promise<string> {
+  const upload = await readStatus(await fetch(`${UPLOADS_URL}/`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ filename: file.name, size: file.size, ...options }),
+  }))
+  let offset = upload.offset
+  let failures = 0
+  while (offset < file.size) {
+    try {
+      const status = await readStatus(await fetch(`${UPLOADS_URL}/${upload.upload_id}?offset=${offset}`, {
+        method: 'PUT',
+        headers: { 'Content-Type': 'application/octet-stream' },
+        body: file.slice(offset, offset + upload.chunk_size),
+      }))
+      // A 409 for a chunk still being written elsewhere makes no progress; back off
+      if (status.offset <= offset) throw new Error('Chunk was not accepted')
+      offset = status.offset
+      failures = 0
+      onProgress?.(offset, file.size)
+    } catch (error) {
+      failures += 1
+      if (failures > MAX_RETRIES) throw error
+      await sleep(1000 * 2 ** failures)
+      try {
+        offset = (await readStatus(await fetch(`${UPLOADS_URL}/${upload.upload_id}`))).offset
+      } catch {
+        // Still unreachable; retry from the last known offset
+      }
+    }
+  }
+  const finalized = await readStatus(await fetch(`${UPLOADS_URL}/${upload.upload_id}/finalize`, { method: 'POST' }))
+  if (!finalized.task_id) throw new Error('Upload has no ingest task')
+  return finalized.task_id
+}
+
+// Wait for a background task to finish, rejecting if it failed
+export async function waitForTask(taskId: string): Promise<void> {
+  for (;;) {
+    const response = await fetch(`/api/contacts/categorize/status/${taskId}`)
+    if (response.ok) {
+      const status = await response.json()
+      if (status.status === 'completed') return
+      if (status.status === 'error') throw new Error(status.message)
+    }
+    await sleep(STATUS_POLL_MS)
+  }
+}